@@ -0,0 +1,38 @@
+from rest_framework.filters import BaseFilterBackend
+
+from product.search import search_products
+
+"""
+Custom filter backends.
+
+- `ProductSearchFilter`: Ranked full-text search over products through the inverted index in
+  `product.search`, replacing DRF's `SearchFilter` LIKE scans.
+"""
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    """
+    Filter products by the `search` query parameter and order them by relevance.
+
+    Products matching any indexed term of the query (in the name, description or category names)
+    are kept and annotated with `search_rank`. Unless the client asked for an explicit `ordering`,
+    results are ordered by descending rank with the id as a tiebreaker. This backend must be listed
+    after `OrderingFilter` so the relevance ordering is not replaced by the default ordering.
+
+    Attributes:
+        search_param (str): The query parameter holding the search string.
+        ordering_param (str): The query parameter that, when present, disables relevance ordering.
+    """
+
+    search_param = "search"
+    ordering_param = "ordering"
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "").strip()
+        if not query:
+            return queryset
+
+        queryset = search_products(queryset, query)
+        if not request.query_params.get(self.ordering_param):
+            queryset = queryset.order_by("-search_rank", "pk")
+        return queryset
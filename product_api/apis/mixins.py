@@ -0,0 +1,552 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import serializers, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from product.cache import get_cache_version
+from users.hashing import HashingOverloaded
+from users.models import IdempotencyKey
+
+"""
+Reusable viewset mixins.
+
+- `QueryPlanningMixin`: Inspects the serializer a viewset is about to use and adds the matching
+  `select_related` / `prefetch_related` calls to its queryset, so list responses run a fixed number
+  of queries no matter how many rows are on the page.
+- `CachedResponseMixin`: Serves `list`/`retrieve` responses from a versioned cache namespace that is
+  invalidated by model signals (see `product.cache`).
+- `ConditionalGetMixin`: Adds `ETag`/`Last-Modified` validators to `list`/`retrieve` responses and
+  answers matching `If-None-Match`/`If-Modified-Since` requests with 304 before serializing.
+- `IdempotentMixin`: Runs unsafe requests carrying an `Idempotency-Key` header at most once per
+  user and key, replaying the stored response to retries.
+- `HashingAdmissionMixin`: Answers requests whose password hash was not admitted by the hashing
+  executor (see `users.hashing`) with `503 Service Unavailable` and `Retry-After`.
+
+The validator headers survive caching: `CachedResponseMixin` stores them with the response data and
+re-evaluates the conditional request headers on a cache hit, without touching the database.
+"""
+
+VALIDATOR_HEADERS = ("ETag", "Last-Modified")
+
+
+def not_modified_response(request, etag=None, last_modified=None):
+    """
+    Return a 304 response if the request's conditional headers match the validators, else None.
+
+    Args:
+        request (Request): The DRF request.
+        etag (str): The quoted entity tag of the current representation.
+        last_modified (int): The modification time of the representation as a Unix timestamp.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+    response = get_conditional_response(
+        request._request, etag=etag, last_modified=last_modified
+    )
+    return response if response is not None and response.status_code == 304 else None
+
+
+class QueryPlanningMixin:
+    """
+    Plan relation loading for a viewset's queryset from the fields being serialized.
+
+    For every readable field of the serializer:
+        - Nested `many=True` serializers (e.g. `ProductSerializer.images`) become a `Prefetch` whose
+          queryset is itself planned from the nested serializer.
+        - Many-to-many/reverse relations rendered as related fields (e.g. `categories` from
+          `fields = "__all__"`) are prefetched; many-to-many primary-key representations only load
+          the `pk` column.
+        - Forward foreign keys rendered through their related object (nested serializers,
+          `StringRelatedField`, ...) are joined with `select_related`. Primary-key foreign keys are
+          left alone because DRF reads them from the local `<field>_id` column.
+
+    Because the plan follows `serializer.fields`, relations that a serializer does not render are
+    never loaded. When a `SparseFieldsMixin` serializer was narrowed by `?fields=`/`?omit=`, only
+    the columns it renders (plus those the view needs, see `get_required_fields`) are selected.
+
+    Methods:
+        get_queryset(): Return the parent queryset with the relation plan applied.
+        get_required_fields(): Fields always loaded, whether serialized or not.
+        get_loaded_fields(model, serializer): Columns to load for a sparse field set.
+        plan_queryset(queryset, serializer): Apply the relation plan for `serializer` to `queryset`.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer = self.get_serializer()
+        queryset = self.plan_queryset(queryset, serializer)
+        if getattr(serializer, "is_sparse", False):
+            queryset = queryset.only(
+                *self.get_loaded_fields(queryset.model, serializer)
+            )
+        return queryset
+
+    def get_required_fields(self):
+        """
+        Return model fields the view itself needs even when they are not serialized: the primary
+        key, the conditional GET timestamp and the fields results can be ordered by.
+        """
+        fields = ["pk"]
+        if getattr(self, "last_modified_field", None):
+            fields.append(self.last_modified_field)
+        fields.extend(getattr(self, "ordering_fields", None) or [])
+        return fields
+
+    def get_loaded_fields(self, model, serializer):
+        """
+        Return the concrete columns to load for a sparse field set, for use with `.only()`.
+        """
+        loaded = set(self.get_required_fields())
+        concrete = {field.name for field in model._meta.concrete_fields}
+        for field in serializer.fields.values():
+            name = field.source.split(".")[0]
+            if not field.write_only and name in concrete:
+                loaded.add(name)
+        return sorted(loaded & (concrete | {"pk"}))
+
+    def plan_queryset(self, queryset, serializer):
+        """
+        Add `select_related`/`prefetch_related` calls for the relations `serializer` will render.
+
+        Args:
+            queryset (QuerySet): The queryset whose rows will be serialized.
+            serializer (Serializer): The serializer (or nested child serializer) rendering the rows.
+
+        Returns:
+            QuerySet: The queryset with the relation plan applied.
+        """
+        select_related = []
+        prefetch_related = []
+
+        for field in serializer.fields.values():
+            if field.write_only or field.source == "*" or "." in field.source:
+                continue
+
+            if isinstance(field, serializers.ListSerializer):
+                child = field.child
+                related_queryset = child.Meta.model._default_manager.all()
+                prefetch_related.append(
+                    Prefetch(
+                        field.source,
+                        queryset=self.plan_queryset(related_queryset, child),
+                    )
+                )
+            elif isinstance(field, serializers.ManyRelatedField):
+                model_field = queryset.model._meta.get_field(field.source)
+                child = field.child_relation
+                if (
+                    model_field.many_to_many
+                    and isinstance(child, serializers.PrimaryKeyRelatedField)
+                    and child.pk_field is None
+                ):
+                    # Only the primary keys are rendered, so skip the other columns.
+                    related_manager = model_field.related_model._default_manager
+                    prefetch_related.append(
+                        Prefetch(field.source, queryset=related_manager.only("pk"))
+                    )
+                else:
+                    prefetch_related.append(field.source)
+            elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                # Rendered from the local `<field>_id` column, no extra query needed.
+                continue
+            elif isinstance(field, (serializers.RelatedField, serializers.Serializer)):
+                select_related.append(field.source)
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+
+class CachedResponseMixin:
+    """
+    Cache the response data of `list` and `retrieve` in a versioned cache namespace.
+
+    Entries are keyed by action, URL kwargs, host and the normalized query parameters (sorted
+    keys and values), and stored under the current version of `cache_namespace`. Writers never
+    delete entries; the signal receivers bump the namespace version instead, which makes every
+    older entry unreachable at once. Responses carry an `X-Cache: HIT`/`MISS` header.
+
+    `ETag`/`Last-Modified` headers set by an inner `ConditionalGetMixin` are cached with the data,
+    so a hit can still be answered with 304 when the client already holds the representation.
+
+    Attributes:
+        cache_namespace (str): The versioned namespace entries are stored in.
+        cache_timeout (int): Lifetime of an entry in seconds (`API_RESPONSE_CACHE_TIMEOUT` setting).
+
+    Methods:
+        list(request): Return the cached list response, building and storing it on a miss.
+        retrieve(request, pk): Return the cached detail response, building and storing it on a miss.
+        get_response_cache_key(request): Build the cache key for the current request.
+    """
+
+    cache_namespace = None
+    cache_timeout = getattr(settings, "API_RESPONSE_CACHE_TIMEOUT", 300)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_response_cache_key(self, request):
+        query_params = sorted(
+            (key, sorted(request.query_params.getlist(key)))
+            for key in request.query_params
+        )
+        raw = json.dumps(
+            [self.action, self.kwargs, request.get_host(), query_params],
+            sort_keys=True,
+            default=str,
+        )
+        digest = hashlib.md5(raw.encode("utf-8")).hexdigest()
+        return f"response:{self.basename}:{digest}"
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        version = get_cache_version(self.cache_namespace)
+        key = self.get_response_cache_key(request)
+
+        entry = cache.get(key, version=version)
+        if entry is not None:
+            headers = entry["headers"]
+            response = not_modified_response(
+                request,
+                etag=headers.get("ETag"),
+                last_modified=parse_http_date_safe(headers.get("Last-Modified", "")),
+            ) or Response(entry["data"], headers=headers)
+            response["X-Cache"] = "HIT"
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            entry = {
+                "data": response.data,
+                "headers": {
+                    header: response[header]
+                    for header in VALIDATOR_HEADERS
+                    if header in response
+                },
+            }
+            cache.set(key, entry, self.cache_timeout, version=version)
+        response["X-Cache"] = "MISS"
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Conditional GET support (`ETag` / `Last-Modified`) for `list` and `retrieve`.
+
+    The validators are computed from the rows the response is built from, right after they are
+    fetched and before anything is serialized: the `ETag` hashes every row's primary key and
+    `last_modified_field`, together with the action, URL kwargs, normalized query parameters and
+    the paginator state (total count and next/previous links, which change when rows outside the
+    page are added or deleted). `Last-Modified` is the latest `last_modified_field` of those rows.
+    No query beyond the ones the response needs anyway is run, and a request whose
+    `If-None-Match` or `If-Modified-Since` header matches gets a 304 without serialization.
+    Views whose representation includes values of related rows (e.g. the reviewing user's name)
+    must add those values in `get_validators`, or a change to them alone keeps the `ETag`.
+
+    Attributes:
+        last_modified_field (str): The model's "last updated" timestamp field.
+
+    Methods:
+        list(request): Return 304 or the list response with validator headers.
+        retrieve(request, pk): Return 304 or the detail response with validator headers.
+        get_validators(rows, state): Return the `(etag, last_modified)` validators for `rows`.
+        get_validator_state(): Extra response state that must change the `ETag`.
+    """
+
+    last_modified_field = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rows = list(page if page is not None else queryset)
+
+        state = self.get_validator_state()
+        if page is not None:
+            paginator = self.paginator
+            state += [
+                getattr(paginator, "count", None),
+                paginator.get_next_link(),
+                paginator.get_previous_link(),
+            ]
+        etag, last_modified = self.get_validators(rows, state)
+        response = not_modified_response(request, etag, last_modified)
+        if response is None:
+            serializer = self.get_serializer(rows, many=True)
+            if page is not None:
+                response = self.get_paginated_response(serializer.data)
+            else:
+                response = Response(serializer.data)
+        return self.add_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.get_validators(
+            [instance], self.get_validator_state()
+        )
+        response = not_modified_response(request, etag, last_modified)
+        if response is None:
+            response = Response(self.get_serializer(instance).data)
+        return self.add_validators(response, etag, last_modified)
+
+    def get_validator_state(self):
+        """
+        Return extra values, besides the rows themselves, that the response body depends on.
+        """
+        return []
+
+    def get_validators(self, rows, state):
+        """
+        Compute the validators of the representation built from `rows`.
+
+        Args:
+            rows (list): The model instances being returned.
+            state (list): Extra JSON-serializable values the representation depends on.
+
+        Returns:
+            tuple: The quoted ETag and the latest modification time of the rows as a Unix
+                   timestamp (None when there are no rows).
+        """
+        timestamps = [getattr(row, self.last_modified_field) for row in rows]
+        query_params = sorted(
+            (key, sorted(self.request.query_params.getlist(key)))
+            for key in self.request.query_params
+        )
+        raw = json.dumps(
+            [
+                self.action,
+                self.kwargs,
+                query_params,
+                state,
+                [[row.pk, timestamp] for row, timestamp in zip(rows, timestamps)],
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        etag = '"%s"' % hashlib.md5(raw.encode("utf-8")).hexdigest()
+        timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+        last_modified = int(max(timestamps).timestamp()) if timestamps else None
+        return etag, last_modified
+
+    def add_validators(self, response, etag, last_modified):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class _IdempotentResponse(Exception):
+    # Raised from `initial()` to answer a duplicate request without running its handler.
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class IdempotentMixin:
+    """
+    `Idempotency-Key` support for the unsafe methods (POST/PUT/PATCH/DELETE) of a viewset.
+
+    When an authenticated request carries the header, the key is claimed for `(user, key)` by
+    inserting an `IdempotencyKey` row before the action runs, and the response is stored on the
+    row afterwards. A retry with the same key then gets the stored response (marked with an
+    `Idempotent-Replayed: true` header) instead of running the action again, e.g. instead of
+    placing and charging stock for a second order.
+
+    - A duplicate that arrives while the first request is still in flight waits for it (polling
+      the row for up to `idempotency_wait_timeout` seconds) and replays its response; if the first
+      request is still running after that, the duplicate gets 409.
+    - Reusing a key for a different method, URL or body is rejected with 422.
+    - An action that raises releases the key, so the request can be retried: server errors, but
+      also validation and other API errors (e.g. 400 for a stock shortage), which DRF turns into
+      4xx responses and which leave nothing behind. Server error responses release the key too.
+      Responses the action returns, whatever their status below 500, are stored for
+      `idempotency_ttl` seconds.
+
+    The claim is committed before the action runs so concurrent requests can see it; the mixin
+    therefore expects autocommit mode (no `ATOMIC_REQUESTS`). The key is claimed in `initial()`,
+    after authentication and throttling, and the outcome is recorded in `handle_exception()` and
+    `finalize_response()`, so it covers any action, including the viewset's own overrides of
+    `create`/`destroy` and custom `@action`s. A duplicate is answered from `initial()` without
+    running the action.
+
+    Attributes:
+        idempotency_header (str): The request header carrying the key.
+        idempotency_ttl (int): Seconds a completed key is kept (`IDEMPOTENCY_KEY_TTL` setting).
+        idempotency_wait_timeout (float): Seconds a duplicate waits for an in-flight request
+                                          (`IDEMPOTENCY_WAIT_TIMEOUT` setting).
+        idempotency_poll_interval (float): Seconds between checks while waiting.
+        idempotency_lock_timeout (int): Seconds after which a key still in flight is considered
+                                        abandoned by a crashed request and can be claimed again
+                                        (`IDEMPOTENCY_LOCK_TIMEOUT` setting).
+
+    Methods:
+        initial(request): Claim the key of an unsafe request, or answer a duplicate.
+        handle_exception(exc): Release the key of a request whose action raised.
+        finalize_response(request, response): Store the response, or release the key on a 5xx.
+        acquire_idempotency_key(request): Claim the key, waiting for an in-flight duplicate.
+        get_request_fingerprint(request): Hash of the method, path and body of a request.
+    """
+
+    idempotency_header = "Idempotency-Key"
+    idempotency_ttl = getattr(settings, "IDEMPOTENCY_KEY_TTL", 60 * 60 * 24)
+    idempotency_wait_timeout = getattr(settings, "IDEMPOTENCY_WAIT_TIMEOUT", 10)
+    idempotency_poll_interval = 0.05
+    idempotency_lock_timeout = getattr(settings, "IDEMPOTENCY_LOCK_TIMEOUT", 60)
+
+    def initial(self, request, *args, **kwargs):
+        self.idempotency_record = None
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method not in SAFE_METHODS
+            and request.headers.get(self.idempotency_header)
+            and request.user.is_authenticated
+        ):
+            self.idempotency_record = self.acquire_idempotency_key(request)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _IdempotentResponse):
+            return exc.response
+        # The action failed before producing a response: let the request be retried.
+        record = getattr(self, "idempotency_record", None)
+        if record is not None:
+            self.idempotency_record = None
+            record.delete()
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        record = getattr(self, "idempotency_record", None)
+        if record is not None:
+            self.idempotency_record = None
+            if response.status_code >= 500:
+                record.delete()
+            else:
+                IdempotencyKey.objects.filter(pk=record.pk).update(
+                    status_code=response.status_code, response_data=response.data
+                )
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def get_request_fingerprint(self, request):
+        raw = json.dumps(
+            [request.method, request.path, request.data], sort_keys=True, default=str
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def acquire_idempotency_key(self, request):
+        """
+        Claim the request's key and return its record, or raise `_IdempotentResponse` with the
+        response that answers a duplicate (the stored response, 409 or 422).
+        """
+        key = request.headers[self.idempotency_header]
+        if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+            raise ValidationError({self.idempotency_header: "Key is too long."})
+
+        fingerprint = self.get_request_fingerprint(request)
+        deadline = time.monotonic() + self.idempotency_wait_timeout
+        while True:
+            record, claimed = self.claim_idempotency_key(request.user, key, fingerprint)
+            if claimed:
+                return record
+            if record.request_fingerprint != fingerprint:
+                raise _IdempotentResponse(
+                    Response(
+                        {
+                            "detail": "This Idempotency-Key was used for a different request."
+                        },
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                )
+            if record.is_completed:
+                raise _IdempotentResponse(
+                    Response(
+                        record.response_data,
+                        status=record.status_code,
+                        headers={"Idempotent-Replayed": "true"},
+                    )
+                )
+            if time.monotonic() >= deadline:
+                raise _IdempotentResponse(
+                    Response(
+                        {
+                            "detail": "A request with this Idempotency-Key is in progress."
+                        },
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                )
+            time.sleep(self.idempotency_poll_interval)
+
+    def claim_idempotency_key(self, user, key, fingerprint):
+        """
+        Return `(record, True)` if the key was claimed for this request, or the existing
+        unexpired record and False if another request holds it.
+        """
+        while True:
+            record = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if record is not None:
+                now = timezone.now()
+                abandoned = not record.is_completed and record.created_at <= now - (
+                    timedelta(seconds=self.idempotency_lock_timeout)
+                )
+                if record.expires_at > now and not abandoned:
+                    return record, False
+                # Expired, or left in flight by a request that died: take it over.
+                IdempotencyKey.objects.filter(
+                    pk=record.pk, created_at=record.created_at
+                ).delete()
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user=user,
+                        key=key,
+                        request_fingerprint=fingerprint,
+                        expires_at=timezone.now()
+                        + timedelta(seconds=self.idempotency_ttl),
+                    )
+                return record, True
+            except IntegrityError:
+                # Another request claimed the key first; read its record.
+                continue
+
+
+class HashingAdmissionMixin:
+    """
+    Turn `users.hashing.HashingOverloaded` into a `503 Service Unavailable` response.
+
+    For the views that hash passwords (registration, token obtain): when the bounded hashing
+    executor is saturated the request is shed at once, with a `Retry-After` header telling the
+    client when to try again, instead of holding a worker while it waits for a hashing thread.
+    The request is marked `hashing_admission`, which makes `users.backends.HashingExecutorBackend`
+    check its password on the executor; logins elsewhere (e.g. the admin) hash inline.
+
+    Methods:
+        initial(request): Mark the request for admission control.
+        handle_exception(exc): Answer `HashingOverloaded` with 503; re-raise everything else.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        # Set on the Django request, which the DRF request proxies attribute reads to.
+        request._request.hashing_admission = True
+        super().initial(request, *args, **kwargs)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, HashingOverloaded):
+            return Response(
+                {"detail": str(exc)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+        return super().handle_exception(exc)
@@ -0,0 +1,242 @@
+import json
+from base64 import b64decode, b64encode
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+"""
+Keyset (cursor) pagination for large, ordered collections.
+
+`LimitOffsetPagination` runs `OFFSET n` plus a `COUNT(*)` on every request, so the cost of a
+page grows with its depth. Keyset pagination instead remembers the (ordering value, id) of the
+last row that was sent and asks the database for the rows strictly after it, which an index on
+`(ordering field, id)` answers with a short range scan regardless of how deep the page is.
+
+Cursor:
+    A cursor is an opaque base64 string holding the ordering it was built for, the
+    ordering value and id of the boundary row, and whether it points backwards (previous page).
+
+Usage:
+    Set `pagination_class = KeysetPagination` on a viewset. The ordering comes from the
+    `ordering` query parameter (restricted to `view.ordering_fields`) or `view.ordering`, and the
+    primary key is always appended as a unique tiebreaker. A queryset a filter backend already
+    ordered by one of its annotations (e.g. `search_rank`, see `apis.filters`) keeps that ordering
+    and is paginated on the annotation.
+"""
+
+Cursor = namedtuple("Cursor", ["ordering", "value", "pk", "reverse"])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on a composite `(ordering field, id)` key.
+
+    Unlike DRF's `CursorPagination`, which seeks on the first ordering field only and falls back
+    to an offset for ties, this class compares the full key so pages over heavily duplicated
+    values (e.g. many products with the same price) stay constant-time. No count query is run.
+
+    Attributes:
+        page_size (int): Default number of rows per page (`PAGE_SIZE` setting).
+        page_size_query_param (str): Query parameter that lets clients choose the page size.
+        max_page_size (int): Upper bound for a client-chosen page size.
+        cursor_query_param (str): Query parameter carrying the opaque cursor.
+        ordering_query_param (str): Query parameter used to pick the ordering field.
+        invalid_cursor_message (str): Error raised for malformed or mismatched cursors.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "limit"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    ordering_query_param = "ordering"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return one page of rows positioned by the cursor in the request.
+
+        Args:
+            queryset (QuerySet): The filtered queryset to paginate.
+            request (Request): The incoming request.
+            view (APIView): The view being paginated, used to resolve the ordering.
+
+        Returns:
+            list: The rows of the requested page.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, view, queryset)
+        self.field = self.ordering.lstrip("-")
+        self.descending = self.ordering.startswith("-")
+        self.pk_descending = self.get_tiebreak_descending(queryset)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor.reverse)
+
+        queryset = queryset.order_by(*self.get_order_by(reverse))
+        if cursor is not None:
+            try:
+                queryset = queryset.filter(self.get_seek_filter(cursor))
+            except (TypeError, ValueError, ValidationError):
+                # The cursor value does not fit the ordering field.
+                raise NotFound(self.invalid_cursor_message)
+
+        # Fetch one extra row to find out whether another page exists.
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size,
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, request, view, queryset=None):
+        """
+        Resolve the single ordering field (optionally prefixed with '-') for this request.
+
+        A queryset ordered by one of its annotations, such as the relevance `search_rank`, keeps
+        that ordering. Otherwise only fields listed in `view.ordering_fields` are accepted;
+        anything else falls back to the first entry of `view.ordering`.
+        """
+        if queryset is not None and queryset.query.order_by:
+            ordering = queryset.query.order_by[0]
+            if (
+                isinstance(ordering, str)
+                and ordering.lstrip("-") in queryset.query.annotations
+            ):
+                return ordering
+
+        allowed = getattr(view, "ordering_fields", None) or []
+        default = (getattr(view, "ordering", None) or ["pk"])[0]
+
+        params = request.query_params.get(self.ordering_query_param)
+        if params:
+            ordering = params.split(",")[0].strip()
+            if ordering.lstrip("-") in allowed:
+                return ordering
+        return default
+
+    def get_tiebreak_descending(self, queryset):
+        # The primary key follows the ordering field, unless the queryset already orders by
+        # both, e.g. the relevance ordering `("-search_rank", "pk")`.
+        order_by = queryset.query.order_by
+        if (
+            len(order_by) > 1
+            and order_by[0] == self.ordering
+            and isinstance(order_by[1], str)
+            and order_by[1].lstrip("-") in ("pk", "id")
+        ):
+            return order_by[1].startswith("-")
+        return self.descending
+
+    def get_order_by(self, reverse):
+        prefix = "-" if self.descending != reverse else ""
+        pk_prefix = "-" if self.pk_descending != reverse else ""
+        return [f"{prefix}{self.field}", f"{pk_prefix}pk"]
+
+    def get_seek_filter(self, cursor):
+        """
+        Build the keyset condition selecting rows strictly after (or before) the cursor.
+
+        The leading `gte`/`lte` term on the ordering field lets the database use it as an index
+        range bound, while the OR term breaks ties on the primary key.
+        """
+        op = "lt" if self.descending != cursor.reverse else "gt"
+        pk_op = "lt" if self.pk_descending != cursor.reverse else "gt"
+        return Q(**{f"{self.field}__{op}e": cursor.value}) & (
+            Q(**{f"{self.field}__{op}": cursor.value})
+            | Q(**{f"pk__{pk_op}": cursor.pk})
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            data = json.loads(b64decode(encoded.encode("ascii")).decode("utf-8"))
+            cursor = Cursor(
+                ordering=str(data["o"]),
+                value=data["v"],
+                pk=int(data["p"]),
+                reverse=bool(data.get("r", False)),
+            )
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # Cursors are always encoded with a string value (see `encode_cursor`).
+        if not isinstance(cursor.value, str):
+            raise NotFound(self.invalid_cursor_message)
+
+        # A cursor is only meaningful for the ordering it was generated with.
+        if cursor.ordering != self.ordering:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, item, reverse):
+        value = getattr(item, self.field)
+        data = {"o": self.ordering, "v": str(value), "p": item.pk}
+        if reverse:
+            data["r"] = 1
+        encoded = b64encode(
+            json.dumps(data, separators=(",", ":")).encode("utf-8")
+        ).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
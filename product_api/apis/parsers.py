@@ -0,0 +1,44 @@
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional
+    msgpack = None
+
+"""
+Fast request parsers, the counterparts of `apis.renderers`.
+
+- `ORJSONParser`: Parses `application/json` bodies with orjson.
+- `MessagePackParser`: Parses `application/msgpack` bodies. Only available when the optional
+  `msgpack` package is installed.
+"""
+
+
+class ORJSONParser(BaseParser):
+    """
+    Parse JSON-serialized data with orjson.
+    """
+
+    media_type = "application/json"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parse MessagePack-serialized data.
+    """
+
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except Exception as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
@@ -0,0 +1,81 @@
+import datetime
+import decimal
+
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional
+    msgpack = None
+
+"""
+Fast response renderers.
+
+- `ORJSONRenderer`: A drop-in replacement for DRF's `JSONRenderer` backed by orjson, which
+  serializes large pages of products and orders several times faster than the standard library.
+- `MessagePackRenderer`: Renders `application/msgpack` for clients that ask for it through the
+  `Accept` header. Only available when the optional `msgpack` package is installed.
+
+Values orjson/msgpack do not support natively (e.g. `Decimal` prices when
+`COERCE_DECIMAL_TO_STRING` is off, lazy translation strings, querysets) fall back to DRF's own
+`JSONEncoder.default`, so the output matches the stock renderer.
+"""
+
+_drf_encoder = JSONEncoder()
+
+
+def orjson_default(obj):
+    return _drf_encoder.default(obj)
+
+
+def msgpack_default(obj):
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    return _drf_encoder.default(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Render `application/json` with orjson.
+
+    Output is compact UTF-8, like DRF's `JSONRenderer` with its default settings, and dictionary
+    keys that are not strings are rendered as strings like the standard library does. An `indent`
+    parameter in the accepted media type (e.g. `application/json; indent=4`) switches to
+    orjson's two-space indentation.
+    """
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+    # Non-string keys (e.g. facet counts keyed by primary key) become strings, as with json.dumps.
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        options = self.options
+        if accepted_media_type and "indent" in accepted_media_type:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=orjson_default, option=options)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Render `application/msgpack`. `Decimal` values are sent as strings and dates as ISO 8601
+    strings, matching their JSON representation.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=msgpack_default, use_bin_type=True)
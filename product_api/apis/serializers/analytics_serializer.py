@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from order.models import Order
+from order.rollups import INTERVALS, REVENUE_STATUSES
+
+
+class SalesQuerySerializer(serializers.Serializer):
+    """
+    Validates the query parameters shared by the sales reports.
+
+    Attributes:
+        start (date): The first day reported; defaults to `DEFAULT_DAYS - 1` days before `end`.
+        end (date): The last day reported; defaults to today.
+        order_status (list): The order statuses counted (repeat the parameter for several);
+                             defaults to `order.rollups.REVENUE_STATUSES`.
+        category (int): Only count the products of this category.
+
+    Methods:
+        validate: Fills in the default range and rejects ranges longer than `MAX_DAYS`.
+    """
+
+    DEFAULT_DAYS = 30
+    MAX_DAYS = 731
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    order_status = serializers.ListField(
+        child=serializers.ChoiceField(choices=Order.ORDER_STATUS_CHOICES),
+        required=False,
+    )
+    category = serializers.IntegerField(min_value=1, required=False)
+
+    def to_internal_value(self, data):
+        # Query parameters may repeat `order_status`.
+        if hasattr(data, "getlist"):
+            data = {
+                key: data.getlist(key) if key == "order_status" else data.get(key)
+                for key in data
+            }
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        end = attrs.setdefault("end", timezone.localdate())
+        start = attrs.setdefault("start", end - timedelta(days=self.DEFAULT_DAYS - 1))
+        if start > end:
+            raise serializers.ValidationError({"start": "Must not be after end."})
+        if (end - start).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(
+                {"start": f"Reports cover at most {self.MAX_DAYS} days."}
+            )
+        attrs["statuses"] = tuple(attrs.pop("order_status", None) or REVENUE_STATUSES)
+        return attrs
+
+
+class RevenueSeriesQuerySerializer(SalesQuerySerializer):
+    """
+    Query parameters of the revenue series: the shared ones, `interval` (`day`, `week` or
+    `month`) and `product` to report a single product.
+    """
+
+    interval = serializers.ChoiceField(choices=INTERVALS, default="day")
+    product = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if "product" in attrs and "category" in attrs:
+            raise serializers.ValidationError(
+                "Filter by product or by category, not both."
+            )
+        return super().validate(attrs)
+
+
+class TopProductsQuerySerializer(SalesQuerySerializer):
+    """
+    Query parameters of the top-products report: the shared ones, `limit` and `order_by`
+    (`revenue` or `units`).
+    """
+
+    MAX_LIMIT = 100
+
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_LIMIT, default=10)
+    order_by = serializers.ChoiceField(choices=["revenue", "units"], default="revenue")
+
+
+class RevenuePeriodSerializer(serializers.Serializer):
+    """
+    A period of the revenue series (see `order.rollups.get_revenue_series`).
+    """
+
+    period = serializers.DateField()
+    revenue = serializers.DecimalField(max_digits=16, decimal_places=2)
+    units = serializers.IntegerField()
+    order_count = serializers.IntegerField()
+
+
+class TopProductSerializer(serializers.Serializer):
+    """
+    A product of the top-products report (see `order.rollups.get_top_products`).
+    """
+
+    product = serializers.IntegerField()
+    name = serializers.CharField()
+    revenue = serializers.DecimalField(max_digits=16, decimal_places=2)
+    units = serializers.IntegerField()
+    order_count = serializers.IntegerField()
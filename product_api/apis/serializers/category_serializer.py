@@ -1,18 +1,21 @@
 from rest_framework import serializers
 
+from apis.serializers.mixins import SparseFieldsMixin
 from product.models.category import Category
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the Category model.
 
     This serializer handles the conversion of Category model instances
     to and from JSON format, as well as field-level validation for the
     'name' field.
+    Read responses can be narrowed with `?fields=`/`?omit=` (see `SparseFieldsMixin`).
 
     Methods:
         validate_name: Ensures the category name has at least 3 characters.
+        validate_parent_category: Ensures a category is not moved under itself or its descendants.
     """
 
     class Meta:
@@ -40,3 +43,25 @@ class CategorySerializer(serializers.ModelSerializer):
                 "Category name must be at least 3 characters long"
             )
         return value
+
+    def validate_parent_category(self, value):
+        """
+        Field-level validation for the 'parent_category' field.
+
+        Ensures a category is not made a child of itself or of one of its own descendants,
+        which would turn the hierarchy into a cycle.
+
+        Args:
+            value (Category): The requested parent category, or None.
+
+        Returns:
+            Category: The validated parent category.
+
+        Raises:
+            serializers.ValidationError: If the parent is the category itself or a descendant.
+        """
+        if value and self.instance and value.path.startswith(self.instance.path):
+            raise serializers.ValidationError(
+                "A category cannot be moved under itself or its own subcategory."
+            )
+        return value
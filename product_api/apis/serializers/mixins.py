@@ -0,0 +1,52 @@
+from rest_framework.permissions import SAFE_METHODS
+
+"""
+Reusable serializer mixins.
+
+- `SparseFieldsMixin`: Lets clients choose the fields of a read response with `?fields=` and
+  `?omit=`.
+"""
+
+
+class SparseFieldsMixin:
+    """
+    Restrict the serialized fields to those requested by the client.
+
+    On safe (read) requests, `?fields=name,price` keeps only the listed fields and
+    `?omit=description` drops the listed fields; unknown names are ignored. Write requests always
+    use the full field set so validation is unaffected. Nested serializers are not filtered.
+
+    When the field set is restricted, `is_sparse` is True so `QueryPlanningMixin` can load only
+    the matching columns and skip the prefetches of relations that are not rendered.
+
+    Attributes:
+        fields_query_param (str): The query parameter listing the fields to keep.
+        omit_query_param (str): The query parameter listing the fields to drop.
+        is_sparse (bool): Whether the field set was restricted for this request.
+    """
+
+    fields_query_param = "fields"
+    omit_query_param = "omit"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.is_sparse = False
+
+        request = self.context.get("request")
+        if request is None or request.method not in SAFE_METHODS:
+            return
+
+        requested = self.parse_field_names(request, self.fields_query_param)
+        omitted = self.parse_field_names(request, self.omit_query_param)
+        if not requested and not omitted:
+            return
+
+        for name in list(self.fields):
+            if (requested and name not in requested) or name in omitted:
+                self.fields.pop(name)
+        self.is_sparse = True
+
+    @staticmethod
+    def parse_field_names(request, param):
+        value = request.query_params.get(param, "")
+        return {name.strip() for name in value.split(",") if name.strip()}
@@ -1,9 +1,29 @@
+from django.db import transaction
 from rest_framework import serializers
 
-from order.models import Order
+from apis.serializers.mixins import SparseFieldsMixin
+from order.checkout import checkout
+from order.models import ArchivedOrder, Order, OrderItem
+from order.reservations import InsufficientStock, get_available_quantity, reserve_stock
+from order.transitions import InvalidTransition, bulk_transition, can_transition
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the lines of a multi-item order.
+    """
+
+    line_total = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True
+    )
+
+    class Meta:
+        model = OrderItem
+        fields = ["id", "product", "quantity", "unit_price", "line_total"]
+        read_only_fields = fields
+
+
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the Order model.
 
@@ -11,12 +31,19 @@ class OrderSerializer(serializers.ModelSerializer):
     to and from JSON format, validation for stock quantity, and the
     creation of an order. It also ensures that the total price is
     calculated correctly based on the quantity and product price.
+    Read responses can be narrowed with `?fields=`/`?omit=` (see `SparseFieldsMixin`).
+    Orders placed through checkout list their lines under `items`.
 
     Methods:
-        validate: Validates if the order quantity does not exceed the available stock.
-        create: Creates a new order, ensuring sufficient stock and calculating the total price.
+        validate: Validates if the order quantity does not exceed the available stock, and that
+                  a status change is allowed by the order state machine.
+        create: Creates a new order, holding its stock and calculating the total price.
+        update: Updates an order, turning stock shortages and invalid transitions raised by the
+                order signals into validation errors.
     """
 
+    items = OrderItemSerializer(many=True, read_only=True)
+
     class Meta:
         model = Order
         fields = "__all__"
@@ -27,8 +54,11 @@ class OrderSerializer(serializers.ModelSerializer):
         Validate the order data to ensure the quantity does not exceed the available stock.
 
         This method checks if the quantity of the product ordered is less than or equal to
-        the stock quantity of the product. If the quantity exceeds the stock, a validation error
-        is raised with a relevant message.
+        the available-to-promise quantity of the product (its stock minus the holds of other
+        orders, see `order.reservations`). If the quantity exceeds it, a validation error
+        is raised with a relevant message. A status change of an existing order must be
+        allowed by the state machine of `order.transitions`. The product and quantity of an
+        order placed through checkout cannot be changed, as its stock is held per line.
 
         Args:
             data (dict): The validated order data, including product and quantity.
@@ -37,25 +67,59 @@ class OrderSerializer(serializers.ModelSerializer):
             dict: The validated order data.
 
         Raises:
-            serializers.ValidationError: If the order quantity exceeds available stock.
+            serializers.ValidationError: If the order quantity exceeds available stock, the
+                                         order may not move to the new status, or the lines
+                                         of a checkout order are changed.
         """
+        new_status = data.get("order_status")
+        if (
+            self.instance is not None
+            and new_status is not None
+            and new_status != self.instance.order_status
+            and not can_transition(self.instance.order_status, new_status)
+        ):
+            raise serializers.ValidationError(
+                {
+                    "order_status": str(
+                        InvalidTransition(self.instance.order_status, new_status)
+                    )
+                }
+            )
+
+        if self.instance is not None:
+            changed = [
+                field
+                for field in ("product", "quantity")
+                if field in data and data[field] != getattr(self.instance, field)
+            ]
+            if changed and self.instance.items.exists():
+                # `quantity` of a checkout order is only the total of its lines.
+                raise serializers.ValidationError(
+                    {
+                        field: "The lines of a checkout order cannot be changed."
+                        for field in changed
+                    }
+                )
+
         product = data.get("product")
         quantity = data.get("quantity")
 
         if product and quantity:
-            if quantity > product.stock_quantity:
+            available = get_available_quantity(product, exclude_order=self.instance)
+            if quantity > available:
                 raise serializers.ValidationError(
-                    f"Cannot order {quantity}. Only {product.stock_quantity} left in stock."
+                    f"Cannot order {quantity}. Only {available} left in stock."
                 )
         return data
 
     def create(self, validated_data):
         """
-        Create a new order while ensuring the stock is updated and total price is calculated.
+        Create a new order while ensuring the stock is held and total price is calculated.
 
-        This method creates an order instance after validating that there is enough stock
-        for the product. It also calculates the total price of the order based on the quantity
-        and product price and updates the stock quantity.
+        The quantity is held for the order (see `order.reservations`) in the same transaction as
+        the order insert, with the product row locked, so concurrent orders for the last units
+        can never both succeed. The stock itself is only decremented once the payment is
+        confirmed.
 
         Args:
             validated_data (dict): The validated data for the order, including product and quantity.
@@ -72,21 +136,146 @@ class OrderSerializer(serializers.ModelSerializer):
         product = validated_data["product"]
         quantity = validated_data["quantity"]
 
-        # Check if there's enough stock for the product
-        if product.stock_quantity < quantity:
+        with transaction.atomic():
+            # Calculate the total price of the order (you can customize this logic)
+            total_price = product.price * quantity
+            validated_data["total_price"] = total_price
+            validated_data["user"] = user
+            # Create the order
+            order = super().create(validated_data)
+
+            # Hold the stock, unless other orders already hold it
+            try:
+                reserve_stock(order, {product.pk: quantity})
+            except InsufficientStock:
+                raise serializers.ValidationError(
+                    "Not enough stock available to fulfill this order."
+                )
+
+        return order
+
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except InsufficientStock:
             raise serializers.ValidationError(
                 "Not enough stock available to fulfill this order."
             )
+        except InvalidTransition as exc:
+            # The status changed since the order was validated.
+            raise serializers.ValidationError({"order_status": str(exc)})
 
-        # Reduce stock quantity
-        product.stock_quantity -= quantity
-        product.save()
 
-        # Calculate the total price of the order (you can customize this logic)
-        total_price = product.price * quantity
-        validated_data["total_price"] = total_price
-        validated_data["user"] = user
-        # Create the order
-        order = super().create(validated_data)
+class CheckoutItemSerializer(serializers.Serializer):
+    """
+    A cart line: a product id and the number of units to order.
 
-        return order
+    The product is validated by `checkout` together with the other lines, rather than with one
+    lookup per line.
+    """
+
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class CheckoutSerializer(serializers.Serializer):
+    """
+    Serializer for placing a multi-item order.
+
+    Attributes:
+        items (list): The cart lines; lines for the same product are merged.
+        shipping_address (str): The address the order is shipped to.
+
+    Methods:
+        create: Places the cart with `order.checkout.checkout` and returns the created order.
+        to_representation: Renders the created order with `OrderSerializer`.
+    """
+
+    MAX_ITEMS = 100
+
+    items = CheckoutItemSerializer(many=True, allow_empty=False, max_length=MAX_ITEMS)
+    shipping_address = serializers.CharField()
+
+    def create(self, validated_data):
+        return checkout(
+            user=self.context["request"].user,
+            items=validated_data["items"],
+            shipping_address=validated_data["shipping_address"],
+        )
+
+    def to_representation(self, instance):
+        return OrderSerializer(instance, context=self.context).data
+
+
+class OrderTransitionSerializer(serializers.Serializer):
+    """
+    Serializer for moving many orders to one status (`POST /api/orders/transition/`).
+
+    Attributes:
+        orders (list): Primary keys of the orders to move.
+        order_status (str): The target status; each move is checked against
+                            `order.transitions.TRANSITIONS`.
+
+    Methods:
+        create: Applies the transition with `order.transitions.bulk_transition` and returns
+                the moved and rejected orders.
+    """
+
+    MAX_ORDERS = 1000
+
+    orders = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_ORDERS,
+    )
+    order_status = serializers.ChoiceField(choices=Order.ORDER_STATUS_CHOICES)
+
+    def create(self, validated_data):
+        updated, rejected = bulk_transition(
+            validated_data["orders"], validated_data["order_status"]
+        )
+        return {
+            "order_status": validated_data["order_status"],
+            "updated": updated,
+            "rejected": {str(pk): reason for pk, reason in rejected.items()},
+        }
+
+    def to_representation(self, instance):
+        return instance
+
+
+class ArchivedOrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Read-only serializer for archived orders (see `order.archive`).
+
+    Renders the same fields as `OrderSerializer`, with the lines stored on the archived order
+    under `items`, plus `archived` (always true) and `archived_at`, narrowed by
+    `?fields=`/`?omit=` like `OrderSerializer`.
+    """
+
+    archived = serializers.BooleanField(default=True, read_only=True)
+
+    class Meta:
+        model = ArchivedOrder
+        fields = "__all__"
+        read_only_fields = [field.name for field in ArchivedOrder._meta.fields]
+
+
+class OrderHistorySerializer(serializers.Serializer):
+    """
+    Serializer for the rows of a customer's order history, hot and archived alike.
+
+    The rows are the dicts returned by `order.archive.get_order_history`; `archived` tells
+    whether the order was moved to the archive.
+    """
+
+    id = serializers.IntegerField()
+    product = serializers.IntegerField(source="product_id", allow_null=True)
+    quantity = serializers.IntegerField()
+    total_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    shipping_address = serializers.CharField()
+    order_status = serializers.CharField()
+    created_at = serializers.DateTimeField()
+    updated_at = serializers.DateTimeField()
+    archived = serializers.BooleanField()
@@ -1,7 +1,9 @@
 from rest_framework import serializers
 
+from apis.serializers.mixins import SparseFieldsMixin
 from product.models.product import Product
 from product.models.product_image import ProductImage
+from product.stock import get_sharded_stock
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
@@ -17,7 +19,7 @@ class ProductImageSerializer(serializers.ModelSerializer):
         fields = ["image", "caption"]
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the Product model.
 
@@ -25,6 +27,9 @@ class ProductSerializer(serializers.ModelSerializer):
     handles validation for product fields like price, name, and stock quantity.
     It also includes the ability to handle multiple associated images via
     ProductImageSerializer.
+    Read responses can be narrowed with `?fields=`/`?omit=` (see `SparseFieldsMixin`).
+    For products with sharded inventory, `stock_quantity` reports the live sum of the stock
+    shards, read from the `sharded_stock` annotation added by `ProductViewSet` when present.
     """
 
     images = ProductImageSerializer(
@@ -95,3 +100,23 @@ class ProductSerializer(serializers.ModelSerializer):
                 "Stock Quantity must be a positive integer."
             )
         return value
+
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        # The annotation was read before the update, which may have changed the shards.
+        instance.__dict__.pop("sharded_stock", None)
+        return instance
+
+    def to_representation(self, instance):
+        """
+        Serialize a product, reporting the summed shard stock of sharded products.
+        """
+        data = super().to_representation(instance)
+        if "stock_quantity" in data:
+            if "sharded_stock" in instance.__dict__:
+                sharded_stock = instance.sharded_stock
+            else:
+                sharded_stock = get_sharded_stock([instance.pk]).get(instance.pk)
+            if sharded_stock is not None:
+                data["stock_quantity"] = sharded_stock
+        return data
@@ -1,9 +1,15 @@
+import threading
+from unittest import skipIf
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from rest_framework.exceptions import ValidationError
 from rest_framework.test import APIRequestFactory
 
 from apis.serializers.order_serializer import OrderSerializer
 from order.models import Order
+from order.reservations import get_available_quantity
 from product.models.product import Product
 
 
@@ -31,9 +37,9 @@ class TestOrderSerializer(TestCase):
         self.request = self.factory.post("/orders/", data=self.order_data)
         self.request.user = self.user
 
-    def test_order_serializer_stock_reduction(self):
+    def test_order_serializer_stock_hold(self):
         """
-        Test that the stock quantity is reduced after saving the order.
+        Test that saving the order holds its stock until the payment is confirmed.
         """
         # Pass the request in context
         serializer = OrderSerializer(
@@ -44,9 +50,11 @@ class TestOrderSerializer(TestCase):
         self.assertTrue(serializer.is_valid(), f"Errors: {serializer.errors}")
         order = serializer.save()
 
-        # Verify stock reduction
+        # Verify the stock is held, not reduced
         self.product.refresh_from_db()
-        self.assertEqual(self.product.stock_quantity, 9)
+        self.assertEqual(self.product.stock_quantity, 10)
+        self.assertEqual(get_available_quantity(self.product), 9)
+        self.assertEqual(order.reservations.get().quantity, 1)
 
     def test_order_serializer_total_price_calculation(self):
         """
@@ -104,3 +112,68 @@ class TestOrderSerializer(TestCase):
             str(serializer.errors["non_field_errors"][0]),
             f"Cannot order 15. Only {self.product.stock_quantity} left in stock.",
         )
+
+
+@skipIf(
+    connection.vendor == "sqlite",
+    "SQLite's shared in-memory test database locks whole tables across concurrent transactions.",
+)
+class OrderPlacementConcurrencyTest(TransactionTestCase):
+    threads = 16
+    stock = 5
+
+    def setUp(self):
+        self.product = Product.objects.create(
+            name="Last Units", stock_quantity=self.stock, price=100.00
+        )
+        self.users = [
+            get_user_model().objects.create_user(
+                email=f"buyer{i}@example.com", username=f"buyer{i}", password="pw"
+            )
+            for i in range(self.threads)
+        ]
+
+    def test_concurrent_orders_never_oversell(self):
+        """
+        Test that many concurrent orders for the same product place exactly as many orders as
+        there is stock, and deduct it once.
+        """
+        barrier = threading.Barrier(self.threads)
+        placed = []
+        rejected = []
+        errors = []
+
+        def place(user):
+            request = APIRequestFactory().post("/orders/")
+            request.user = user
+            serializer = OrderSerializer(
+                data={
+                    "product": self.product.id,
+                    "quantity": 1,
+                    "shipping_address": "123 street",
+                },
+                context={"request": request},
+            )
+            try:
+                serializer.is_valid(raise_exception=True)
+                barrier.wait()
+                placed.append(serializer.save())
+            except ValidationError:
+                rejected.append(user)
+            except Exception as exc:  # surfaced by the assertions below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=place, args=(user,)) for user in self.users]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(placed), self.stock)
+        self.assertEqual(len(rejected), self.threads - self.stock)
+        self.assertEqual(Order.objects.count(), self.stock)
+        self.product.refresh_from_db()
+        self.assertEqual(get_available_quantity(self.product), 0)
@@ -1,6 +1,15 @@
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+
+from users.authentication import TOKEN_VERSION_CLAIM, CachedJWTAuthentication
+from users.blacklist import FilteredRefreshToken
+from users.hashing import hash_password
 from users.models import CustomUser
 
 user = get_user_model()
@@ -27,7 +36,9 @@ class RegisterSerializer(serializers.ModelSerializer):
     Serializer for user registration.
 
     This serializer is used for creating a new user by validating and saving the provided data. It includes password validation
-    and ensures that the password is not returned after the user is created.
+    and ensures that the password is not returned after the user is created. Email and username uniqueness is not checked
+    with queries up front: the user is created with a single INSERT, and a duplicate is reported with the same error the
+    unique validators gave.
 
     Fields:
         - email: The email of the user.
@@ -35,7 +46,9 @@ class RegisterSerializer(serializers.ModelSerializer):
         - password: The password of the user (write-only field).
 
     Methods:
+        - get_extra_kwargs: Leaves the unique validators out when a user is being created.
         - create: Creates a new user with the provided email, username, and password.
+        - unique_error_message: The error reported for a duplicate email or username.
     """
 
     password = serializers.CharField(
@@ -46,12 +59,20 @@ class RegisterSerializer(serializers.ModelSerializer):
         model = CustomUser
         fields = ["email", "username", "password"]
 
+    def get_extra_kwargs(self):
+        extra_kwargs = super().get_extra_kwargs()
+        if self.instance is None:
+            # Creation: uniqueness is enforced by the INSERT (see `CustomUserManager.create_user`).
+            for field in ("email", "username"):
+                extra_kwargs.setdefault(field, {})["validators"] = []
+        return extra_kwargs
+
     def create(self, validated_data):
         """
         Create a new user with the validated data.
 
         This method is called when saving the user instance. It creates a new user with the provided email, username, and password,
-        ensuring that the password is hashed.
+        ensuring that the password is hashed (on the bounded hashing executor, see `users.hashing`). A duplicate email or username raises a validation error for that field.
 
         Args:
             validated_data (dict): The validated data for the user.
@@ -59,9 +80,90 @@ class RegisterSerializer(serializers.ModelSerializer):
         Returns:
             CustomUser: The newly created user instance.
         """
-        user = CustomUser.objects.create_user(
-            email=validated_data["email"],
-            password=validated_data["password"],
-            username=validated_data["username"],
-        )
+        try:
+            user = CustomUser.objects.create_user(
+                email=validated_data["email"],
+                password=None,
+                username=validated_data["username"],
+                encoded_password=hash_password(validated_data["password"]),
+            )
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(
+                {
+                    field: [self.unique_error_message(field)]
+                    for field in exc.message_dict
+                },
+                code="unique",
+            )
         return user
+
+    @staticmethod
+    def unique_error_message(field):
+        # The message DRF's `UniqueValidator` reports for the model field.
+        model_field = CustomUser._meta.get_field(field)
+        return model_field.error_messages["unique"] % {
+            "model_name": CustomUser._meta.verbose_name,
+            "field_label": model_field.verbose_name,
+        }
+
+
+class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Token obtain serializer (`POST /api/token/`) that stamps user claims into the tokens.
+
+    Besides the user id, the tokens carry the user's `token_version`, which lets
+    `CachedJWTAuthentication` key its cache by version and reject tokens issued before a password
+    change, and `username`, `is_staff` and `is_superuser`, from which `TokenClaimsAuthentication`
+    builds a user without any lookup. Refreshing stamps the user's current claims again
+    (see `FilteredTokenRefreshSerializer`).
+
+    Methods:
+        get_token(user): Return a refresh token for `user` with the extra claims.
+        set_user_claims(token, user): Stamp the user claims of `user` into `token`.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        cls.set_user_claims(token, user)
+        return token
+
+    @staticmethod
+    def set_user_claims(token, user):
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        token["username"] = user.username
+        token["is_staff"] = user.is_staff
+        token["is_superuser"] = user.is_superuser
+
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Token refresh serializer (`POST /api/token/refresh/`) that checks the blacklist through the
+    in-memory filter of `users.blacklist`, so refreshing a token that was never blacklisted does
+    not query `BlacklistedToken`.
+
+    The token's user is resolved like an authenticated request (see `CachedJWTAuthentication`):
+    a refresh token of a deleted or inactive user, or one issued before the user's `token_version`
+    changed, is rejected with 401. The new tokens carry the user's current claims, so a user
+    demoted from staff does not keep the staff claim by refreshing.
+
+    Methods:
+        validate(attrs): Check the token and its user, and return the new token(s).
+    """
+
+    token_class = FilteredRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = CachedJWTAuthentication().get_user(refresh)
+        UserTokenObtainPairSerializer.set_user_claims(refresh, user)
+
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+        return data
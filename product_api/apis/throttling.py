@@ -0,0 +1,205 @@
+import math
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+"""
+Token-bucket rate limiting for the auth and write endpoints.
+
+Each limited client has a token bucket per limit: it holds up to `capacity` tokens, refills at
+`capacity / period` tokens per second, and every request takes one token. A request finding its
+bucket empty is rejected with `429 Too Many Requests` and a `Retry-After` header giving the
+seconds until the next token (DRF adds the header from `TokenBucketThrottle.wait()`).
+
+Limits are configured per view scope and action in the `RATE_LIMITS` setting, with a rate for
+authenticated users (`"user"`, keyed by user id) and/or for client addresses (`"ip"`, keyed like
+DRF's throttles, honouring `NUM_PROXIES`). A request must find a token in every bucket that applies
+to it. Views opt in by setting `throttle_scope`; the action is the viewset action, or the
+lowercase HTTP method for plain views:
+
+    RATE_LIMITS = {
+        "orders.create": {"user": "30/min", "ip": "120/min"},
+        "token.post": {"ip": "20/min"},
+    }
+
+A bucket is one integer in the default cache, only changed with the cache's atomic `incr` and
+`decr`: the number of tokens ever taken from it. The tokens ever credited to a bucket are
+`refill_rate * time.time()`, so the tokens left are the difference, capped at the capacity. A
+new (or evicted) bucket is added full, and its expiry is moved to the moment it would be full
+again, after which it is not needed. Concurrent requests on any worker can thus never take the
+same token.
+
+To spare most requests the cache round trip, a process takes `BATCH_FRACTION` of the capacity at
+a time with a single `incr` and hands the tokens out locally; tokens beyond what the bucket held
+are given back with `decr`. Locally held tokens were already taken from the bucket, so the limit
+still holds across workers, but a process holding tokens for a client the next requests do not
+reach leaves that client fewer. Held tokens are dropped after a period.
+
+The limits hold across every worker sharing the cache, i.e. with `REDIS_URL` set (see the
+settings); with the local-memory cache every process has its own buckets.
+
+Classes:
+    - TokenBucketThrottle: The DRF throttle applying `RATE_LIMITS`.
+
+Functions:
+    - parse_rate(rate): Parse `"<tokens>/<period>"` into a capacity and a refill rate.
+    - take_token(key, capacity, refill_rate): Take a token from a bucket.
+"""
+
+BATCH_FRACTION = 0.1
+# Locally held tokens older than a period are dropped once there are this many buckets.
+LOCAL_MAX_BUCKETS = 10000
+PERIODS = {
+    "s": 1,
+    "sec": 1,
+    "m": 60,
+    "min": 60,
+    "h": 3600,
+    "hour": 3600,
+    "d": 86400,
+    "day": 86400,
+}
+RATE_PATTERN = re.compile(r"^(\d+)/(\d*)(\w+)$")
+
+
+def parse_rate(rate):
+    """
+    Parse a rate such as `"30/min"` or `"5/10s"`.
+
+    Returns:
+        tuple: The bucket capacity (tokens) and the refill rate (tokens per second).
+
+    Raises:
+        ValueError: The rate is malformed.
+    """
+    match = RATE_PATTERN.match(rate)
+    if not match or match.group(3) not in PERIODS or int(match.group(1)) < 1:
+        raise ValueError(f"Invalid rate limit {rate!r}.")
+    capacity = int(match.group(1))
+    period = int(match.group(2) or 1) * PERIODS[match.group(3)]
+    return capacity, capacity / period
+
+
+_lock = threading.Lock()
+# (key, capacity, refill_rate) -> [tokens held by this process, when they were taken]
+_local = {}
+
+
+def _full_until(taken, capacity, refill_rate, now):
+    # Seconds until the tokens credited catch up with `taken` plus a full bucket.
+    return max(math.ceil((taken + capacity) / refill_rate - now), 0) + 1
+
+
+def _claim(key, capacity, refill_rate, count):
+    # Take up to `count` tokens from the shared bucket; returns (granted, taken afterwards).
+    now = time.time()
+    credited = math.floor(now * refill_rate)
+    for _ in range(3):
+        try:
+            taken = cache.incr(key, count)
+            break
+        except ValueError:
+            # A new or evicted bucket starts full.
+            cache.add(
+                key,
+                credited - capacity,
+                _full_until(credited - capacity, capacity, refill_rate, now),
+            )
+    else:
+        # The cache keeps dropping the bucket: reject rather than count nothing.
+        return 0, credited
+    granted = max(min(count, capacity, credited - (taken - count)), 0)
+    if granted < count:
+        taken = cache.decr(key, count - granted)
+    if granted:
+        cache.touch(key, _full_until(taken, capacity, refill_rate, now))
+    return granted, taken
+
+
+def take_token(key, capacity, refill_rate):
+    """
+    Take a token from the bucket `key`.
+
+    Args:
+        key (str): The bucket's cache key.
+        capacity (int): The most tokens the bucket holds.
+        refill_rate (float): Tokens added per second.
+
+    Returns:
+        tuple: Whether a token was taken, and the seconds until one is available when not.
+    """
+    local_key = (key, capacity, refill_rate)
+    period = capacity / refill_rate
+    now = time.monotonic()
+    with _lock:
+        held = _local.get(local_key)
+        if held is not None and held[0] > 0 and now - held[1] < period:
+            held[0] -= 1
+            return True, 0
+
+    # The shared bucket is read without the lock; concurrent claims simply both hold tokens.
+    granted, taken = _claim(
+        key, capacity, refill_rate, max(1, int(capacity * BATCH_FRACTION))
+    )
+    if not granted:
+        return False, max((taken + 1) / refill_rate - time.time(), 0)
+    with _lock:
+        if len(_local) >= LOCAL_MAX_BUCKETS:
+            for stale in [
+                k for k, (_, at) in _local.items() if now - at >= k[1] / k[2]
+            ]:
+                del _local[stale]
+        held = _local.setdefault(local_key, [0, now])
+        if now - held[1] >= period:
+            held[0] = 0
+        held[0] += granted - 1
+        held[1] = now
+    return True, 0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Apply the `RATE_LIMITS` of the view's `throttle_scope` and current action.
+
+    Views without a `throttle_scope`, and actions without a configured limit, are not limited.
+
+    Methods:
+        allow_request(request, view): Take a token from every bucket that applies to the request.
+        wait(): Seconds until the request would be allowed.
+    """
+
+    def __init__(self):
+        self.wait_time = None
+
+    def get_limit_key(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        if scope is None:
+            return None
+        action = getattr(view, "action", None) or request.method.lower()
+        return f"{scope}.{action}"
+
+    def allow_request(self, request, view):
+        limit_key = self.get_limit_key(request, view)
+        limits = getattr(settings, "RATE_LIMITS", {}).get(limit_key)
+        if not limits:
+            return True
+
+        idents = {"ip": self.get_ident(request)}
+        if request.user and request.user.is_authenticated:
+            idents["user"] = request.user.pk
+        for kind, ident in idents.items():
+            if kind not in limits:
+                continue
+            key = f"ratelimit:{limit_key}:{kind}:{ident}"
+            allowed, wait = take_token(key, *parse_rate(limits[kind]))
+            if not allowed:
+                self.wait_time = wait
+                return False
+        return True
+
+    def wait(self):
+        return self.wait_time
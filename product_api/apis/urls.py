@@ -2,14 +2,16 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import (TokenObtainPairView,
-                                            TokenRefreshView, TokenVerifyView)
+from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
 
+from apis.views.analytics_view import SalesAnalyticsViewSet
 from apis.views.category_view import CategoryViewSet
 from apis.views.order_views import OrderViewSet
 from apis.views.product_view import ProductViewSet
 from apis.views.review_view import ReviewViewSet
-from apis.views.user_views import LogoutView, RegisterViewSet, UserViewSet
+from apis.views.user_views import (HashingMetricsView, LogoutView,
+                                   RegisterViewSet, TokenObtainView,
+                                   UserViewSet)
 from apis.views.wishlist_view import WishlistViewSet
 
 """
@@ -24,10 +26,16 @@ The `DefaultRouter` from DRF is used to automatically generate URL patterns for
 
 Authentication routes:
 - `/token/`: To obtain a JWT pair (access and refresh token) for authenticated users.
-- `/token/refresh/`: To refresh the JWT access token using the refresh token.
+- `/token/refresh/`: To refresh the JWT access token using the refresh token. The refresh token blacklist is checked
+  through an in-memory filter (see `users.blacklist`).
 - `/token/verify/`: To verify the validity of a JWT access token.
 - `/logout/`: To log the user out by blacklisting the refresh token.
 
+Passwords are hashed on a bounded executor (see `users.hashing`): `/token/` and `/register/` answer 503 with
+`Retry-After` when it is saturated, and `/metrics/hashing/` reports its queue depth and latency (staff only).
+`/token/`, `/register/` and placing orders are rate limited with token buckets (see `apis.throttling`); requests
+over the limit get 429 with `Retry-After`.
+
 Viewset Routes:
 - `/products/`: Product-related operations (CRUD operations on products).
 - `/category/`: Category-related operations (CRUD operations on categories).
@@ -36,6 +44,7 @@ Viewset Routes:
 - `/reviews/`: Review-related operations (CRUD operations on product reviews).
 - `/wishlist/`: Wishlist-related operations (CRUD operations on user's wishlist items).
 - `/register/`: Registration-related operations for user sign-up.
+- `/analytics/sales/`: Sales reports built from the daily sales rollups (staff only).
 
 The static files route (`static()`) is added to serve media files (like images, videos) during development.
 
@@ -58,16 +67,19 @@ router.register(r"orders", OrderViewSet, basename="order")
 router.register(r"reviews", ReviewViewSet, basename="review")
 router.register(r"wishlist", WishlistViewSet, basename="wishlist")
 router.register(r"register", RegisterViewSet, basename="register")
+router.register(r"analytics/sales", SalesAnalyticsViewSet, basename="sales-analytics")
 
 
 urlpatterns = [
     # apps route
     path("", include(router.urls)),
     # authentication route
-    path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path("token/", TokenObtainView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
     path("logout/", LogoutView.as_view(), name="logout"),
+    # password hashing executor metrics (staff only)
+    path("metrics/hashing/", HashingMetricsView.as_view(), name="hashing_metrics"),
 ] + static(
     settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
 )  # to serve media files
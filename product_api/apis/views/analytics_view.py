@@ -0,0 +1,101 @@
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+
+from apis.serializers.analytics_serializer import (
+    RevenuePeriodSerializer,
+    RevenueSeriesQuerySerializer,
+    TopProductSerializer,
+    TopProductsQuerySerializer,
+)
+from order.rollups import get_revenue_series, get_top_products
+from users.authentication import CachedJWTAuthentication
+
+
+class SalesAnalyticsViewSet(viewsets.ViewSet):
+    """
+    Staff-only sales reports.
+
+    The reports read the daily sales rollups (see `order.rollups`), never the order tables, so
+    they cost a scan of a few rollup rows per day reported. The rollups are as fresh as the last
+    `refresh_sales_rollups` run.
+
+    Every report accepts `start` and `end` (YYYY-MM-DD, the last 30 days by default), one or
+    more `order_status` (paid, shipped and delivered orders by default) and `category`.
+
+    Attributes:
+        authentication_classes (list): Specifies that JWT authentication is required.
+        permission_classes (list): Restricts the reports to staff users.
+
+    Methods:
+        revenue(request): Revenue, units and orders per `interval` (`GET /api/analytics/sales/revenue/`).
+        top_products(request): The best-selling products (`GET /api/analytics/sales/top-products/`).
+    """
+
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    @action(detail=False, methods=["get"])
+    def revenue(self, request):
+        """
+        Return the revenue series between `start` and `end`.
+
+        Query parameters:
+            interval: `day`, `week` or `month` (default `day`).
+            product: Only report this product.
+
+        Returns:
+            Response: `{"start", "end", "interval", "results"}`, with one result per period
+                      that had sales, oldest first.
+        """
+        query = RevenueSeriesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        series = get_revenue_series(
+            params["start"],
+            params["end"],
+            interval=params["interval"],
+            statuses=params["statuses"],
+            product=params.get("product"),
+            category=params.get("category"),
+        )
+        return Response(
+            {
+                "start": params["start"],
+                "end": params["end"],
+                "interval": params["interval"],
+                "results": RevenuePeriodSerializer(series, many=True).data,
+            }
+        )
+
+    @action(detail=False, methods=["get"], url_path="top-products")
+    def top_products(self, request):
+        """
+        Return the best-selling products between `start` and `end`.
+
+        Query parameters:
+            limit: The number of products (default 10, at most 100).
+            order_by: `revenue` (default) or `units`.
+
+        Returns:
+            Response: `{"start", "end", "results"}`, best first.
+        """
+        query = TopProductsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        products = get_top_products(
+            params["start"],
+            params["end"],
+            limit=params["limit"],
+            order_by=params["order_by"],
+            statuses=params["statuses"],
+            category=params.get("category"),
+        )
+        return Response(
+            {
+                "start": params["start"],
+                "end": params["end"],
+                "results": TopProductSerializer(products, many=True).data,
+            }
+        )
@@ -1,14 +1,18 @@
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.filters import OrderingFilter, SearchFilter
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.response import Response
 
+from apis.mixins import ConditionalGetMixin, QueryPlanningMixin
 from apis.permissions import IsAdminOrReadOnly
 from apis.serializers.category_serializer import CategorySerializer
+from product.category_tree import get_category_tree
 from product.models.category import Category
+from users.authentication import CachedJWTAuthentication
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, QueryPlanningMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing category instances.
 
@@ -16,7 +20,9 @@ class CategoryViewSet(viewsets.ModelViewSet):
     objects. It uses JWT authentication and custom permissions to ensure that only
     admins can create, update, or delete categories, while read-only access is allowed
     for non-admin users. The viewset also supports filtering, searching, and ordering
-    of categories based on specific fields.
+    of categories based on specific fields. List and detail responses carry `ETag` and
+    `Last-Modified` validators derived from `updated_at` (see `ConditionalGetMixin`), and
+    `?fields=`/`?omit=` narrow both the response and the selected columns.
 
     Attributes:
         queryset (QuerySet): A queryset that retrieves all Category objects.
@@ -31,6 +37,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
         search_fields (list): Defines the fields that can be searched.
         ordering_fields (list): Defines the fields by which categories can be ordered.
         ordering (list): Specifies the default ordering of categories by their name.
+        last_modified_field (str): The timestamp field the conditional GET validators are built from.
 
     Methods:
         list(request): List all categories with optional filtering, searching, and
@@ -40,12 +47,13 @@ class CategoryViewSet(viewsets.ModelViewSet):
         update(request, pk): Update an existing category (admin only).
         partial_update(request, pk): Partially update a category (admin only).
         destroy(request, pk): Delete a category (admin only).
+        tree(request): Return the whole nested category hierarchy with product counts.
     """
 
     queryset = Category.objects.all()
     # queryset = Category.objects.all().order_by('name')  # Ensure ordering by name
     serializer_class = CategorySerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAdminOrReadOnly]
 
     # Add filtering, searching, and ordering backends
@@ -54,3 +62,18 @@ class CategoryViewSet(viewsets.ModelViewSet):
     search_fields = ["name", "parent_category__name"]
     ordering_fields = ["name", "parent_category__name"]
     ordering = ["name"]
+    last_modified_field = "updated_at"
+
+    @action(detail=False, methods=["get"], pagination_class=None)
+    def tree(self, request):
+        """
+        Return the full category hierarchy as nested nodes, unpaginated.
+
+        The tree is built from one flat query and served from a cache that is invalidated
+        whenever a category or a product category assignment changes.
+
+        Returns:
+            Response: The root categories, each with `product_count`, `total_product_count`
+                      and nested `subcategories`.
+        """
+        return Response(get_category_tree())
@@ -1,15 +1,31 @@
+from django.http import Http404
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
 from rest_framework.filters import OrderingFilter, SearchFilter
-from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
 
+from apis.mixins import IdempotentMixin, QueryPlanningMixin
 from apis.permissions import IsOrderOwner
-from apis.serializers.order_serializer import OrderSerializer
-from order.models import Order
+from apis.serializers.order_serializer import (
+    ArchivedOrderSerializer,
+    CheckoutSerializer,
+    OrderHistorySerializer,
+    OrderSerializer,
+    OrderTransitionSerializer,
+)
+from order.archive import (
+    get_archived_order,
+    get_order_history,
+    load_orders,
+    union_order_keys,
+)
+from order.models import ArchivedOrder, Order
+from users.authentication import CachedJWTAuthentication
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(IdempotentMixin, QueryPlanningMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing order instances.
 
@@ -17,7 +33,14 @@ class OrderViewSet(viewsets.ModelViewSet):
     It uses JWT authentication and custom permissions to ensure that only authenticated
     users can perform these actions. Additionally, users can only interact with their own orders
     due to the custom permission `IsOrderOwner`. The viewset also supports filtering, searching,
-    and ordering of orders based on specific fields.
+    and ordering of orders based on specific fields. `?fields=`/`?omit=` narrow both the
+    response and the selected columns (see `QueryPlanningMixin`). Unsafe requests that carry an
+    `Idempotency-Key` header run at most once; retries get the stored response (see
+    `IdempotentMixin`).
+    Closed orders are moved to an archive table after a while (see `order.archive`); the
+    list and detail routes still find them, read-only, and `history` lists hot and archived
+    orders together as compact rows. Placing orders (`create`, `checkout`) is rate limited per user and per client
+    address (see `apis.throttling`).
 
     Attributes:
         queryset (QuerySet): A queryset that retrieves all Order objects.
@@ -33,23 +56,30 @@ class OrderViewSet(viewsets.ModelViewSet):
         search_fields (list): Defines the fields that can be searched for orders.
         ordering_fields (list): Defines the fields by which orders can be ordered.
         ordering (list): Specifies the default ordering of orders by the user's ID.
+        throttle_scope (str): The `RATE_LIMITS` scope of the viewset's actions.
 
     Methods:
-        list(request): List all orders for the logged-in user, with optional filtering, searching,
-                      and ordering.
+        list(request): List all orders for the logged-in user, hot and archived, with optional
+                      filtering, searching, and ordering.
         create(request): Create a new order for the logged-in user.
-        retrieve(request, pk): Retrieve a single order by ID for the logged-in user.
+        retrieve(request, pk): Retrieve a single order by ID for the logged-in user, falling back to
+                               the user's archived orders.
         update(request, pk): Update an existing order (user can only modify their own orders).
         partial_update(request, pk): Partially update an order (user can only modify their own orders).
         destroy(request, pk): Delete an order (user can only delete their own orders).
         get_queryset(): Returns only the orders for the logged-in user.
+        get_archived_queryset(): Returns the archived orders of the logged-in user, filtered like
+                                 the list.
         perform_create(serializer): Automatically associates the logged-in user with the order when creating it.
+        checkout(request): Place a multi-item order (`POST /api/orders/checkout/`) in one transaction.
+        transition(request): Move many orders to one status (`POST /api/orders/transition/`, staff only).
+        history(request): List the user's hot and archived orders, newest first (`GET /api/orders/history/`).
 
     """
 
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated, IsOrderOwner]
 
     # Add filtering, searching, and ordering backends
@@ -70,6 +100,7 @@ class OrderViewSet(viewsets.ModelViewSet):
     ]
     ordering_fields = ["user", "product", "order_status"]
     ordering = ["user"]
+    throttle_scope = "orders"
 
     def get_queryset(self):
         """
@@ -78,7 +109,62 @@ class OrderViewSet(viewsets.ModelViewSet):
         Returns:
             QuerySet: The queryset of orders filtered by the currently authenticated user.
         """
-        return self.queryset.filter(user=self.request.user)
+        return super().get_queryset().filter(user=self.request.user)
+
+    def get_archived_queryset(self):
+        """
+        Return the logged-in user's archived orders, narrowed by the same filters and search as
+        the hot orders (`ArchivedOrder` has the same filterable fields as `Order`).
+        """
+        queryset = ArchivedOrder.objects.filter(user=self.request.user)
+        for backend in self.filter_backends:
+            if backend is not OrderingFilter:
+                queryset = backend().filter_queryset(self.request, queryset, self)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        List the logged-in user's orders, hot and archived.
+
+        The keys of the filtered orders of both tables are combined with one `UNION ALL` query,
+        which is ordered, counted and sliced by the database (see `order.archive.union_order_keys`);
+        only the orders of the page are then loaded, one query per table. Archived orders are
+        rendered by `ArchivedOrderSerializer`, with `archived` set.
+        """
+        hot = self.filter_queryset(self.get_queryset())
+        archived = self.get_archived_queryset()
+        ordering = OrderingFilter().get_ordering(request, hot, self) or []
+        keys = union_order_keys(hot, archived, ordering)
+        page = self.paginate_queryset(keys)
+        orders = load_orders(keys if page is None else page, hot, archived)
+        context = self.get_serializer_context()
+        data = [
+            (
+                ArchivedOrderSerializer(order, context=context)
+                if isinstance(order, ArchivedOrder)
+                else self.get_serializer(order)
+            ).data
+            for order in orders
+        ]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve an order of the logged-in user, looking in the archive when it is not in the
+        hot table any more.
+        """
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            try:
+                archived = get_archived_order(request.user, int(kwargs["pk"]))
+            except ValueError:
+                archived = None
+            if archived is None:
+                raise
+            return Response(ArchivedOrderSerializer(archived).data)
 
     def perform_create(self, serializer):
         """
@@ -89,3 +175,70 @@ class OrderViewSet(viewsets.ModelViewSet):
             serializer (OrderSerializer): The serializer containing validated order data.
         """
         serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=["post"], serializer_class=CheckoutSerializer)
+    def checkout(self, request):
+        """
+        Place a cart of several products as one order.
+
+        Stock for every line is checked and taken in a single transaction (see
+        `order.checkout`); if any line cannot be fulfilled, nothing is ordered.
+
+        Request body:
+            {"items": [{"product": 1, "quantity": 2}, ...], "shipping_address": "..."}
+
+        Returns:
+            Response: The created order, including its `items`, with status 201.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[IsAuthenticated, IsAdminUser],
+        serializer_class=OrderTransitionSerializer,
+    )
+    def transition(self, request):
+        """
+        Move many orders, of any customer, to one status.
+
+        Every move is checked against the order state machine (see `order.transitions`); the
+        allowed ones are applied with one `UPDATE` per batch, and only cancellations, refunds
+        and payment confirmations touch stock. Orders that cannot move are reported, not
+        changed.
+
+        Request body:
+            {"orders": [1, 2, 3], "order_status": "Shipped"}
+
+        Returns:
+            Response: `order_status`, the `updated` order ids and the `rejected` ones with the
+                      reason, with status 200.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+    @action(detail=False, methods=["get"], serializer_class=OrderHistorySerializer)
+    def history(self, request):
+        """
+        List every order of the logged-in user, hot and archived, newest first.
+
+        Both tables are read with one `UNION ALL` query (see `order.archive.get_order_history`),
+        which the paginator counts and slices in the database. `?order_status=` narrows the
+        history to one status.
+
+        Returns:
+            Response: A page of order history rows, each with an `archived` flag.
+        """
+        history = get_order_history(
+            request.user, request.query_params.get("order_status")
+        )
+        page = self.paginate_queryset(history)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        return Response(self.get_serializer(history, many=True).data)
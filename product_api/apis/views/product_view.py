@@ -1,21 +1,44 @@
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
-from rest_framework.filters import OrderingFilter, SearchFilter
-from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
-from rest_framework_simplejwt.authentication import JWTAuthentication
-
+from rest_framework.filters import OrderingFilter
+from rest_framework.parsers import FormParser, MultiPartParser
+
+from apis.filters import ProductSearchFilter
+from apis.mixins import (CachedResponseMixin, ConditionalGetMixin,
+                         QueryPlanningMixin)
+from apis.pagination import KeysetPagination
+from apis.parsers import ORJSONParser
 from apis.permissions import IsAdminOrReadOnly
 from apis.serializers.product_serializers import (ProductImageSerializer,
                                                   ProductSerializer)
+from product.cache import CATALOG_NAMESPACE
+from product.facets import DEFAULT_PRICE_RANGES, get_product_facets
 from product.models import Category
 from product.models.product import Product
 from product.models.product_image import ProductImage
+from product.stock import annotate_sharded_stock
+from users.authentication import CachedJWTAuthentication
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(
+    CachedResponseMixin,
+    ConditionalGetMixin,
+    QueryPlanningMixin,
+    viewsets.ModelViewSet,
+):
     """
     A viewset for viewing and editing product instances.
 
+    Relations rendered by `ProductSerializer` (images and categories) are prefetched by
+    `QueryPlanningMixin`, so a list page runs a fixed number of queries whatever its size.
+    List and detail responses are cached by `CachedResponseMixin` in the catalog namespace, which
+    the signal receivers in `product.signals` invalidate whenever catalog data changes.
+    `ConditionalGetMixin` adds `ETag`/`Last-Modified` validators derived from `updated_date`.
+    `?fields=`/`?omit=` narrow the response; only the matching columns are selected and the image
+    and category prefetches are skipped when those fields are not requested.
+    The summed stock of products with sharded inventory is annotated onto the same query (see
+    `product.stock`) and feeds the `ETag`, since shard updates do not touch `updated_date`.
+
     This viewset allows authenticated users to view, create, update, and delete products.
     It uses JWT authentication and custom permissions to ensure that only authorized users
     (admin or read-only for others) can perform these actions. The viewset also supports filtering,
@@ -29,13 +52,19 @@ class ProductViewSet(viewsets.ModelViewSet):
         permission_classes (list): Specifies the permissions required to access or modify products,
                                    including `IsAdminOrReadOnly` for admin or read-only access.
         parser_classes (list): Specifies the parsers to handle file uploads and JSON parsing,
-                               enabling `MultiPartParser`, `FormParser`, and `JSONParser`.
+                               enabling `MultiPartParser`, `FormParser`, and `ORJSONParser`.
         filter_backends (list): A list of filter backends that enable filtering, searching, and ordering
-                               on the products.
+                               on the products. `?search=` is served by `ProductSearchFilter`, a ranked
+                               full-text search over name, description and category names.
         filterset_fields (list): Defines the fields that can be used for filtering products.
-        search_fields (list): Defines the fields that can be searched for products.
         ordering_fields (list): Defines the fields by which products can be ordered.
         ordering (list): Specifies the default ordering of products by price.
+        cache_namespace (str): The versioned cache namespace list/detail responses are stored in.
+        facet_price_ranges (list): The `(low, high)` price buckets reported by `?facets=true`.
+        last_modified_field (str): The timestamp field the conditional GET validators are built from.
+        cursor_pagination_class (KeysetPagination): Pagination used instead of the default
+                                                    limit/offset pagination when the client
+                                                    sends `?pagination=cursor` or a `cursor`.
 
     Methods:
         list(request): List all products with optional filtering, searching, and ordering.
@@ -46,25 +75,74 @@ class ProductViewSet(viewsets.ModelViewSet):
         destroy(request, pk): Delete a product.
         perform_create(serializer): Handle product creation and image upload.
         get_queryset(): Override the default queryset to filter products based on the selected category.
+        paginator: Select keyset pagination for cursor requests, limit/offset otherwise.
+        paginate_queryset(queryset): Compute facet counts for the filtered queryset when requested.
+        get_paginated_response(data): Add the facet counts (if any) to the paginated response.
+        get_validator_state(): Make the facet counts part of the conditional GET validators.
+        get_validators(rows, state): Make the sharded stock of the rows part of the validators.
 
     """
 
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAdminOrReadOnly]
     parser_classes = [
         MultiPartParser,
         FormParser,
-        JSONParser,
+        ORJSONParser,
     ]  # Enable file uploads and enable JSON parsing
 
     # Add filtering, searching, and ordering backends
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, ProductSearchFilter]
     filterset_fields = ["name", "price", "stock_quantity", "categories__name"]
-    search_fields = ["name", "stock_quantity", "categories__name"]
     ordering_fields = ["name", "price"]
     ordering = ["price"]
+    cursor_pagination_class = KeysetPagination
+    cache_namespace = CATALOG_NAMESPACE
+    last_modified_field = "updated_date"
+    facet_price_ranges = DEFAULT_PRICE_RANGES
+    facets = None
+
+    @property
+    def paginator(self):
+        """
+        Return the paginator for this request.
+
+        Deep catalog pages are served with keyset pagination (no OFFSET scan, no COUNT query)
+        when the client opts in with `?pagination=cursor`; the `next`/`previous` links it returns
+        carry a `cursor` parameter, which keeps subsequent requests in cursor mode.
+        """
+        if not hasattr(self, "_paginator"):
+            query_params = self.request.query_params
+            if query_params.get("pagination") == "cursor" or query_params.get("cursor"):
+                self._paginator = self.cursor_pagination_class()
+        return super().paginator
+
+    def paginate_queryset(self, queryset):
+        """
+        Paginate the filtered queryset, computing facet counts first when `?facets=true` is sent.
+
+        The facets are computed from the same queryset the page is cut from, so they honour every
+        filter (`filterset_fields`, `?category=`, `?search=`) applied to the listing.
+        """
+        if self.request.query_params.get("facets", "").lower() in ("1", "true", "yes"):
+            self.facets = get_product_facets(queryset, self.facet_price_ranges)
+        return super().paginate_queryset(queryset)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.facets is not None:
+            response.data["facets"] = self.facets
+        return response
+
+    def get_validator_state(self):
+        # Facet counts depend on rows outside the page, so they feed the ETag as well.
+        return [self.facets]
+
+    def get_validators(self, rows, state):
+        sharded_stock = [getattr(row, "sharded_stock", None) for row in rows]
+        return super().get_validators(rows, state + [sharded_stock])
 
     def perform_create(self, serializer):
         """
@@ -89,22 +167,30 @@ class ProductViewSet(viewsets.ModelViewSet):
         Override the default queryset to filter products based on the selected category.
 
         The method checks if a category is specified in the query parameters and filters products
-        to show only those belonging to the selected category or its subcategories.
+        to show only those belonging to the selected category or any of its descendants, however
+        deep, using the materialized `Category.path`.
+
+        Products are annotated with their summed shard stock (`sharded_stock`).
 
         Returns:
             QuerySet: The queryset of products filtered by category (if provided).
         """
-        queryset = super().get_queryset()
+        queryset = annotate_sharded_stock(super().get_queryset())
 
         # Get category filter from query parameters
         category_query = self.request.query_params.get("category", None)
 
         if category_query:
             # Get the selected category and its subcategories
-            category = Category.objects.filter(name=category_query).first()
+            category = Category.objects.filter(name=category_query).only("path").first()
             if category:
-                # Filter products in the selected category
-                queryset = queryset.filter(categories=category)
+                # Filter products in the selected category or any category below it, through one
+                # prefix match on the materialized category path
+                queryset = queryset.filter(
+                    pk__in=Product.categories.through.objects.filter(
+                        category__path__startswith=category.path
+                    ).values("product_id")
+                )
 
         return queryset
 
@@ -4,16 +4,17 @@ from django.db import IntegrityError
 from rest_framework import viewsets
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from apis.mixins import ConditionalGetMixin, QueryPlanningMixin
 from apis.serializers.review_serializer import ReviewSerializer
 from product.models.review import Review
+from users.authentication import CachedJWTAuthentication
 
 # Setting up a logger for the viewset
 logger = logging.getLogger(__name__)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ConditionalGetMixin, QueryPlanningMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing review instances.
 
@@ -21,7 +22,10 @@ class ReviewViewSet(viewsets.ModelViewSet):
     all users to view reviews. The viewset uses JWT authentication and enforces
     permissions so that only authenticated users can create reviews, while all users
     can read them. Additionally, the viewset handles integrity errors and ensures that
-    a user cannot submit multiple reviews for the same product.
+    a user cannot submit multiple reviews for the same product. The reviewing user shown by
+    `ReviewSerializer` is joined in by `QueryPlanningMixin` instead of being loaded per review.
+    List and detail responses carry `ETag` and `Last-Modified` validators derived from
+    `updated_at` and the reviewing users' names (see `ConditionalGetMixin`).
 
     Attributes:
         queryset (QuerySet): A queryset that retrieves all Review objects.
@@ -31,18 +35,26 @@ class ReviewViewSet(viewsets.ModelViewSet):
         permission_classes (list): Specifies the permissions required to access or modify reviews,
                                    including `IsAuthenticatedOrReadOnly` for authenticated users to post
                                    and all users to read.
+        last_modified_field (str): The timestamp field the conditional GET validators are built from.
 
     Methods:
+        get_validators(rows, state): Make the reviewing users' names part of the validators.
         perform_create(serializer): Override the default perform_create method to handle review creation,
                                     ensure users can only review a product once, and handle integrity errors.
     """
 
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [
         IsAuthenticatedOrReadOnly
     ]  # Authenticated users can post, all users can read
+    last_modified_field = "updated_at"
+
+    def get_validators(self, rows, state):
+        # The user is rendered by name and joined in, so renaming it changes the ETag for free.
+        users = [str(row.user) if row.user_id else None for row in rows]
+        return super().get_validators(rows, state + [users])
 
     def perform_create(self, serializer):
         """
@@ -1,10 +1,12 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from product.models.category import Category
+from product.models.product import Product
 
 
 class CategoryViewSetTest(APITestCase):
@@ -127,3 +129,52 @@ class CategoryViewSetTest(APITestCase):
         self.assertTrue(len(response.data) > 0, "No data found in response.")
         # Check if the response is successful
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_category_tree(self):
+        """Test that the tree endpoint returns the nested hierarchy with product counts."""
+        cache.clear()
+        phones = Category.objects.create(name="Phones", parent_category=self.category1)
+        product = Product.objects.create(name="Phone X", price=10, stock_quantity=1)
+        product.categories.add(phones, self.category1)
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/category/tree/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        [electronics] = response.data
+        self.assertEqual(electronics["name"], "Electronics")
+        self.assertEqual(electronics["product_count"], 1)
+        self.assertEqual(electronics["total_product_count"], 2)
+        self.assertEqual(
+            [child["name"] for child in electronics["subcategories"]],
+            ["Clothing", "Phones"],
+        )
+
+        # Served from the cache until a category changes
+        with self.assertNumQueries(0):
+            self.client.get("/api/category/tree/")
+
+        Category.objects.create(name="Books")
+        response = self.client.get("/api/category/tree/")
+        self.assertEqual(
+            [node["name"] for node in response.data], ["Books", "Electronics"]
+        )
+
+    def test_category_conditional_get(self):
+        """Test that category list and detail responses honour `If-None-Match`."""
+        for url in ("/api/category/", f"/api/category/{self.category1.id}/"):
+            etag = self.client.get(url)["ETag"]
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.category1.name = "Electronics & Gadgets"
+        self.category1.save()
+        response = self.client.get("/api/category/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_category_omit_fields(self):
+        """Test that `?omit=` drops fields from the category list response."""
+        response = self.client.get("/api/category/?omit=created_at,updated_at,path")
+        self.assertEqual(
+            set(response.data["results"][0]), {"id", "name", "parent_category"}
+        )
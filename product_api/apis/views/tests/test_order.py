@@ -1,10 +1,22 @@
+from datetime import timedelta
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from order.models import Order
+from apis.views.order_views import OrderViewSet
+from order.archive import archive_orders
+from order.checkout import checkout
+from order.models import Order, OrderItem
+from order.reservations import get_available_quantity
+from order.rollups import backfill_sales_rollups
 from product.models.product import Product
+from users.models import IdempotencyKey
 
 
 class OrderViewSetTest(APITestCase):
@@ -88,6 +100,38 @@ class OrderViewSetTest(APITestCase):
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    @override_settings(RATE_LIMITS={"orders.create": {"user": "1/min"}})
+    def test_create_order_rate_limit(self):
+        """
+        Test that order creation is rate limited per user, with a Retry-After header.
+        """
+        cache.clear()
+        url = "/api/orders/"
+        data = {
+            "product": self.product2.id,
+            "quantity": 1,
+            "shipping_address": "Address4",
+            "total_price": 200,
+        }
+        response = self.client.post(
+            url, data, HTTP_AUTHORIZATION=f"Bearer {self.token_user1}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(
+            url, data, HTTP_AUTHORIZATION=f"Bearer {self.token_user1}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertLessEqual(int(response["Retry-After"]), 60)
+
+        # Other users, and the read endpoints, are not affected.
+        response = self.client.post(
+            url, data, HTTP_AUTHORIZATION=f"Bearer {self.token_user2}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.token_user1}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_order_access_permissions(self):
         """
         Test that users can only access their own orders.
@@ -123,7 +167,7 @@ class OrderViewSetTest(APITestCase):
         """
         url = f"/api/orders/{self.order1.id}/"
         data = {
-            "order_status": "Shipped",
+            "order_status": "Payment_Confirmed",
             "quantity": 3,
         }
 
@@ -132,7 +176,7 @@ class OrderViewSetTest(APITestCase):
             url, data, HTTP_AUTHORIZATION=f"Bearer {self.token_user1}"
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data["order_status"], "Shipped")
+        self.assertEqual(response.data["order_status"], "Payment_Confirmed")
         self.assertEqual(response.data["quantity"], 3)
 
         # Test user2 trying to update user1's order
@@ -141,6 +185,34 @@ class OrderViewSetTest(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_order_update_rejects_invalid_transition(self):
+        """
+        Test that a status change the order state machine does not allow is rejected.
+        """
+        url = f"/api/orders/{self.order1.id}/"
+        for order_status in ["Shipped", "Delivered"]:
+            response = self.client.patch(
+                url,
+                {"order_status": order_status},
+                HTTP_AUTHORIZATION=f"Bearer {self.token_user1}",
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(
+                response.data["order_status"],
+                [f"Cannot move from Pending to {order_status}."],
+            )
+
+        self.order1.order_status = "Canceled"
+        self.order1.save()
+        response = self.client.patch(
+            url,
+            {"order_status": "Pending"},
+            HTTP_AUTHORIZATION=f"Bearer {self.token_user1}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.order1.refresh_from_db()
+        self.assertEqual(self.order1.order_status, "Canceled")
+
     def test_order_delete(self):
         """
         Test deleting an order. Users can only delete their own orders.
@@ -170,3 +242,487 @@ class OrderViewSetTest(APITestCase):
         url = "/api/orders/?ordering=user"
         response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.token_user1}")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_order_sparse_fields(self):
+        """
+        Test that `?fields=` narrows the order list response.
+        """
+        url = "/api/orders/?fields=id,order_status"
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.token_user1}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for item in response.data["results"]:
+            self.assertEqual(set(item), {"id", "order_status"})
+
+
+class OrderCheckoutTest(APITestCase):
+    url = "/api/orders/checkout/"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="buyer", email="buyer@example.com", password="password123"
+        )
+        self.token = RefreshToken.for_user(self.user).access_token
+        self.keyboard = Product.objects.create(
+            name="Keyboard", price="49.90", stock_quantity=5
+        )
+        self.mouse = Product.objects.create(
+            name="Mouse", price="19.50", stock_quantity=2
+        )
+
+    def post(self, data):
+        return self.client.post(
+            self.url, data, format="json", HTTP_AUTHORIZATION=f"Bearer {self.token}"
+        )
+
+    def available(self, product):
+        product.refresh_from_db()
+        return get_available_quantity(product)
+
+    def test_checkout(self):
+        """
+        Test that a cart is placed as one order with a line per product and one total.
+        """
+        response = self.post(
+            {
+                "items": [
+                    {"product": self.keyboard.id, "quantity": 2},
+                    {"product": self.mouse.id, "quantity": 1},
+                    {"product": self.keyboard.id, "quantity": 1},
+                ],
+                "shipping_address": "1 Cart Street",
+            }
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["total_price"], "169.20")  # 3 * 49.90 + 19.50
+        self.assertEqual(response.data["quantity"], 4)
+        self.assertEqual(response.data["user"], self.user.id)
+        lines = {item["product"]: item for item in response.data["items"]}
+        self.assertEqual(lines[self.keyboard.id]["quantity"], 3)
+        self.assertEqual(lines[self.mouse.id]["line_total"], "19.50")
+        self.assertEqual(self.available(self.keyboard), 2)
+        self.assertEqual(self.available(self.mouse), 1)
+        # The stock is only held until the payment is confirmed.
+        self.assertEqual(self.keyboard.stock_quantity, 5)
+
+    def test_checkout_insufficient_stock_places_nothing(self):
+        """
+        Test that one line without enough stock rejects the whole cart.
+        """
+        response = self.post(
+            {
+                "items": [
+                    {"product": self.keyboard.id, "quantity": 1},
+                    {"product": self.mouse.id, "quantity": 3},
+                ],
+                "shipping_address": "1 Cart Street",
+            }
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(self.mouse.id), response.data["items"])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.available(self.keyboard), 5)
+        self.assertEqual(self.available(self.mouse), 2)
+
+    def test_checkout_unknown_product(self):
+        """
+        Test that a line for a product that does not exist is rejected.
+        """
+        response = self.post(
+            {"items": [{"product": 999999, "quantity": 1}], "shipping_address": "x"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("999999", response.data["items"])
+
+    def test_checkout_empty_cart(self):
+        """
+        Test that an empty cart is rejected.
+        """
+        response = self.post({"items": [], "shipping_address": "x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_checkout_requires_authentication(self):
+        """
+        Test that anonymous users cannot check out.
+        """
+        response = self.client.post(self.url, {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_checkout_order_lines_are_read_only(self):
+        """
+        Test that the product and quantity of a checkout order cannot be patched.
+        """
+        response = self.post(
+            {
+                "items": [
+                    {"product": self.keyboard.id, "quantity": 2},
+                    {"product": self.mouse.id, "quantity": 1},
+                ],
+                "shipping_address": "1 Cart Street",
+            }
+        )
+        url = f"/api/orders/{response.data['id']}/"
+        response = self.client.patch(
+            url,
+            {"quantity": 1, "product": self.keyboard.id},
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("quantity", response.data)
+        self.assertIn("product", response.data)
+        self.assertEqual(Order.objects.get().quantity, 3)
+        self.assertEqual(self.available(self.keyboard), 3)
+        self.assertEqual(self.available(self.mouse), 1)
+
+        # Other fields can still be changed.
+        response = self.client.patch(
+            url,
+            {"shipping_address": "2 Cart Street", "quantity": 3},
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_delete_checkout_order_restores_stock(self):
+        """
+        Test that deleting a checkout order releases the stock of all its lines.
+        """
+        response = self.post(
+            {
+                "items": [
+                    {"product": self.keyboard.id, "quantity": 2},
+                    {"product": self.mouse.id, "quantity": 2},
+                ],
+                "shipping_address": "1 Cart Street",
+            }
+        )
+        response = self.client.delete(
+            f"/api/orders/{response.data['id']}/",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(self.available(self.keyboard), 5)
+        self.assertEqual(self.available(self.mouse), 2)
+
+
+class OrderIdempotencyTest(APITestCase):
+    url = "/api/orders/"
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="retrier", email="retrier@example.com", password="password123"
+        )
+        self.other = get_user_model().objects.create_user(
+            username="other", email="other@example.com", password="password123"
+        )
+        self.product = Product.objects.create(name="Retry", price=10, stock_quantity=5)
+        self.data = {
+            "product": self.product.id,
+            "quantity": 2,
+            "shipping_address": "1 Retry Road",
+        }
+
+    def post(self, data, key, user=None):
+        token = RefreshToken.for_user(user or self.user).access_token
+        return self.client.post(
+            self.url,
+            data,
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_response(self):
+        """
+        Test that retrying a POST with the same key places one order and replays its response.
+        """
+        first = self.post(self.data, "key-1")
+        retry = self.post(self.data, "key-1")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(get_available_quantity(self.product), 3)
+
+    def test_key_reused_for_different_request(self):
+        """
+        Test that a key cannot be reused with a different body.
+        """
+        self.post(self.data, "key-1")
+        response = self.post({**self.data, "quantity": 1}, "key-1")
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        """
+        Test that the same key sent by two users places two orders.
+        """
+        self.post(self.data, "key-1")
+        response = self.post(self.data, "key-1", user=self.other)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_failed_request_releases_key(self):
+        """
+        Test that a rejected request does not burn its key.
+        """
+        response = self.post({**self.data, "quantity": 50}, "key-1")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_in_flight_duplicate(self):
+        """
+        Test that a duplicate of a request still in flight gets 409 once it stops waiting.
+        """
+        IdempotencyKey.objects.create(
+            user=self.user,
+            key="key-1",
+            request_fingerprint="in-flight",
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        with mock.patch.object(OrderViewSet, "idempotency_wait_timeout", 0):
+            with mock.patch.object(
+                OrderViewSet,
+                "get_request_fingerprint",
+                return_value="in-flight",
+            ):
+                response = self.post(self.data, "key-1")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Order.objects.exists())
+
+    def test_expired_key_is_claimed_again(self):
+        """
+        Test that an expired key no longer replays its response.
+        """
+        self.post(self.data, "key-1")
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.post(self.data, "key-1")
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class OrderTransitionEndpointTest(APITestCase):
+    def setUp(self):
+        self.staff = get_user_model().objects.create_superuser(
+            username="ops", email="ops@example.com", password="password123"
+        )
+        self.customer = get_user_model().objects.create_user(
+            username="buyer", email="buyer@example.com", password="password123"
+        )
+        product = Product.objects.create(name="Boxed", price=10, stock_quantity=10)
+        self.paid = [
+            Order.objects.create(
+                user=self.customer,
+                product=product,
+                quantity=1,
+                total_price=10,
+                shipping_address="Street",
+                order_status="Payment_Confirmed",
+            )
+            for _ in range(2)
+        ]
+        self.delivered = Order.objects.create(
+            user=self.customer,
+            product=product,
+            quantity=1,
+            total_price=10,
+            shipping_address="Street",
+            order_status="Delivered",
+        )
+        self.url = "/api/orders/transition/"
+
+    def post(self, user, data):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.post(
+            self.url, data, format="json", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+
+    def test_staff_moves_orders_in_bulk(self):
+        """
+        Test that staff can ship other customers' orders, and invalid moves are reported.
+        """
+        ids = [order.pk for order in self.paid] + [self.delivered.pk]
+        response = self.post(self.staff, {"orders": ids, "order_status": "Shipped"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["updated"], ids[:2])
+        self.assertEqual(
+            response.data["rejected"],
+            {str(self.delivered.pk): "Cannot move from Delivered to Shipped."},
+        )
+        self.assertEqual(Order.objects.filter(order_status="Shipped").count(), 2)
+
+    def test_customers_cannot_move_orders(self):
+        """
+        Test that the bulk endpoint is restricted to staff.
+        """
+        response = self.post(
+            self.customer, {"orders": [self.paid[0].pk], "order_status": "Shipped"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_unknown_status(self):
+        """
+        Test that the target status must be one of the order statuses.
+        """
+        response = self.post(
+            self.staff, {"orders": [self.paid[0].pk], "order_status": "Lost"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OrderArchiveEndpointTest(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="history", email="history@example.com", password="password123"
+        )
+        self.token = RefreshToken.for_user(self.user).access_token
+        product = Product.objects.create(name="Historic", price=10, stock_quantity=10)
+        self.archived = checkout(
+            self.user, [{"product": product.pk, "quantity": 2}], "Street"
+        )
+        Order.objects.filter(pk=self.archived.pk).update(
+            order_status="Delivered",
+            updated_at=timezone.now() - timedelta(days=365),
+        )
+        archive_orders()
+        self.hot = Order.objects.create(
+            user=self.user,
+            product=product,
+            quantity=1,
+            total_price=10,
+            shipping_address="Street",
+        )
+
+    def get(self, url):
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.token}")
+
+    def test_history_lists_hot_and_archived_orders(self):
+        """
+        Test that the history endpoint pages over both tables.
+        """
+        response = self.get("/api/orders/history/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(
+            [(row["id"], row["archived"]) for row in response.data["results"]],
+            [(self.hot.pk, False), (self.archived.pk, True)],
+        )
+
+    def test_list_covers_archived_orders(self):
+        """
+        Test that the order list pages over hot and archived orders, filtered and ordered alike.
+        """
+        response = self.get("/api/orders/?ordering=-order_status")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]],
+            [self.hot.pk, self.archived.pk],
+        )
+        self.assertTrue(response.data["results"][1]["archived"])
+
+        response = self.get(
+            "/api/orders/?order_status=Delivered&fields=id,order_status"
+        )
+        self.assertEqual(
+            response.data["results"],
+            [{"id": self.archived.pk, "order_status": "Delivered"}],
+        )
+
+    def test_archived_order_detail(self):
+        """
+        Test that an archived order is still found by its id, with its lines.
+        """
+        response = self.get(f"/api/orders/{self.archived.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["archived"])
+        self.assertEqual(response.data["order_status"], "Delivered")
+        self.assertEqual(response.data["items"][0]["quantity"], 2)
+
+        other = get_user_model().objects.create_user(
+            username="other", email="other@example.com", password="password123"
+        )
+        response = self.client.get(
+            f"/api/orders/{self.archived.pk}/",
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(other).access_token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SalesAnalyticsEndpointTest(APITestCase):
+    def setUp(self):
+        self.staff = get_user_model().objects.create_superuser(
+            username="analyst", email="analyst@example.com", password="password123"
+        )
+        self.customer = get_user_model().objects.create_user(
+            username="shopper", email="shopper@example.com", password="password123"
+        )
+        self.lamp = Product.objects.create(name="Lamp", price=20, stock_quantity=10)
+        self.desk = Product.objects.create(name="Desk", price=100, stock_quantity=10)
+        for product, quantity in [(self.lamp, 3), (self.desk, 1)]:
+            Order.objects.create(
+                user=self.customer,
+                product=product,
+                quantity=quantity,
+                total_price=product.price * quantity,
+                shipping_address="Street",
+                order_status="Delivered",
+            )
+        backfill_sales_rollups()
+
+    def get(self, user, url):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_revenue_series(self):
+        """
+        Test that the revenue series sums the rollups per period.
+        """
+        response = self.get(self.staff, "/api/analytics/sales/revenue/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["interval"], "day")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["revenue"], "160.00")
+        self.assertEqual(response.data["results"][0]["order_count"], 2)
+
+        response = self.get(
+            self.staff,
+            f"/api/analytics/sales/revenue/?product={self.desk.pk}"
+            "&order_status=Canceled&order_status=Delivered",
+        )
+        self.assertEqual(response.data["results"][0]["revenue"], "100.00")
+
+    def test_top_products(self):
+        """
+        Test that products are ranked by revenue or by units.
+        """
+        url = "/api/analytics/sales/top-products/"
+        response = self.get(self.staff, url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row["name"] for row in response.data["results"]], ["Desk", "Lamp"]
+        )
+        response = self.get(self.staff, f"{url}?order_by=units&limit=1")
+        self.assertEqual(
+            [row["product"] for row in response.data["results"]], [self.lamp.pk]
+        )
+
+    def test_reports_are_staff_only(self):
+        """
+        Test that customers cannot read the sales reports.
+        """
+        response = self.get(self.customer, "/api/analytics/sales/revenue/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_range(self):
+        """
+        Test that reversed and overly long ranges are rejected.
+        """
+        url = "/api/analytics/sales/top-products/"
+        response = self.get(self.staff, f"{url}?start=2024-02-01&end=2024-01-01")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.get(self.staff, f"{url}?start=2020-01-01&end=2024-01-01")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,9 +1,23 @@
+import base64
+import json
+from unittest import mock
+
+import msgpack
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from apis.renderers import ORJSONRenderer
+from apis.serializers.product_serializers import ProductSerializer
 from product.models import Category, Product
+from product.models.product_image import ProductImage
+from product.stock import shard_stock, take_stock
 
 
 class ProductViewSetTest(APITestCase):
@@ -123,6 +137,38 @@ class ProductViewSetTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertGreater(len(response.data), 0)  # Ensure products exist in response
 
+    def test_search_products_ranked(self):
+        """
+        Test that `?search=` returns matching products ordered by relevance.
+        """
+        self.product3.description = "Works with Product1 accessories."
+        self.product3.save()
+
+        response = self.client.get("/api/products/?search=product1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [item["id"] for item in response.data["results"]]
+        self.assertEqual(ids, [self.product1.id, self.product3.id])
+
+    def test_search_products_by_category_name(self):
+        """
+        Test that products can be found by the name of their category.
+        """
+        response = self.client.get("/api/products/?search=category2")
+        ids = [item["id"] for item in response.data["results"]]
+        self.assertEqual(ids, [self.product1.id])
+
+    def test_filter_products_by_category_subtree(self):
+        """
+        Test that `?category=` matches products in the category and all of its descendants.
+        """
+        child = Category.objects.create(name="Child", parent_category=self.category2)
+        grandchild = Category.objects.create(name="Grandchild", parent_category=child)
+        self.product3.categories.add(grandchild)
+
+        response = self.client.get("/api/products/?category=Category2")
+        ids = sorted(item["id"] for item in response.data["results"])
+        self.assertEqual(ids, [self.product1.id, self.product3.id])
+
     def test_filter_products(self):
         """
         Test filtering products by price or other attributes.
@@ -132,3 +178,529 @@ class ProductViewSetTest(APITestCase):
         # Test filtering products by name
         response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.token_user1}")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ProductCursorPaginationTest(APITestCase):
+    def setUp(self):
+        """
+        Create enough products, with duplicated prices, to span several cursor pages.
+        """
+        cache.clear()
+        for i in range(10):
+            Product.objects.create(
+                name=f"Cursor Product {i}", price=100 + (i // 3) * 10, stock_quantity=5
+            )
+
+    def collect_pages(self, url):
+        """
+        Follow `next` links from `url` and return the product ids in the order received.
+        """
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_cursor_pages_cover_all_products_in_order(self):
+        """
+        Test that walking the cursor pages returns every product once, ordered by price then id.
+        """
+        ids = self.collect_pages("/api/products/?pagination=cursor")
+        expected = list(
+            Product.objects.order_by("price", "id").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_cursor_pages_descending_name(self):
+        """
+        Test that cursor pagination honours the `ordering` query parameter.
+        """
+        ids = self.collect_pages("/api/products/?pagination=cursor&ordering=-name")
+        expected = list(
+            Product.objects.order_by("-name", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_cursor_page_runs_no_count_query(self):
+        """
+        Test that a cursor page is fetched without a COUNT(*) query.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/products/?pagination=cursor")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertFalse(
+            any("COUNT(" in query["sql"].upper() for query in queries.captured_queries)
+        )
+
+    def test_previous_link_returns_previous_page(self):
+        """
+        Test that the `previous` link of the second page returns the first page.
+        """
+        first = self.client.get("/api/products/?pagination=cursor")
+        second = self.client.get(first.data["next"])
+        previous = self.client.get(second.data["previous"])
+        self.assertEqual(previous.data["results"], first.data["results"])
+        self.assertIsNone(first.data["previous"])
+
+    def test_invalid_cursor(self):
+        """
+        Test that a malformed cursor is rejected with 404.
+        """
+        response = self.client.get("/api/products/?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        for value in ({"a": 1}, [1], None, "not-a-price"):
+            cursor = base64.b64encode(
+                json.dumps({"o": "price", "v": value, "p": 1}).encode()
+            ).decode()
+            response = self.client.get("/api/products/", {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_pages_keep_relevance_order(self):
+        """
+        Test that cursor pages of a search follow the relevance ranking.
+        """
+        for i in range(4):
+            Product.objects.create(
+                name=f"Ranked Ranked Gadget {i}", price=1, stock_quantity=5
+            )
+        ids = self.collect_pages("/api/products/?pagination=cursor&search=ranked")
+        self.assertEqual(len(ids), 4)
+        search = self.client.get("/api/products/?search=ranked&limit=10")
+        self.assertEqual(ids, [item["id"] for item in search.data["results"]])
+
+        ranked = Product.objects.get(name="Ranked Ranked Gadget 0")
+        ranked.description = "ranked ranked ranked"
+        ranked.save()
+        ids = self.collect_pages("/api/products/?pagination=cursor&search=ranked")
+        self.assertEqual(ids[0], ranked.id)
+        self.assertEqual(len(ids), 4)
+
+
+class ProductQueryBudgetTest(APITestCase):
+    """
+    Query-count budgets for the product endpoints. The budgets must not depend on page size.
+    """
+
+    LIST_QUERY_BUDGET = 4  # count, products, images, categories
+    CURSOR_LIST_QUERY_BUDGET = 3  # products, images, categories
+    DETAIL_QUERY_BUDGET = 3  # product, images, categories
+
+    def setUp(self):
+        cache.clear()
+        self.categories = [
+            Category.objects.create(name=f"Budget {i}") for i in range(3)
+        ]
+        for i in range(30):
+            product = Product.objects.create(
+                name=f"Budget Product {i}", price=10 + i, stock_quantity=5
+            )
+            product.categories.add(*self.categories)
+            ProductImage.objects.create(
+                product=product, image=f"product_images/{i}.png"
+            )
+
+    def test_list_query_budget_is_flat(self):
+        """
+        Test that listing 3 or 30 products runs the same number of queries.
+        """
+        for limit in (3, 30):
+            with self.assertNumQueries(self.LIST_QUERY_BUDGET):
+                response = self.client.get(f"/api/products/?limit={limit}")
+            self.assertEqual(len(response.data["results"]), limit)
+            self.assertEqual(len(response.data["results"][0]["images"]), 1)
+            self.assertEqual(len(response.data["results"][0]["categories"]), 3)
+
+    def test_cursor_list_query_budget_is_flat(self):
+        """
+        Test that cursor pages of 3 or 30 products run the same number of queries.
+        """
+        for limit in (3, 30):
+            with self.assertNumQueries(self.CURSOR_LIST_QUERY_BUDGET):
+                response = self.client.get(
+                    f"/api/products/?pagination=cursor&limit={limit}"
+                )
+            self.assertEqual(len(response.data["results"]), limit)
+
+    def test_detail_query_budget(self):
+        """
+        Test the number of queries needed to retrieve a single product.
+        """
+        product = Product.objects.first()
+        with self.assertNumQueries(self.DETAIL_QUERY_BUDGET):
+            response = self.client.get(f"/api/products/{product.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ProductResponseCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = get_user_model().objects.create_superuser(
+            username="admin", email="admin@example.com", password="password123"
+        )
+        self.token = RefreshToken.for_user(self.admin).access_token
+        self.category = Category.objects.create(name="Cached")
+        self.product = Product.objects.create(
+            name="Cached Product", price=10, stock_quantity=5
+        )
+        self.detail_url = f"/api/products/{self.product.id}/"
+
+    def test_repeated_reads_are_served_from_cache(self):
+        """
+        Test that a repeated list or detail request runs no queries.
+        """
+        for url in ("/api/products/", self.detail_url):
+            first = self.client.get(url)
+            self.assertEqual(first["X-Cache"], "MISS")
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(second["X-Cache"], "HIT")
+            self.assertEqual(second.data, first.data)
+
+    def test_query_params_are_normalized(self):
+        """
+        Test that the order of query parameters does not change the cache key.
+        """
+        self.client.get("/api/products/?limit=2&offset=0")
+        response = self.client.get("/api/products/?offset=0&limit=2")
+        self.assertEqual(response["X-Cache"], "HIT")
+
+    def test_product_save_invalidates(self):
+        """
+        Test that updating a product invalidates its cached detail.
+        """
+        self.client.get(self.detail_url)
+        self.product.name = "Renamed Product"
+        self.product.save()
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["name"], "Renamed Product")
+
+    def test_categories_change_invalidates(self):
+        """
+        Test that changing the categories of a product invalidates its cached detail.
+        """
+        self.client.get(self.detail_url)
+        self.product.categories.add(self.category)
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data["categories"], [self.category.id])
+
+    def test_image_change_invalidates(self):
+        """
+        Test that adding an image to a product invalidates its cached detail.
+        """
+        self.client.get(self.detail_url)
+        ProductImage.objects.create(product=self.product, image="product_images/a.png")
+        response = self.client.get(self.detail_url)
+        self.assertEqual(len(response.data["images"]), 1)
+
+    def test_product_delete_invalidates(self):
+        """
+        Test that deleting a product removes it from the cached list.
+        """
+        self.client.get("/api/products/")
+        self.client.delete(self.detail_url, HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        response = self.client.get("/api/products/")
+        self.assertEqual(response.data["count"], 0)
+
+    def test_order_stock_change_invalidates(self):
+        """
+        Test that paying for an order refreshes the cached stock quantity.
+        """
+        self.client.get(self.detail_url)
+        order = self.client.post(
+            "/api/orders/",
+            {"product": self.product.id, "quantity": 2, "shipping_address": "Street"},
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.client.patch(
+            f"/api/orders/{order.data['id']}/",
+            {"order_status": "Payment_Confirmed"},
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data["stock_quantity"], 3)
+
+
+class ProductFacetsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.phones = Category.objects.create(name="Phones")
+        self.laptops = Category.objects.create(name="Laptops")
+        self.phone = Product.objects.create(
+            name="Phone", price=40, stock_quantity=0, description="android phone"
+        )
+        self.phone.categories.add(self.phones)
+        self.laptop = Product.objects.create(
+            name="Laptop", price=900, stock_quantity=2, description="fast laptop"
+        )
+        self.laptop.categories.add(self.laptops)
+        self.hybrid = Product.objects.create(
+            name="Hybrid", price=450, stock_quantity=1, description="phone and laptop"
+        )
+        self.hybrid.categories.add(self.phones, self.laptops)
+
+    def test_facets_for_all_products(self):
+        """
+        Test category, price-range and availability counts for the whole catalog.
+        """
+        with self.assertNumQueries(6):  # facets (2), count, page, images, categories
+            response = self.client.get("/api/products/?facets=true")
+        facets = response.data["facets"]
+        self.assertEqual(
+            facets["categories"],
+            [
+                {"id": self.laptops.id, "name": "Laptops", "count": 2},
+                {"id": self.phones.id, "name": "Phones", "count": 2},
+            ],
+        )
+        self.assertEqual(
+            [bucket["count"] for bucket in facets["price_ranges"]], [1, 0, 1, 1]
+        )
+        self.assertEqual(facets["availability"], {"in_stock": 2, "out_of_stock": 1})
+
+    def test_facets_follow_filters(self):
+        """
+        Test that facets are computed for the filtered listing only.
+        """
+        response = self.client.get("/api/products/?facets=1&categories__name=Phones")
+        facets = response.data["facets"]
+        self.assertEqual(
+            {row["name"]: row["count"] for row in facets["categories"]},
+            {"Phones": 2, "Laptops": 1},
+        )
+        self.assertEqual(facets["availability"], {"in_stock": 1, "out_of_stock": 1})
+
+    def test_facets_count_sharded_stock(self):
+        """
+        Test that the availability of a sharded product comes from its shards.
+        """
+        shard_stock(self.laptop.pk, 2)
+        take_stock(self.laptop.pk, 2)
+        shard_stock(self.phone.pk, 2)  # Out of stock, sharded or not.
+        response = self.client.get("/api/products/?facets=true")
+        self.assertEqual(
+            response.data["facets"]["availability"], {"in_stock": 1, "out_of_stock": 2}
+        )
+
+    def test_facets_not_computed_by_default(self):
+        """
+        Test that plain listings do not include facets.
+        """
+        response = self.client.get("/api/products/")
+        self.assertNotIn("facets", response.data)
+
+
+class ProductConditionalGetTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            name="Validated", price=10, stock_quantity=5
+        )
+        self.detail_url = f"/api/products/{self.product.id}/"
+
+    def test_detail_validators_and_not_modified(self):
+        """
+        Test that a detail response carries validators and a matching ETag gets a 304.
+        """
+        response = self.client.get(self.detail_url)
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(0):  # validators come from the cached entry
+            response = self.client.get(
+                self.detail_url, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_not_modified_before_serialization(self):
+        """
+        Test that a 304 is returned on a cache miss without running the serializer.
+        """
+        etag = self.client.get("/api/products/")["ETag"]
+        cache.clear()
+        with mock.patch.object(
+            ProductSerializer, "to_representation", side_effect=AssertionError
+        ):
+            response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since(self):
+        """
+        Test that `If-Modified-Since` equal to `Last-Modified` returns 304.
+        """
+        last_modified = self.client.get(self.detail_url)["Last-Modified"]
+        response = self.client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_with_product_and_images(self):
+        """
+        Test that product, image and deletion changes produce a new ETag.
+        """
+        etags = {self.client.get("/api/products/")["ETag"]}
+
+        self.product.price = 12
+        self.product.save()
+        etags.add(self.client.get("/api/products/")["ETag"])
+
+        ProductImage.objects.create(product=self.product, image="product_images/v.png")
+        etags.add(self.client.get("/api/products/")["ETag"])
+
+        other = Product.objects.create(name="Other", price=1, stock_quantity=1)
+        etags.add(self.client.get("/api/products/")["ETag"])
+        other.delete()
+        etags.add(self.client.get("/api/products/")["ETag"])
+
+        self.assertEqual(
+            len(etags), 4
+        )  # deleting `other` restores the state before it was added
+
+    def test_sharded_stock_is_summed(self):
+        """
+        Test that a sharded product reports its shard total, and that takes change the ETag.
+        """
+        shard_stock(self.product.pk, 3)
+        before = self.client.get(self.detail_url)
+        self.assertEqual(before.data["stock_quantity"], 5)
+
+        take_stock(self.product.pk, 2)
+        after = self.client.get(self.detail_url)
+        self.assertEqual(after.data["stock_quantity"], 3)
+        self.assertNotEqual(after["ETag"], before["ETag"])
+        listed = self.client.get("/api/products/").data["results"]
+        self.assertEqual(listed[0]["stock_quantity"], 3)
+
+
+class ProductSparseFieldsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Sparse")
+        for i in range(5):
+            product = Product.objects.create(
+                name=f"Sparse {i}",
+                price=10 + i,
+                stock_quantity=3,
+                description="long text " * 100,
+            )
+            product.categories.add(self.category)
+            ProductImage.objects.create(
+                product=product, image=f"product_images/s{i}.png"
+            )
+
+    def test_fields_param(self):
+        """
+        Test that `?fields=` returns only the requested fields without loading relations.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/products/?fields=id,name,price")
+        self.assertEqual(set(response.data["results"][0]), {"id", "name", "price"})
+        self.assertEqual(len(queries), 2)  # count, products
+        self.assertNotIn("description", queries[1]["sql"])
+
+    def test_omit_param(self):
+        """
+        Test that `?omit=` drops fields and only keeps the prefetches still needed.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/products/?omit=description,categories")
+        item = response.data["results"][0]
+        self.assertNotIn("description", item)
+        self.assertNotIn("categories", item)
+        self.assertEqual(len(item["images"]), 1)
+        self.assertEqual(len(queries), 3)  # count, products, images
+        self.assertNotIn("description", queries[1]["sql"])
+
+    def test_fields_param_on_detail(self):
+        """
+        Test that sparse fieldsets apply to the detail endpoint too.
+        """
+        product = Product.objects.first()
+        response = self.client.get(f"/api/products/{product.id}/?fields=name")
+        self.assertEqual(response.data, {"name": product.name})
+
+    def test_fields_ignored_for_writes(self):
+        """
+        Test that write requests are validated against the full field set.
+        """
+        admin = get_user_model().objects.create_superuser(
+            username="sparseadmin", email="sparse@example.com", password="password123"
+        )
+        token = RefreshToken.for_user(admin).access_token
+        response = self.client.post(
+            "/api/products/?fields=name",
+            {"name": "Sparse New", "price": 5, "stock_quantity": 1, "description": "d"},
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("price", response.data)
+
+
+class ProductRenderingTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            name="Rendered", price="19.99", stock_quantity=5, description="d"
+        )
+        admin = get_user_model().objects.create_superuser(
+            username="renderadmin", email="render@example.com", password="password123"
+        )
+        self.token = RefreshToken.for_user(admin).access_token
+
+    def test_json_response(self):
+        """
+        Test that JSON responses are rendered by orjson and match the serializer output.
+        """
+        response = self.client.get(f"/api/products/{self.product.id}/")
+        self.assertEqual(response["Content-Type"], "application/json")
+        body = json.loads(response.content)
+        self.assertEqual(body["price"], "19.99")
+        self.assertTrue(body["created_date"].endswith("Z"))
+
+    def test_non_string_keys(self):
+        """
+        Test that dictionaries keyed by integers render like the standard JSON renderer.
+        """
+        data = {"facets": {1: 3, 2: 0}}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_msgpack_response(self):
+        """
+        Test that clients can ask for MessagePack through the Accept header.
+        """
+        response = self.client.get(
+            "/api/products/?ordering=id", HTTP_ACCEPT="application/msgpack"
+        )
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        body = msgpack.unpackb(response.content, raw=False)
+        self.assertEqual(body["results"][0]["name"], "Rendered")
+        self.assertEqual(body["results"][0]["price"], "19.99")
+
+    def test_msgpack_request(self):
+        """
+        Test that a MessagePack request body is parsed like a JSON one.
+        """
+        response = self.client.post(
+            "/api/category/",
+            msgpack.packb({"name": "Packed"}),
+            content_type="application/msgpack",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["name"], "Packed")
+
+    def test_malformed_json_request(self):
+        """
+        Test that an unparsable JSON body is rejected with 400.
+        """
+        response = self.client.post(
+            "/api/products/",
+            "{not json",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
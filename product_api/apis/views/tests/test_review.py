@@ -159,3 +159,43 @@ class ReviewViewSetTest(APITestCase):
             url, HTTP_AUTHORIZATION=f"Bearer {self.token_user2}"
         )
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_list_reviews_query_budget(self):
+        """
+        Test that listing reviews joins the reviewing users instead of loading them per review.
+        """
+        Review.objects.create(user=self.user1, product=self.product, rating=4)
+        Review.objects.create(user=self.user2, product=self.product, rating=5)
+
+        with self.assertNumQueries(2):  # count, reviews joined with users
+            response = self.client.get("/api/reviews/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_list_reviews_conditional_get(self):
+        """
+        Test that an unchanged review list returns 304 and a new review changes the ETag.
+        """
+        Review.objects.create(user=self.user1, product=self.product, rating=4)
+        etag = self.client.get("/api/reviews/")["ETag"]
+
+        response = self.client.get("/api/reviews/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Review.objects.create(user=self.user2, product=self.product, rating=5)
+        response = self.client.get("/api/reviews/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_rename_changes_etag(self):
+        """
+        Test that renaming a reviewing user changes the ETag of the reviews it wrote.
+        """
+        review = Review.objects.create(user=self.user1, product=self.product, rating=4)
+        url = f"/api/reviews/{review.id}/"
+        etag = self.client.get(url)["ETag"]
+
+        self.user1.email = "renamed@example.com"
+        self.user1.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["user"], str(self.user1))
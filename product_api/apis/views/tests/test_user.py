@@ -1,9 +1,19 @@
+import uuid
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from apis.serializers.user_serializer import UserTokenObtainPairSerializer
+from apis import throttling
+from apis.throttling import take_token
 from users.models import CustomUser
 
 User = get_user_model()
@@ -67,6 +77,208 @@ class UserViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(response.data["email"], "newuser@example.com")
 
+    def test_register_is_a_single_insert(self):
+        """
+        Test that registering runs no uniqueness queries before the INSERT.
+        """
+        data = {
+            "email": "single@example.com",
+            "password": "password123",
+            "username": "single",
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("register-list"), data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        statements = [query["sql"].split()[0] for query in queries.captured_queries]
+        self.assertEqual(statements.count("INSERT"), 1)
+        self.assertNotIn("SELECT", statements)
+
+    def test_register_duplicate_email_and_username(self):
+        """
+        Test that duplicates are reported per field, as the unique validators did.
+        """
+        url = reverse("register-list")
+        response = self.client.post(
+            url,
+            {"email": "user@example.com", "password": "x", "username": "fresh"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data, {"email": ["user with this email already exists."]}
+        )
+        response = self.client.post(
+            url,
+            {"email": "fresh@example.com", "password": "x", "username": "test2user"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data, {"username": ["user with this username already exists."]}
+        )
+
+    @override_settings(PASSWORD_HASHING_MAX_CONCURRENT=0)
+    def test_auth_endpoints_shed_load_when_hashing_is_saturated(self):
+        """
+        Test that login and registration answer 503 with Retry-After when no hash is admitted.
+        """
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"email": "user@example.com", "password": "password123"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn("Retry-After", response)
+
+        response = self.client.post(
+            reverse("register-list"),
+            {
+                "email": "late@example.com",
+                "password": "password123",
+                "username": "late",
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(User.objects.filter(email="late@example.com").exists())
+
+    @override_settings(RATE_LIMITS={"token.post": {"ip": "2/min"}})
+    def test_token_rate_limit(self):
+        """
+        Test that logins beyond the rate limit of an address get 429 with Retry-After.
+        """
+        url = reverse("token_obtain_pair")
+        data = {"email": "user@example.com", "password": "password123"}
+        address = f"203.0.113.{uuid.uuid4().int % 250}"
+        for _ in range(2):
+            response = self.client.post(url, data, REMOTE_ADDR=address)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(url, data, REMOTE_ADDR=address)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertLessEqual(int(response["Retry-After"]), 60)
+
+        # Other addresses have their own bucket.
+        response = self.client.post(url, data, REMOTE_ADDR="198.51.100.1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_token_bucket_refills(self):
+        """
+        Test that a bucket admits its capacity, then one request per refill interval.
+        """
+        key = f"ratelimit:test:{uuid.uuid4().hex}"
+        clock = mock.patch("apis.throttling.time.time", return_value=6000.0)
+        with clock as now, mock.patch("apis.throttling.cache", wraps=cache) as shared:
+            for _ in range(10):
+                self.assertEqual(take_token(key, 10, 10 / 60), (True, 0))
+            self.assertEqual(take_token(key, 10, 10 / 60), (False, 6))
+            self.assertFalse(shared.get.called)
+            self.assertFalse(shared.set.called)
+
+            now.return_value = 6006.0
+            self.assertEqual(take_token(key, 10, 10 / 60), (True, 0))
+            self.assertFalse(take_token(key, 10, 10 / 60)[0])
+
+            # An idle bucket refills up to its capacity only.
+            now.return_value = 7000.0
+            for _ in range(10):
+                self.assertEqual(take_token(key, 10, 10 / 60), (True, 0))
+            self.assertFalse(take_token(key, 10, 10 / 60)[0])
+
+    def test_token_bucket_batches(self):
+        """
+        Test that a process takes tokens in batches, and workers share the bucket's capacity.
+        """
+        key = f"ratelimit:test:{uuid.uuid4().hex}"
+        with mock.patch("apis.throttling.time.time", return_value=6000.0), mock.patch(
+            "apis.throttling.cache", wraps=cache
+        ) as shared:
+            for _ in range(25):
+                self.assertEqual(take_token(key, 100, 100 / 60), (True, 0))
+            # Three batches of 10, the first after adding the bucket.
+            self.assertEqual(shared.incr.call_count, 4)
+            self.assertEqual(shared.add.call_count, 1)
+
+            # Another worker only gets what this one did not take.
+            admitted = 0
+            with mock.patch.dict(throttling._local, clear=True):
+                while take_token(key, 100, 100 / 60)[0]:
+                    admitted += 1
+            self.assertEqual(admitted, 70)
+
+            # A bucket evicted from the cache is added again, full.
+            cache.delete(key)
+            with mock.patch.dict(throttling._local, clear=True):
+                self.assertEqual(take_token(key, 100, 100 / 60), (True, 0))
+            self.assertEqual(cache.get(key), 10000 - 100 + 10)
+
+    def test_hashing_metrics(self):
+        """
+        Test that the hashing metrics are reported to staff only, checked against the user row.
+        """
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"email": "admin@example.com", "password": "password123"},
+        )
+        admin_token = response.data["access"]
+        url = reverse("hashing_metrics")
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {admin_token}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(response.data["completed"], 1)
+        self.assertIn("p95", response.data["wait"])
+
+        response = self.client.get(
+            url, HTTP_AUTHORIZATION=f"Bearer {self.regular_token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # A demoted user loses access, whatever the claims of its token say.
+        self.admin_user.is_staff = False
+        self.admin_user.save()
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {admin_token}")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_refresh_checks_the_user(self):
+        """
+        Test that refreshing re-reads the user: inactive users and revoked tokens are rejected,
+        and the new tokens carry the current staff flag.
+        """
+        url = reverse("token_refresh")
+        refresh = UserTokenObtainPairSerializer.get_token(self.admin_user)
+        self.admin_user.is_staff = False
+        self.admin_user.save()
+        response = self.client.post(url, {"refresh": str(refresh)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            RefreshToken(response.data["refresh"]).access_token["is_staff"]
+        )
+
+        refresh = UserTokenObtainPairSerializer.get_token(self.regular_user)
+        self.regular_user.set_password("new-password123")
+        self.regular_user.save()
+        response = self.client.post(url, {"refresh": str(refresh)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        refresh = UserTokenObtainPairSerializer.get_token(self.regular_user)
+        self.regular_user.is_active = False
+        self.regular_user.save()
+        response = self.client.post(url, {"refresh": str(refresh)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_user_resolution(self):
+        """
+        Test that repeated requests with a token reuse the cached user until it is saved.
+        """
+        url = reverse("user-list")
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {self.admin_token}"}
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url, **headers)
+        with CaptureQueriesContext(connection) as second:
+            self.client.get(url, **headers)
+        self.assertEqual(len(second), len(first) - 1)
+
+        self.admin_user.is_active = False
+        self.admin_user.save()
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
     def test_logout_view(self):
         """
         Test that logged-in users can log out by invalidating their refresh token
@@ -86,6 +298,20 @@ class UserViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["message"], "Logged out successfully")
 
+    def test_refresh_rotation_rejects_reused_tokens(self):
+        """
+        Test that a refresh token is blacklisted once rotated, and cannot be used again
+        """
+        refresh_token = str(RefreshToken.for_user(self.regular_user))
+        url = reverse("token_refresh")
+
+        response = self.client.post(url, {"refresh": refresh_token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("refresh", response.data)
+
+        response = self.client.post(url, {"refresh": refresh_token})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
     def test_logout_view_no_token(self):
         """
         Test logout without a refresh token
@@ -38,6 +38,19 @@ class WishlistViewSetTestCase(APITestCase):
             Wishlist.objects.filter(user=self.user, product=self.product).exists()
         )
 
+    def test_add_product_to_wishlist_retry(self):
+        """
+        Test that retrying an add with the same Idempotency-Key replays the first response
+        instead of failing as a duplicate.
+        """
+        data = {"product": self.product.id}
+        first = self.client.post(self.wishlist_url, data, HTTP_IDEMPOTENCY_KEY="add-1")
+        retry = self.client.post(self.wishlist_url, data, HTTP_IDEMPOTENCY_KEY="add-1")
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Wishlist.objects.filter(user=self.user).count(), 1)
+
     def test_add_duplicate_product_to_wishlist(self):
         """
         Test adding the same product to the wishlist twice.
@@ -6,10 +6,13 @@ from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
 
+from apis.mixins import HashingAdmissionMixin
 from apis.serializers.user_serializer import RegisterSerializer, UserSerializer
+from users.authentication import CachedJWTAuthentication
+from users.blacklist import FilteredRefreshToken
+from users.hashing import get_hashing_metrics
 from users.models import CustomUser
 
 user = get_user_model()
@@ -38,7 +41,7 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = user.objects.all()
     serializer_class = UserSerializer
     authentication_classes = [
-        JWTAuthentication
+        CachedJWTAuthentication
     ]  # authenticating requests to this view using JWT.
     permission_classes = [IsAdminUser]
 
@@ -51,22 +54,61 @@ class UserViewSet(viewsets.ModelViewSet):
     ordering_fields = ["email"]
 
 
-class RegisterViewSet(viewsets.ModelViewSet):
+class RegisterViewSet(HashingAdmissionMixin, viewsets.ModelViewSet):
     """
     A viewset for user registration.
 
     This viewset allows anyone to register a new user. The viewset provides an endpoint for creating
-    user accounts and uses the `RegisterSerializer` to handle registration data.
+    user accounts and uses the `RegisterSerializer` to handle registration data. Passwords are hashed
+    on the bounded hashing executor; when it is saturated registration answers 503 with `Retry-After`.
+    Registrations are rate limited per client address (see `apis.throttling`).
 
     Attributes:
         queryset (QuerySet): A queryset that retrieves all user instances.
         serializer_class (RegisterSerializer): The serializer used to handle user registration data.
         permission_classes (list): Specifies that anyone (no authentication required) can access this viewset.
+        throttle_scope (str): The `RATE_LIMITS` scope of the viewset's actions.
     """
 
     queryset = CustomUser.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [AllowAny]  # Allow anyone to register
+    throttle_scope = "register"
+
+
+class TokenObtainView(HashingAdmissionMixin, TokenObtainPairView):
+    """
+    Obtain a JWT pair (`POST /api/token/`).
+
+    `TokenObtainPairView`, whose password check runs on the bounded hashing executor (see
+    `users.backends.HashingExecutorBackend`); when the executor is saturated the request is
+    answered with 503 and `Retry-After` instead of waiting. Logins are rate limited per client
+    address (the `token` scope of `RATE_LIMITS`, see `apis.throttling`).
+    """
+
+    throttle_scope = "token"
+
+
+class HashingMetricsView(APIView):
+    """
+    Report the password hashing executor metrics of the serving process (staff only).
+
+    `GET /api/metrics/hashing/` returns the queue depth, running, completed and rejected hashes,
+    the hashes in progress across workers and the queue wait and hashing latencies (see
+    `users.hashing.get_hashing_metrics`). The staff flag is read from the user row, resolved
+    through the cache (see `users.authentication.CachedJWTAuthentication`), so a user demoted
+    from staff or a revoked token loses access at once.
+
+    Attributes:
+        authentication_classes (list): Authenticates with the cached user of the JWT.
+        permission_classes (list): Restricts the metrics to staff users.
+    """
+
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_hashing_metrics())
 
 
 class LogoutView(APIView):
@@ -106,7 +148,7 @@ class LogoutView(APIView):
                 )
 
             # Blacklist the token to invalidate it
-            token = RefreshToken(refresh_token)
+            token = FilteredRefreshToken(refresh_token)
             token.blacklist()  # This invalidates the refresh token
 
             return Response(
@@ -2,19 +2,22 @@ from rest_framework import status, viewsets
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from apis.mixins import IdempotentMixin
 from apis.serializers.wishlist_serializer import WishlistSerializer
 from product.models.product import Product
 from product.models.product_wishlist import Wishlist
+from users.authentication import CachedJWTAuthentication
 
 
-class WishlistViewSet(viewsets.ModelViewSet):
+class WishlistViewSet(IdempotentMixin, viewsets.ModelViewSet):
     """
     A viewset for managing the wishlist of products for authenticated users.
 
     This viewset allows authenticated users to view, add, and remove products from their wishlist.
     Each user can only manage their own wishlist. The viewset supports creation and deletion of wishlist items.
+    Unsafe requests that carry an `Idempotency-Key` header run at most once; retries get the stored
+    response (see `IdempotentMixin`).
 
     Attributes:
         queryset (QuerySet): A queryset that retrieves all wishlist items.
@@ -31,7 +34,7 @@ class WishlistViewSet(viewsets.ModelViewSet):
 
     queryset = Wishlist.objects.all()
     serializer_class = WishlistSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -1,6 +1,13 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
 
-from .models import Order
+from .models import ArchivedOrder, Order, OrderItem, StockReservation
+from .transitions import (
+    InvalidTransition,
+    bulk_transition,
+    can_transition,
+    get_source_statuses,
+)
 
 """
 Admin configuration for the Order model.
@@ -12,17 +19,100 @@ Attributes:
     search_fields (list): Fields that can be searched in the admin search bar.
     list_filter (list): Fields that can be used to filter the orders in the admin interface.
     readonly_fields (list): Fields that are read-only in the admin interface and cannot be edited.
+    inlines (list): The lines of multi-item orders and the order's stock holds, shown read-only on the order page.
+    actions (list): One "Move to <status>" action per order status, applying the state machine of
+                    `order.transitions` to the selected orders in bulk.
+    form (ModelForm): Rejects a status the order's current status may not move to.
+
+Archived orders (see `order.archive`) are listed by `ArchivedOrderAdmin`, read-only.
 
 Usage:
     Register this `OrderAdmin` class with the `Order` model in the Django admin to customize its display and functionality.
 """
 
 
+class OrderAdminForm(forms.ModelForm):
+    class Meta:
+        model = Order
+        fields = "__all__"
+
+    def clean_order_status(self):
+        status = self.cleaned_data["order_status"]
+        current = self.instance.order_status
+        if (
+            self.instance.pk is not None
+            and status != current
+            and not can_transition(current, status)
+        ):
+            raise forms.ValidationError(str(InvalidTransition(current, status)))
+        return status
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    fields = ["product", "quantity", "unit_price"]
+    readonly_fields = ["product", "quantity", "unit_price"]
+    extra = 0
+    can_delete = False
+
+
+class StockReservationInline(admin.TabularInline):
+    model = StockReservation
+    fields = ["product", "quantity", "status", "expires_at"]
+    readonly_fields = ["product", "quantity", "status", "expires_at"]
+    extra = 0
+    can_delete = False
+
+
+def make_transition_action(status):
+    def move_orders(modeladmin, request, queryset):
+        updated, rejected = bulk_transition(
+            queryset.values_list("pk", flat=True), status
+        )
+        if updated:
+            modeladmin.message_user(
+                request, f"Moved {len(updated)} orders to {status}.", messages.SUCCESS
+            )
+        if rejected:
+            modeladmin.message_user(
+                request,
+                f"{len(rejected)} orders could not be moved to {status}: "
+                + "; ".join(f"#{pk}: {reason}" for pk, reason in rejected.items()),
+                messages.WARNING,
+            )
+
+    move_orders.__name__ = f"move_to_{status.lower()}"
+    move_orders.short_description = f"Move selected orders to {status}"
+    return move_orders
+
+
 class OrderAdmin(admin.ModelAdmin):
+    form = OrderAdminForm
     list_display = ["user", "product", "quantity", "order_status", "shipping_address"]
     search_fields = ["user", "product", "quantity", "order_status", "shipping_address"]
     list_filter = ["user", "product", "order_status"]
     readonly_fields = ["updated_at", "created_at"]
+    inlines = [OrderItemInline, StockReservationInline]
+    actions = [
+        make_transition_action(status)
+        for status, _ in Order.ORDER_STATUS_CHOICES
+        if get_source_statuses(status)
+    ]
 
 
 admin.site.register(Order, OrderAdmin)
+
+
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ["id", "user", "order_status", "total_price", "created_at"]
+    search_fields = ["id", "user__email", "shipping_address"]
+    list_filter = ["order_status"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(ArchivedOrder, ArchivedOrderAdmin)
@@ -9,6 +9,9 @@ Attributes:
     default_auto_field (str): Specifies the type of auto field to use for primary keys in models. In this case, it is set to `BigAutoField`, which is suitable for handling a large number of rows.
     name (str): The name of the app. This is set to 'order', which corresponds to the app's directory name.
 
+Methods:
+    ready: Connects the stock-adjusting signal receivers in `order.signals`.
+
 Usage:
     This class should be placed in the `apps.py` file of the 'order' app and is automatically used by Django when the application is included in the `INSTALLED_APPS` setting.
 """
@@ -17,3 +20,6 @@ Usage:
 class OrderConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "order"
+
+    def ready(self):
+        from . import signals  # noqa: F401
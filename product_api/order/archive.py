@@ -0,0 +1,198 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Value
+from django.utils import timezone
+
+from .models import ArchivedOrder, Order, OrderItem, StockReservation
+
+"""
+Order archival.
+
+Closed orders (`Delivered`, `Canceled`, `Refunded`) that were last updated more than
+`ORDER_ARCHIVE_AFTER_DAYS` days ago are moved from `Order` to `ArchivedOrder` in batches, so the
+hot table only holds open and recently closed orders (see the `archive_orders` management
+command). Each batch runs in its own transaction:
+
+    1. Up to `batch_size` archivable orders are locked, skipping rows locked by a concurrent
+       update (`SELECT ... FOR UPDATE SKIP LOCKED`), and read with their lines.
+    2. They are inserted into the archive with one bulk insert.
+    3. Their lines, stock holds and the orders themselves are deleted with one `DELETE` each.
+       The deletes bypass the order signals on purpose: archiving a closed order must not
+       return its stock, which a regular delete of a paid order does.
+
+Reads cover both tables: `get_order_history` returns a user's hot and archived orders as one
+query (`UNION ALL`), `union_order_keys` and `load_orders` page over both tables and then load
+the full rows of a page, and `get_archived_order` finds an archived order by its original id.
+
+Constants:
+    - CLOSED_STATUSES (tuple): The statuses of orders that can be archived.
+    - HISTORY_FIELDS (tuple): The columns of an order history row.
+
+Functions:
+    - get_archive_cutoff(): The moment before which closed orders are archived.
+    - archive_orders(before, batch_size): Move closed orders last updated before `before`.
+    - get_order_history(user, order_status): A user's hot and archived orders, newest first.
+    - union_order_keys(hot, archived, ordering): The keys of hot and archived orders, ordered.
+    - load_orders(keys, hot, archived): The orders of a page of keys, in order.
+    - get_archived_order(user, pk): An archived order of `user`, or None.
+"""
+
+CLOSED_STATUSES = ("Delivered", "Canceled", "Refunded")
+HISTORY_FIELDS = (
+    "id",
+    "product_id",
+    "quantity",
+    "total_price",
+    "shipping_address",
+    "order_status",
+    "created_at",
+    "updated_at",
+)
+
+
+def get_archive_cutoff():
+    days = getattr(settings, "ORDER_ARCHIVE_AFTER_DAYS", 180)
+    return timezone.now() - timedelta(days=days)
+
+
+def _archive_batch(before, batch_size):
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update(skip_locked=True)
+            .filter(order_status__in=CLOSED_STATUSES, updated_at__lt=before)
+            .order_by("pk")[:batch_size]
+        )
+        if not orders:
+            return 0
+        ids = [order.pk for order in orders]
+
+        items = defaultdict(list)
+        for order_id, product_id, quantity, unit_price in (
+            OrderItem.objects.filter(order_id__in=ids)
+            .order_by("pk")
+            .values_list("order_id", "product_id", "quantity", "unit_price")
+        ):
+            items[order_id].append(
+                {"product": product_id, "quantity": quantity, "unit_price": unit_price}
+            )
+
+        ArchivedOrder.objects.bulk_create(
+            [
+                ArchivedOrder(
+                    id=order.pk,
+                    user_id=order.user_id,
+                    product_id=order.product_id,
+                    quantity=order.quantity,
+                    total_price=order.total_price,
+                    shipping_address=order.shipping_address,
+                    order_status=order.order_status,
+                    items=items[order.pk],
+                    created_at=order.created_at,
+                    updated_at=order.updated_at,
+                )
+                for order in orders
+            ]
+        )
+        # `_raw_delete` issues a plain DELETE: no cascade collection and no delete signals.
+        OrderItem.objects.filter(order_id__in=ids)._raw_delete(OrderItem.objects.db)
+        StockReservation.objects.filter(order_id__in=ids)._raw_delete(
+            StockReservation.objects.db
+        )
+        Order.objects.filter(pk__in=ids)._raw_delete(Order.objects.db)
+    return len(ids)
+
+
+def archive_orders(before=None, batch_size=1000):
+    """
+    Move closed orders last updated before `before` to the archive, `batch_size` at a time.
+
+    Args:
+        before (datetime): Orders last updated before this moment are archived (defaults to
+                           `get_archive_cutoff()`).
+        batch_size (int): Orders moved per transaction.
+
+    Returns:
+        int: The number of orders archived.
+    """
+    if before is None:
+        before = get_archive_cutoff()
+    total = 0
+    while True:
+        moved = _archive_batch(before, batch_size)
+        total += moved
+        if moved < batch_size:
+            return total
+
+
+def get_order_history(user, order_status=None):
+    """
+    Return the hot and archived orders of `user` as one queryset of dicts, newest first.
+
+    Both sides select `HISTORY_FIELDS` plus an `archived` flag and are combined with
+    `UNION ALL`, so the history can be counted and sliced (paginated) by the database.
+
+    Args:
+        user (User): The customer whose orders are returned.
+        order_status (str): Only return orders with this status.
+    """
+    hot = Order.objects.filter(user=user)
+    archived = ArchivedOrder.objects.filter(user=user)
+    if order_status:
+        hot = hot.filter(order_status=order_status)
+        archived = archived.filter(order_status=order_status)
+    hot = hot.values(*HISTORY_FIELDS, archived=Value(False, BooleanField()))
+    archived = archived.values(*HISTORY_FIELDS, archived=Value(True, BooleanField()))
+    return hot.union(archived, all=True).order_by("-created_at", "-id")
+
+
+def union_order_keys(hot, archived, ordering=()):
+    """
+    Combine filtered hot and archived orders into one `UNION ALL` of their keys.
+
+    Each row holds the order `id`, the `archived` flag and the columns of `ordering`, so the
+    combined rows can be ordered, counted and sliced (paginated) by the database before any order
+    is loaded (see `load_orders`).
+
+    Args:
+        hot (QuerySet): The `Order` rows to include.
+        archived (QuerySet): The `ArchivedOrder` rows to include.
+        ordering (iterable): Field names, optionally prefixed with `-`, present on both models.
+    """
+    ordering = [*ordering, "-created_at", "-id"]
+    columns = list(dict.fromkeys(["id", *(term.lstrip("-") for term in ordering)]))
+    hot = hot.order_by().values(*columns, archived=Value(False, BooleanField()))
+    archived = archived.order_by().values(
+        *columns, archived=Value(True, BooleanField())
+    )
+    return hot.union(archived, all=True).order_by(*ordering)
+
+
+def load_orders(keys, hot, archived):
+    """
+    Load the orders of `keys` (rows of `union_order_keys`) from `hot` and `archived`, with one
+    query per table, and return them in the order of `keys`.
+    """
+    keys = list(keys)
+    hot_ids = [key["id"] for key in keys if not key["archived"]]
+    archived_ids = [key["id"] for key in keys if key["archived"]]
+    orders = {}
+    if hot_ids:
+        orders.update(
+            ((False, order.pk), order) for order in hot.filter(pk__in=hot_ids)
+        )
+    if archived_ids:
+        orders.update(
+            ((True, order.pk), order) for order in archived.filter(pk__in=archived_ids)
+        )
+    return [
+        orders[key["archived"], key["id"]]
+        for key in keys
+        if (key["archived"], key["id"]) in orders
+    ]
+
+
+def get_archived_order(user, pk):
+    return ArchivedOrder.objects.filter(user=user, pk=pk).first()
@@ -0,0 +1,103 @@
+from collections import Counter
+
+from django.db import transaction
+from rest_framework import serializers
+
+from product.models.product import Product
+
+from .models import Order, OrderItem
+from .reservations import InsufficientStock, reserve_stock
+
+"""
+Multi-item checkout.
+
+A cart is placed as one `Order` with one `OrderItem` per product, in a single transaction:
+
+    1. The products of the cart are read in one query, and the order total is computed from
+       their prices.
+    2. The order and its lines are inserted (one bulk insert for the lines).
+    3. The stock of all lines is held for the order with `reserve_stock` (see
+       `order.reservations`): the product rows are locked with `SELECT ... FOR UPDATE`, ordered
+       by id, so two carts sharing products wait for each other instead of deadlocking, the
+       available-to-promise quantity (stock minus other orders' holds) is checked for every line
+       and the holds are inserted with one bulk insert of `StockReservation`s. Sharded products
+       are not locked; their lines take stock from a shard instead. The stock of other products
+       is decremented once the payment is confirmed.
+
+Any failure rolls back the whole cart, so either every line is placed or none is.
+
+Functions:
+    - checkout(user, items, shipping_address): Place a cart and return the created `Order`.
+"""
+
+
+def checkout(user, items, shipping_address):
+    """
+    Place a multi-item order.
+
+    Args:
+        user (User): The customer placing the order.
+        items (list): `{"product": Product or pk, "quantity": int}` dicts. Lines for the same
+                      product are merged.
+        shipping_address (str): The address the order is shipped to.
+
+    Returns:
+        Order: The created order.
+
+    Raises:
+        serializers.ValidationError: If a product does not exist or does not have enough stock.
+    """
+    quantities = Counter()
+    for item in items:
+        product = item["product"]
+        quantities[getattr(product, "pk", product)] += item["quantity"]
+
+    products = list(
+        Product.objects.filter(pk__in=list(quantities))
+        .order_by("pk")
+        .only("pk", "name", "price")
+    )
+    names = {product.pk: product.name for product in products}
+    missing = sorted(pk for pk in quantities if pk not in names)
+    if missing:
+        raise serializers.ValidationError(
+            {"items": {str(pk): "Product does not exist." for pk in missing}}
+        )
+
+    with transaction.atomic():
+        total_price = sum(
+            product.price * quantities[product.pk] for product in products
+        )
+        order = Order.objects.create(
+            user=user,
+            quantity=sum(quantities.values()),
+            total_price=total_price,
+            shipping_address=shipping_address,
+        )
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    product=product,
+                    quantity=quantities[product.pk],
+                    unit_price=product.price,
+                )
+                for product in products
+            ]
+        )
+        try:
+            reserve_stock(order, quantities)
+        except InsufficientStock as exc:
+            raise serializers.ValidationError(
+                {
+                    "items": {
+                        str(pk): (
+                            f"Cannot order {quantities[pk]} of {names[pk]}. "
+                            f"Only {available} left in stock."
+                        )
+                        for pk, available in sorted(exc.available.items())
+                    }
+                }
+            )
+
+    return order
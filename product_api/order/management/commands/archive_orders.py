@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from order.archive import archive_orders
+
+"""
+Management command that moves closed orders to the archive table.
+
+Delivered, canceled and refunded orders last updated more than `--older-than-days` days ago
+(`ORDER_ARCHIVE_AFTER_DAYS` by default) are moved to `ArchivedOrder` in batches of
+`--batch-size`, one transaction per batch. Run it periodically, e.g. nightly.
+
+Usage:
+    python manage.py archive_orders [--older-than-days 180] [--batch-size 1000]
+"""
+
+
+class Command(BaseCommand):
+    help = "Move old closed orders to the order archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=None,
+            help="Archive closed orders not updated for this many days.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of orders moved per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        days = options["older_than_days"]
+        if days is None:
+            days = getattr(settings, "ORDER_ARCHIVE_AFTER_DAYS", 180)
+        before = timezone.now() - timedelta(days=days)
+        archived = archive_orders(before, options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} orders."))
@@ -0,0 +1,47 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from order.rollups import backfill_sales_rollups
+
+"""
+Management command that rebuilds the daily sales rollups from the order history.
+
+Recomputes the product and category rollups of every day from `--start` to `--end`, `--chunk-days`
+days per transaction. Without a range it covers every day from the first order to today and
+starts the incremental refresh from there; run it once when the rollups are introduced, and
+again for a range after changing product categories.
+
+Usage:
+    python manage.py backfill_sales_rollups [--start 2024-01-01] [--end 2024-12-31] [--chunk-days 31]
+"""
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollups for a range of days."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start",
+            type=date.fromisoformat,
+            default=None,
+            help="First day to recompute (YYYY-MM-DD), defaults to the first order.",
+        )
+        parser.add_argument(
+            "--end",
+            type=date.fromisoformat,
+            default=None,
+            help="Last day to recompute (YYYY-MM-DD), defaults to today.",
+        )
+        parser.add_argument(
+            "--chunk-days",
+            type=int,
+            default=31,
+            help="Number of days recomputed per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        days = backfill_sales_rollups(
+            options["start"], options["end"], options["chunk_days"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Recomputed {days} days of sales."))
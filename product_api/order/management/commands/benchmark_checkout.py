@@ -0,0 +1,97 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from apis.serializers.order_serializer import OrderSerializer
+from order.checkout import checkout
+from product.models.product import Product
+
+"""
+Management command comparing multi-item checkout with one-product-per-order placement.
+
+Each cart of `--items` products is placed either as that many separate orders (one
+`OrderSerializer.create` per product, the flow of `POST /api/orders/`) or as a single checkout
+(`order.checkout.checkout`). The command reports carts per second and queries per cart.
+
+All data is created inside a transaction that is rolled back at the end, so the command can be
+pointed at any database without leaving anything behind.
+
+Usage:
+    python manage.py benchmark_checkout [--carts 200] [--items 5]
+"""
+
+
+class Command(BaseCommand):
+    help = "Benchmark multi-item checkout against one order per product."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--carts", type=int, default=200, help="Carts placed per flow."
+        )
+        parser.add_argument("--items", type=int, default=5, help="Products per cart.")
+
+    def handle(self, *args, **options):
+        carts = options["carts"]
+        items = options["items"]
+
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                username="checkout-benchmark",
+                email="checkout-benchmark@example.com",
+                password=None,
+            )
+            request = APIRequestFactory().post("/api/orders/")
+            request.user = user
+            products = [
+                Product.objects.create(
+                    name=f"Benchmark product {i}",
+                    description="",
+                    price=10 + i,
+                    stock_quantity=carts * 2,
+                )
+                for i in range(items)
+            ]
+
+            def per_product_orders():
+                for product in products:
+                    serializer = OrderSerializer(
+                        data={
+                            "product": product.pk,
+                            "quantity": 1,
+                            "shipping_address": "Benchmark",
+                        },
+                        context={"request": request},
+                    )
+                    serializer.is_valid(raise_exception=True)
+                    with transaction.atomic():
+                        serializer.save()
+
+            def single_checkout():
+                checkout(
+                    user,
+                    [{"product": product.pk, "quantity": 1} for product in products],
+                    "Benchmark",
+                )
+
+            flows = [
+                (f"{items} orders", per_product_orders),
+                ("1 checkout", single_checkout),
+            ]
+            self.stdout.write(f"{carts} carts of {items} products:")
+            for name, place_cart in flows:
+                with CaptureQueriesContext(connection) as queries:
+                    place_cart()
+                started = time.perf_counter()
+                for _ in range(carts - 1):
+                    place_cart()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"  {name:<12} {(carts - 1) / elapsed:8.1f} carts/s  "
+                    f"{len(queries):4d} queries/cart"
+                )
+
+            transaction.set_rollback(True)
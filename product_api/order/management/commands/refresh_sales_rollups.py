@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from order.rollups import refresh_sales_rollups
+
+"""
+Management command that brings the daily sales rollups up to date.
+
+Recomputes the days of the orders created, updated or deleted since the previous run (see
+`order.rollups`). Run it every few minutes from cron.
+
+Usage:
+    python manage.py refresh_sales_rollups [--chunk-days 31]
+"""
+
+
+class Command(BaseCommand):
+    help = "Recompute the sales rollups of the days whose orders changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-days",
+            type=int,
+            default=31,
+            help="Most days recomputed per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        days = refresh_sales_rollups(options["chunk_days"])
+        self.stdout.write(self.style.SUCCESS(f"Recomputed {days} days of sales."))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from order.reservations import release_expired_reservations
+
+"""
+Management command that sweeps expired stock holds.
+
+Marks active holds past their expiry as expired, in batched `UPDATE`s. Expired holds already
+stop counting against available stock, so the sweep only keeps the set of active holds small.
+Run it once from cron, or as a long-running worker process with `--interval`.
+
+Usage:
+    python manage.py release_expired_reservations [--batch-size 1000] [--interval 60]
+"""
+
+
+class Command(BaseCommand):
+    help = "Mark expired stock reservations as expired."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of holds updated per statement.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="Keep running, sweeping every INTERVAL seconds.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_reservations(options["batch_size"])
+            self.stdout.write(f"Expired {released} stock reservations.")
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
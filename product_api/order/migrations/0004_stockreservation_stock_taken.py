@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 05:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("order", "0003_stockreservation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stockreservation",
+            name="stock_taken",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.1.4 on 2026-10-18 06:01
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("order", "0004_stockreservation_stock_taken"),
+        ("product", "0010_stock_shard"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedOrder",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("quantity", models.PositiveIntegerField(default=1)),
+                ("total_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("shipping_address", models.TextField()),
+                (
+                    "order_status",
+                    models.CharField(
+                        choices=[
+                            ("Pending", "Pending"),
+                            ("Payment_Confirmed", "Payment_Confirmed"),
+                            ("Shipped", "Shipped"),
+                            ("Delivered", "Delivered"),
+                            ("Canceled", "Canceled"),
+                            ("Refunded", "Refunded"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                (
+                    "items",
+                    models.JSONField(
+                        blank=True,
+                        default=list,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="archived_orders",
+                        to="product.product",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="archived_orders",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-created_at"], name="archived_order_user_idx"
+                    )
+                ],
+            },
+        ),
+    ]
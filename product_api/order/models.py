@@ -1,7 +1,10 @@
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
+from product.models.category import Category
 from product.models.product import Product
+from product.models.tracking import FieldTrackingMixin
 
 """
 Represents an Order within the e-commerce system.
@@ -18,12 +21,20 @@ Attributes:
 
 Methods:
     __str__(): Returns a string representation of the order, including the order ID, user, and product name.
+
+Changes to the product, quantity and status are tracked in memory (see `FieldTrackingMixin`), so
+the stock signals know the previous values without reading the order again.
+
+Orders placed through checkout carry several products as `OrderItem` lines instead of a single
+`product`; for those `product` is null and `quantity` is the total number of units.
 """
 
 user = get_user_model()
 
 
-class Order(models.Model):
+class Order(FieldTrackingMixin, models.Model):
+    tracked_fields = ("product", "quantity", "order_status")
+
     user = models.ForeignKey(
         user, on_delete=models.SET_NULL, null=True, related_name="orders"
     )
@@ -50,4 +61,265 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
+        if self.product is None:
+            return f"Order #{self.id} by {self.user} for {self.quantity} items"
         return f"Order #{self.id} by {self.user} for {self.product.name}"
+
+
+class OrderItem(models.Model):
+    """
+    A line of a multi-item order.
+
+    Attributes:
+        order (ForeignKey): The order this line belongs to; lines are deleted with their order.
+        product (ForeignKey): The product being ordered. Set to `null` if the product is deleted.
+        quantity (PositiveIntegerField): The number of units of the product.
+        unit_price (DecimalField): The product price at checkout time.
+
+    Methods:
+        line_total: The price of the line (`unit_price * quantity`).
+    """
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey(
+        Product, on_delete=models.SET_NULL, null=True, related_name="order_items"
+    )
+    quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    @property
+    def line_total(self):
+        return self.unit_price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product} (order #{self.order_id})"
+
+
+class StockReservation(models.Model):
+    """
+    A time-limited hold on product stock for an order awaiting payment.
+
+    Placing an order does not decrement `Product.stock_quantity`; it holds the quantity instead.
+    Stock that can still be promised to other customers (available-to-promise) is the stock
+    minus the unexpired active holds. When the order reaches `Payment_Confirmed` its holds are
+    converted into a real stock decrement; cancellations and refunds release them. Holds that
+    outlive `expires_at` stop counting immediately and are marked expired by the sweeper (see
+    `order.reservations`). Holds on sharded products take their units from the stock shards
+    right away (`stock_taken`), so they never wait on the product row; releasing them, or the
+    sweeper expiring them, puts the units back.
+
+    Attributes:
+        order (ForeignKey): The order holding the stock; holds are deleted with their order.
+        product (ForeignKey): The product whose stock is held.
+        quantity (PositiveIntegerField): The number of units held.
+        status (CharField): `Active`, `Converted` (stock decremented), `Released` or `Expired`.
+        expires_at (DateTimeField): When an active hold stops counting against the stock.
+        stock_taken (BooleanField): Whether the held units were already taken from the stock
+                                    when the hold was placed (sharded products).
+        created_at (DateTimeField): When the hold was placed.
+    """
+
+    ACTIVE = "Active"
+    CONVERTED = "Converted"
+    RELEASED = "Released"
+    EXPIRED = "Expired"
+    STATUS_CHOICES = [
+        (ACTIVE, "Active"),
+        (CONVERTED, "Converted"),
+        (RELEASED, "Released"),
+        (EXPIRED, "Expired"),
+    ]
+
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name="reservations"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="reservations"
+    )
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=ACTIVE)
+    expires_at = models.DateTimeField()
+    stock_taken = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Available-to-promise: active holds of a product.
+            models.Index(
+                fields=["product", "status", "expires_at"],
+                name="reservation_product_idx",
+            ),
+            # Sweeper: expired active holds.
+            models.Index(fields=["status", "expires_at"], name="reservation_sweep_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.status} hold of {self.quantity} x {self.product} (order #{self.order_id})"
+
+
+class ArchivedOrder(models.Model):
+    """
+    A closed order moved out of the `Order` table (see `order.archive`).
+
+    Delivered, canceled and refunded orders older than `ORDER_ARCHIVE_AFTER_DAYS` are moved here
+    in batches, so the hot `Order` table and its indexes only grow with recent orders. An
+    archived order keeps its original id (order ids are never reused, so ids stay unique across
+    both tables) and its lines, stored inline as JSON since they are never queried on their own.
+    Archived orders are read-only.
+
+    Attributes:
+        id (BigIntegerField): The id the order had in the `Order` table.
+        user (ForeignKey): The customer who placed the order.
+        product (ForeignKey): The product of a single-product order; null for checkout orders.
+        quantity (PositiveIntegerField): The number of units ordered.
+        total_price (DecimalField): The total cost of the order.
+        shipping_address (TextField): The address the order was shipped to.
+        order_status (CharField): The final status of the order.
+        items (JSONField): The order lines: `{"product", "quantity", "unit_price"}` dicts.
+        created_at (DateTimeField): When the order was placed.
+        updated_at (DateTimeField): When the order was last updated before being archived.
+        archived_at (DateTimeField): When the order was archived.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        user, on_delete=models.SET_NULL, null=True, related_name="archived_orders"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.SET_NULL, null=True, related_name="archived_orders"
+    )
+    quantity = models.PositiveIntegerField(default=1)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    shipping_address = models.TextField()
+    order_status = models.CharField(max_length=50, choices=Order.ORDER_STATUS_CHOICES)
+    items = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # A customer's order history, newest first.
+            models.Index(
+                fields=["user", "-created_at"], name="archived_order_user_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Archived order #{self.id} by {self.user}"
+
+
+class ProductSalesRollup(models.Model):
+    """
+    The sales of one product on one day, per order status (see `order.rollups`).
+
+    Rollup rows are derived data: they are recomputed a whole day at a time from the hot and
+    archived orders placed that day, so reporting never aggregates the order tables itself.
+
+    Attributes:
+        day (DateField): The day the orders were placed, in the current time zone.
+        product (ForeignKey): The product sold; its rollups are removed with it.
+        order_status (CharField): The current status of the orders counted in the row.
+        revenue (DecimalField): The amount the product's order lines came to.
+        units (PositiveIntegerField): The number of units ordered.
+        order_count (PositiveIntegerField): The number of orders containing the product.
+    """
+
+    day = models.DateField()
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="sales_rollups"
+    )
+    order_status = models.CharField(max_length=50, choices=Order.ORDER_STATUS_CHOICES)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves the date range scans of the store-wide reports.
+            models.UniqueConstraint(
+                fields=["day", "product", "order_status"],
+                name="unique_product_sales_rollup",
+            )
+        ]
+        indexes = [
+            # The time series of one product.
+            models.Index(fields=["product", "day"], name="product_sales_rollup_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.product_id} {self.order_status}: {self.revenue}"
+
+
+class CategorySalesRollup(models.Model):
+    """
+    The sales of one category on one day, per order status (see `order.rollups`).
+
+    A product counts towards every category it currently belongs to.
+
+    Attributes:
+        day (DateField): The day the orders were placed, in the current time zone.
+        category (ForeignKey): The category; its rollups are removed with it.
+        order_status (CharField): The current status of the orders counted in the row.
+        revenue (DecimalField): The amount the order lines of the category's products came to.
+        units (PositiveIntegerField): The number of units ordered.
+        order_count (PositiveIntegerField): The number of orders containing any of the
+                                            category's products.
+    """
+
+    day = models.DateField()
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="sales_rollups"
+    )
+    order_status = models.CharField(max_length=50, choices=Order.ORDER_STATUS_CHOICES)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "category", "order_status"],
+                name="unique_category_sales_rollup",
+            )
+        ]
+        indexes = [
+            # The time series of one category.
+            models.Index(fields=["category", "day"], name="category_sales_rollup_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.category_id} {self.order_status}: {self.revenue}"
+
+
+class SalesRollupCursor(models.Model):
+    """
+    How far the incremental rollup refresh has read the order table (a single row).
+
+    Attributes:
+        position (DateTimeField): Orders updated at or after this moment (minus
+                                  `SALES_ROLLUP_OVERLAP`) are picked up by the next refresh;
+                                  null until a full backfill has run.
+    """
+
+    position = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Sales rollups up to {self.position}"
+
+
+class StaleSalesDay(models.Model):
+    """
+    A day whose rollups must be recomputed because one of its orders was deleted.
+
+    Deleted orders leave no `updated_at` behind for the incremental refresh to find, so the
+    order `post_delete` receiver records their day here instead.
+
+    Attributes:
+        day (DateField): The day the deleted order was placed.
+    """
+
+    day = models.DateField(primary_key=True)
+
+    def __str__(self):
+        return str(self.day)
@@ -0,0 +1,437 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from product.models.product import Product
+from product.models.stock_ledger import StockMovement
+from product.stock import (
+    decrement_stocks,
+    get_sharded_stock,
+    return_stock,
+    take_sharded_stock,
+)
+
+from .models import StockReservation
+
+"""
+Time-limited inventory reservations.
+
+Orders awaiting payment hold stock in `StockReservation` rows instead of decrementing
+`Product.stock_quantity`. The available-to-promise quantity of a product is its stock minus its
+unexpired active holds, and every new hold is checked against it while the product rows are
+locked (`SELECT ... FOR UPDATE`, in id order), so concurrent orders can never promise the same
+units twice.
+
+Sharded products (see `product.stock`) are never locked: their holds take the units from a stock
+shard straight away with a conditional `UPDATE` (`stock_taken`), so concurrent orders for a
+flash-sale product only contend on the shard rows. Their available-to-promise quantity is the
+sum of their shards, which such holds have already been taken from. Sharding a product takes the
+units of its outstanding holds out of the stock before it is split (`take_outstanding_holds`,
+run from `shard_stock` through the `stock_sharding` signal).
+
+Lifecycle (driven by `Order.order_status`, see `order.signals`):
+    - Placing an order holds its quantities for `STOCK_RESERVATION_TTL` seconds (`reserve_stock`).
+    - `Payment_Confirmed` converts the holds into a real, conditional stock decrement
+      (`confirm_reservations`). A hold that already expired is re-checked against the current
+      availability first.
+    - `Canceled` / `Refunded` release the holds, returning the stock of converted ones
+      (`release_reservations`).
+    - Expired holds stop counting at once; the sweeper (`release_expired_reservations`, run by the
+      `release_expired_reservations` management command) marks them expired in batched `UPDATE`s,
+      returning the units of holds that had taken their stock.
+
+Functions:
+    - get_held_quantities(product_ids, exclude_order): Units held per product by active holds.
+    - get_available_quantity(product, exclude_order): Available-to-promise of a product.
+    - lock_products(product_ids, fields): Lock product rows in id order.
+    - check_availability(products, quantities, exclude_order): Raise if any quantity cannot be promised.
+    - hold_stock(order, quantities): Insert active holds for an order.
+    - take_sharded_holds(order, quantities): Take stock from the shards and hold it for an order.
+    - take_outstanding_holds(product_id, stock): Take the units of a product's holds out of its stock.
+    - reserve_stock(order, quantities): Lock, check and hold in one transaction.
+    - confirm_reservations(order): Convert an order's holds into stock decrements.
+    - release_reservations(order): Release an order's holds.
+    - release_expired_reservations(batch_size): Mark expired holds as expired, in batches.
+"""
+
+
+class InsufficientStock(ValueError):
+    """
+    Raised when a quantity cannot be promised.
+
+    Attributes:
+        available (dict): Maps each short product's primary key to the quantity that is still
+                          available (0 for products that do not exist).
+    """
+
+    def __init__(self, available):
+        self.available = available
+        super().__init__("Not enough stock available.")
+
+
+def order_reference(order):
+    """
+    Return the stock ledger reference of an order.
+    """
+    return f"order:{order.pk}"
+
+
+def get_reservation_ttl():
+    return timedelta(seconds=getattr(settings, "STOCK_RESERVATION_TTL", 15 * 60))
+
+
+def get_held_quantities(product_ids, exclude_order=None):
+    """
+    Return `{product_id: held units}` for the unexpired active holds on the given products.
+
+    Args:
+        product_ids (iterable): Primary keys of the products.
+        exclude_order (Order): An order whose own holds are not counted.
+    """
+    holds = StockReservation.objects.filter(
+        product_id__in=list(product_ids),
+        status=StockReservation.ACTIVE,
+        stock_taken=False,
+        expires_at__gt=timezone.now(),
+    )
+    if exclude_order is not None:
+        holds = holds.exclude(order=exclude_order)
+    return dict(
+        holds.values("product_id")
+        .annotate(held=Sum("quantity"))
+        .values_list("product_id", "held")
+    )
+
+
+def get_available_quantity(product, exclude_order=None):
+    """
+    Return the available-to-promise quantity of `product`: its stock (the sum of its shards for
+    a sharded product) minus active holds.
+    """
+    stock = get_sharded_stock([product.pk]).get(product.pk, product.stock_quantity)
+    held = get_held_quantities([product.pk], exclude_order).get(product.pk, 0)
+    return max(stock - held, 0)
+
+
+def lock_products(product_ids, fields=("pk", "stock_quantity")):
+    """
+    Lock the rows of the given products with `SELECT ... FOR UPDATE` and return them.
+
+    Rows are always locked in primary-key order, so two transactions locking overlapping sets of
+    products wait for each other instead of deadlocking. Must be called inside a transaction.
+    """
+    return list(
+        Product.objects.select_for_update()
+        .filter(pk__in=list(product_ids))
+        .order_by("pk")
+        .only(*fields)
+    )
+
+
+def check_availability(products, quantities, exclude_order=None):
+    """
+    Check that every quantity can be promised from the (locked) products.
+
+    Args:
+        products (list): The locked products, as returned by `lock_products`.
+        quantities (dict): Maps product primary keys to the units requested.
+        exclude_order (Order): An order whose own holds are not counted.
+
+    Raises:
+        InsufficientStock: If a product is missing or has less available than requested.
+    """
+    held = get_held_quantities(quantities, exclude_order)
+    available = {pk: 0 for pk in quantities}
+    for product in products:
+        available[product.pk] = max(product.stock_quantity - held.get(product.pk, 0), 0)
+    shortages = {
+        pk: available[pk]
+        for pk, quantity in quantities.items()
+        if quantity > available[pk]
+    }
+    if shortages:
+        raise InsufficientStock(shortages)
+
+
+def hold_stock(order, quantities, stock_taken=False):
+    """
+    Insert active holds of `quantities` for `order`, expiring after `STOCK_RESERVATION_TTL`.
+
+    Availability must already have been checked under the product locks, or the units taken
+    from the stock (`stock_taken`).
+    """
+    expires_at = timezone.now() + get_reservation_ttl()
+    StockReservation.objects.bulk_create(
+        [
+            StockReservation(
+                order=order,
+                product_id=pk,
+                quantity=quantity,
+                expires_at=expires_at,
+                stock_taken=stock_taken,
+            )
+            for pk, quantity in quantities.items()
+            if quantity > 0
+        ]
+    )
+
+
+def take_sharded_holds(order, quantities):
+    """
+    Take the quantities of sharded products from their shards and hold them for `order`.
+
+    Must be called inside a transaction, which the caller rolls back on failure: the shards of
+    the products before a short one may already have been decremented.
+
+    Raises:
+        InsufficientStock: If a product's shards hold less than the quantity requested.
+    """
+    for pk, quantity in sorted(quantities.items()):
+        if not take_sharded_stock(
+            pk, quantity, reason=StockMovement.ORDER, reference=order_reference(order)
+        ):
+            raise InsufficientStock({pk: get_sharded_stock([pk]).get(pk, 0)})
+    hold_stock(order, quantities, stock_taken=True)
+
+
+def take_outstanding_holds(product_id, stock):
+    """
+    Take the units of a product's unexpired holds out of the `stock` about to be sharded.
+
+    Holds on a product row only count against its availability, so the shards would promise
+    their units again. They take their units out of the stock instead, as if placed on the
+    sharded product, oldest first while the stock covers them, and are recorded as order
+    movements. Must be called inside `shard_stock`'s transaction, with the product locked.
+
+    Returns:
+        int: The units taken.
+    """
+    holds = list(
+        StockReservation.objects.select_for_update()
+        .filter(
+            product_id=product_id,
+            status=StockReservation.ACTIVE,
+            stock_taken=False,
+            expires_at__gt=timezone.now(),
+        )
+        .order_by("pk")
+        .only("pk", "order_id", "quantity")
+    )
+    taken = []
+    for hold in holds:
+        if hold.quantity > stock:
+            break
+        stock -= hold.quantity
+        taken.append(hold)
+    StockMovement.objects.bulk_create(
+        [
+            StockMovement(
+                product_id=product_id,
+                delta=-hold.quantity,
+                reason=StockMovement.ORDER,
+                reference=f"order:{hold.order_id}",
+            )
+            for hold in taken
+        ]
+    )
+    StockReservation.objects.filter(pk__in=[hold.pk for hold in taken]).update(
+        stock_taken=True
+    )
+    return sum(hold.quantity for hold in taken)
+
+
+def reserve_stock(order, quantities):
+    """
+    Hold stock for an order: lock the products, check availability and insert the holds.
+
+    Sharded products are not locked; their quantities are taken from their shards instead (see
+    `take_sharded_holds`).
+
+    Args:
+        order (Order): The saved order the stock is held for.
+        quantities (dict): Maps product primary keys to the units to hold.
+
+    Raises:
+        InsufficientStock: If any quantity cannot be promised; nothing is held then.
+    """
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return
+    with transaction.atomic():
+        sharded = set(get_sharded_stock(quantities))
+        if sharded:
+            take_sharded_holds(
+                order, {pk: quantities[pk] for pk in quantities if pk in sharded}
+            )
+            quantities = {
+                pk: quantity for pk, quantity in quantities.items() if pk not in sharded
+            }
+            if not quantities:
+                return
+        products = lock_products(quantities)
+        # A product sharded while we waited for its lock now takes from its shards.
+        sharded = set(get_sharded_stock(quantities))
+        if sharded:
+            take_sharded_holds(
+                order, {pk: quantities.pop(pk) for pk in sorted(sharded)}
+            )
+            products = [product for product in products if product.pk not in sharded]
+        check_availability(products, quantities, exclude_order=order)
+        hold_stock(order, quantities)
+
+
+def confirm_reservations(order):
+    """
+    Convert the holds of a paid order into a stock decrement.
+
+    Holds that expired (whether or not the sweeper got to them yet) no longer guarantee the
+    stock, so their quantities are checked against the current availability first. Holds that
+    took their stock when they were placed are converted as they are; other holds on sharded
+    products take their stock from the shards.
+
+    Raises:
+        InsufficientStock: If an expired hold can no longer be covered; nothing is converted then.
+    """
+    with transaction.atomic():
+        reservations = list(
+            order.reservations.select_for_update().filter(
+                status__in=[StockReservation.ACTIVE, StockReservation.EXPIRED]
+            )
+        )
+        if not reservations:
+            return
+
+        quantities = Counter()
+        lapsed = Counter()
+        now = timezone.now()
+        for reservation in reservations:
+            if reservation.stock_taken:
+                continue
+            quantities[reservation.product_id] += reservation.quantity
+            if (
+                reservation.status == StockReservation.EXPIRED
+                or reservation.expires_at <= now
+            ):
+                lapsed[reservation.product_id] += reservation.quantity
+
+        sharded = set(get_sharded_stock(quantities))
+        for pk in sorted(sharded):
+            if not take_sharded_stock(
+                pk,
+                quantities.pop(pk),
+                reason=StockMovement.ORDER,
+                reference=order_reference(order),
+            ):
+                raise InsufficientStock({pk: get_sharded_stock([pk]).get(pk, 0)})
+
+        products = lock_products(quantities)
+        lapsed = {pk: quantity for pk, quantity in lapsed.items() if pk in quantities}
+        if lapsed:
+            check_availability(products, lapsed, exclude_order=order)
+        if not decrement_stocks(
+            quantities, reason=StockMovement.ORDER, reference=order_reference(order)
+        ):
+            available = {product.pk: product.stock_quantity for product in products}
+            raise InsufficientStock(
+                {
+                    pk: available.get(pk, 0)
+                    for pk, quantity in quantities.items()
+                    if quantity > available.get(pk, 0)
+                }
+            )
+
+        StockReservation.objects.filter(
+            pk__in=[reservation.pk for reservation in reservations]
+        ).update(status=StockReservation.CONVERTED, stock_taken=True)
+
+
+def release_reservations(order):
+    """
+    Release every hold of a canceled or refunded order.
+
+    Active and expired holds are simply released; converted holds, and holds that took their
+    stock when they were placed, also return their stock.
+
+    Returns:
+        bool: True if any of the released holds had been converted.
+    """
+    with transaction.atomic():
+        reservations = list(
+            order.reservations.select_for_update().exclude(
+                status=StockReservation.RELEASED
+            )
+        )
+        taken = [
+            reservation
+            for reservation in reservations
+            if reservation.stock_taken
+            or reservation.status == StockReservation.CONVERTED
+        ]
+        for reservation in sorted(taken, key=lambda r: r.product_id):
+            return_stock(
+                reservation.product_id,
+                reservation.quantity,
+                reason=StockMovement.ORDER_CANCEL,
+                reference=order_reference(order),
+            )
+        StockReservation.objects.filter(
+            pk__in=[reservation.pk for reservation in reservations]
+        ).update(status=StockReservation.RELEASED, stock_taken=False)
+    return any(
+        reservation.status == StockReservation.CONVERTED for reservation in reservations
+    )
+
+
+def release_expired_reservations(batch_size=1000):
+    """
+    Mark active holds past their `expires_at` as expired, `batch_size` rows per `UPDATE`.
+
+    Expired holds already stop counting against availability, so this is bookkeeping: it keeps
+    the set of active holds small. The `status=Active` condition on the `UPDATE` leaves alone any
+    hold converted or released concurrently. Holds that took their stock when they were placed
+    (sharded products) are locked, skipping those locked by a concurrent confirmation, and
+    return their units to the shards as they expire.
+
+    Returns:
+        int: The number of holds marked expired.
+    """
+    now = timezone.now()
+    expired = StockReservation.objects.filter(
+        status=StockReservation.ACTIVE, expires_at__lte=now
+    )
+    total = 0
+    while True:
+        with transaction.atomic():
+            taken = list(
+                expired.filter(stock_taken=True)
+                .select_for_update(skip_locked=True)
+                .order_by("pk")
+                .only("pk", "order_id", "product_id", "quantity")[:batch_size]
+            )
+            for reservation in taken:
+                return_stock(
+                    reservation.product_id,
+                    reservation.quantity,
+                    reason=StockMovement.ORDER_EXPIRE,
+                    reference=f"order:{reservation.order_id}",
+                )
+            total += StockReservation.objects.filter(
+                pk__in=[reservation.pk for reservation in taken]
+            ).update(status=StockReservation.EXPIRED, stock_taken=False)
+        if taken:
+            continue
+
+        batch = list(
+            expired.filter(stock_taken=False)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not batch:
+            return total
+        total += StockReservation.objects.filter(
+            pk__in=batch, status=StockReservation.ACTIVE, stock_taken=False
+        ).update(status=StockReservation.EXPIRED)
@@ -0,0 +1,384 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Min, Sum
+from django.db.models.functions import Trunc, TruncDate
+from django.utils import timezone
+
+from product.models import Product
+
+from .models import (
+    ArchivedOrder,
+    CategorySalesRollup,
+    Order,
+    OrderItem,
+    ProductSalesRollup,
+    SalesRollupCursor,
+    StaleSalesDay,
+)
+
+"""
+Daily sales rollups.
+
+Reports read `ProductSalesRollup` and `CategorySalesRollup` (revenue, units and order count per
+day, product or category, and order status) instead of aggregating the order tables, so a
+revenue series or a top-products list costs a scan of a few rollup rows per day.
+
+Rollups are recomputed one whole day at a time from the orders placed that day, in the hot
+`Order` table and in the archive (see `order.archive`), so recomputing a day is idempotent and
+archiving orders never changes the figures:
+
+    - `refresh_sales_rollups` is incremental: it recomputes the days of the orders updated since
+      its previous run (a status change bumps `updated_at`, bulk transitions included), plus the
+      days recorded in `StaleSalesDay` by deleted orders. It re-reads `SALES_ROLLUP_OVERLAP`
+      seconds before its last position, so orders committed late by long transactions are not
+      missed. Run it every few minutes.
+    - `backfill_sales_rollups` recomputes a range of days, by default all of them, in chunks of
+      `chunk_days` days with one transaction per chunk (see the `backfill_sales_rollups`
+      management command).
+
+Recomputations replace whole days, so run one refresh or backfill at a time (e.g. from a single
+scheduler).
+
+Revenue is the order total for single-product orders and the line totals for checkout orders.
+A product counts towards the categories it belongs to when its day is recomputed; orders of
+deleted products are not attributed. `order_count` counts the orders containing the product (or
+any product of the category), so an order spanning several products is counted once for each.
+
+Constants:
+    - REVENUE_STATUSES (tuple): The statuses reports count as revenue by default.
+    - INTERVALS (tuple): The periods a revenue series can be grouped by.
+
+Functions:
+    - recompute_sales_rollups(start, end): Rebuild the rollups of the days `start` to `end`.
+    - refresh_sales_rollups(chunk_days): Recompute the days of the orders changed since the last run.
+    - backfill_sales_rollups(start, end, chunk_days): Recompute a range of days in chunks.
+    - mark_sales_day_stale(created_at): Queue the day of a deleted order for recomputation.
+    - get_revenue_series(...): Revenue, units and order count per period.
+    - get_top_products(...): The best-selling products over a range of days.
+"""
+
+REVENUE_STATUSES = ("Payment_Confirmed", "Shipped", "Delivered")
+INTERVALS = ("day", "week", "month")
+
+
+def _day_bounds(start, end):
+    # The moments the days `start` to `end` (inclusive) begin and end, in the current time zone.
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+
+def _sales_lines(start, end):
+    # Yield (day, order_status, order_id, product_id, quantity, revenue) for every product line
+    # of the orders placed between `start` and `end`, hot and archived.
+    since, until = _day_bounds(start, end)
+
+    for pk, created_at, status, product_id, quantity, total in (
+        Order.objects.filter(
+            created_at__gte=since, created_at__lt=until, product__isnull=False
+        )
+        .order_by()
+        .values_list(
+            "pk", "created_at", "order_status", "product_id", "quantity", "total_price"
+        )
+    ):
+        yield timezone.localdate(created_at), status, pk, product_id, quantity, total
+
+    for order_id, created_at, status, product_id, quantity, unit_price in (
+        OrderItem.objects.filter(
+            order__created_at__gte=since,
+            order__created_at__lt=until,
+            product__isnull=False,
+        )
+        .order_by()
+        .values_list(
+            "order_id",
+            "order__created_at",
+            "order__order_status",
+            "product_id",
+            "quantity",
+            "unit_price",
+        )
+    ):
+        day = timezone.localdate(created_at)
+        yield day, status, order_id, product_id, quantity, unit_price * quantity
+
+    for pk, created_at, status, product_id, quantity, total, items in (
+        ArchivedOrder.objects.filter(created_at__gte=since, created_at__lt=until)
+        .order_by()
+        .values_list(
+            "pk",
+            "created_at",
+            "order_status",
+            "product_id",
+            "quantity",
+            "total_price",
+            "items",
+        )
+    ):
+        day = timezone.localdate(created_at)
+        if product_id is not None:
+            yield day, status, pk, product_id, quantity, total
+        for item in items:
+            if item["product"] is not None:
+                revenue = Decimal(item["unit_price"]) * item["quantity"]
+                yield day, status, pk, item["product"], item["quantity"], revenue
+
+
+def _aggregate(totals, key, order_id, quantity, revenue):
+    total = totals[key]
+    total[0] += revenue
+    total[1] += quantity
+    total[2].add(order_id)
+
+
+def _new_total():
+    return [Decimal("0"), 0, set()]
+
+
+def recompute_sales_rollups(start, end):
+    """
+    Rebuild the product and category rollups of the days `start` to `end` (inclusive).
+
+    The orders of the range are read and aggregated first; the range's rollups are then
+    replaced in one transaction.
+
+    Args:
+        start (date): The first day to recompute.
+        end (date): The last day to recompute.
+
+    Returns:
+        int: The number of product rollup rows written.
+    """
+    by_product = defaultdict(_new_total)
+    for day, status, order_id, product_id, quantity, revenue in _sales_lines(
+        start, end
+    ):
+        _aggregate(by_product, (day, product_id, status), order_id, quantity, revenue)
+
+    product_ids = {product_id for _, product_id, _ in by_product}
+    existing = set(
+        Product.objects.filter(pk__in=product_ids).values_list("pk", flat=True)
+    )
+    categories = defaultdict(list)
+    for product_id, category_id in Product.categories.through.objects.filter(
+        product_id__in=existing
+    ).values_list("product_id", "category_id"):
+        categories[product_id].append(category_id)
+
+    by_category = defaultdict(_new_total)
+    for (day, product_id, status), (revenue, units, orders) in by_product.items():
+        for category_id in categories[product_id]:
+            total = by_category[(day, category_id, status)]
+            total[0] += revenue
+            total[1] += units
+            total[2].update(orders)
+
+    with transaction.atomic():
+        ProductSalesRollup.objects.filter(day__range=(start, end)).delete()
+        CategorySalesRollup.objects.filter(day__range=(start, end)).delete()
+        rows = ProductSalesRollup.objects.bulk_create(
+            [
+                ProductSalesRollup(
+                    day=day,
+                    product_id=product_id,
+                    order_status=status,
+                    revenue=revenue,
+                    units=units,
+                    order_count=len(orders),
+                )
+                for (day, product_id, status), (revenue, units, orders) in sorted(
+                    by_product.items(), key=lambda entry: entry[0]
+                )
+                if product_id in existing
+            ],
+            batch_size=1000,
+        )
+        CategorySalesRollup.objects.bulk_create(
+            [
+                CategorySalesRollup(
+                    day=day,
+                    category_id=category_id,
+                    order_status=status,
+                    revenue=revenue,
+                    units=units,
+                    order_count=len(orders),
+                )
+                for (day, category_id, status), (revenue, units, orders) in sorted(
+                    by_category.items(), key=lambda entry: entry[0]
+                )
+            ],
+            batch_size=1000,
+        )
+    return len(rows)
+
+
+def _day_ranges(days, chunk_days):
+    # Group sorted days into runs of consecutive days, at most `chunk_days` long.
+    ranges = []
+    for day in sorted(days):
+        if ranges:
+            start, end = ranges[-1]
+            if day == end + timedelta(days=1) and (day - start).days < chunk_days:
+                ranges[-1] = (start, day)
+                continue
+        ranges.append((day, day))
+    return ranges
+
+
+def _get_cursor():
+    return SalesRollupCursor.objects.get_or_create(pk=1)[0]
+
+
+def refresh_sales_rollups(chunk_days=31):
+    """
+    Recompute the rollups of the days whose orders changed since the previous refresh.
+
+    The first refresh, before any full backfill, runs one (`backfill_sales_rollups()`).
+
+    Args:
+        chunk_days (int): The most days recomputed at once.
+
+    Returns:
+        int: The number of days recomputed.
+    """
+    cursor = _get_cursor()
+    if cursor.position is None:
+        return backfill_sales_rollups(chunk_days=chunk_days)
+
+    started = timezone.now()
+    since = cursor.position - timedelta(
+        seconds=getattr(settings, "SALES_ROLLUP_OVERLAP", 600)
+    )
+    days = set(
+        Order.objects.filter(updated_at__gte=since)
+        .order_by()
+        .annotate(day=TruncDate("created_at"))
+        .values_list("day", flat=True)
+        .distinct()
+    )
+    stale = list(StaleSalesDay.objects.values_list("day", flat=True))
+    days.update(stale)
+
+    for start, end in _day_ranges(days, chunk_days):
+        recompute_sales_rollups(start, end)
+    StaleSalesDay.objects.filter(day__in=stale).delete()
+    SalesRollupCursor.objects.filter(pk=cursor.pk).update(position=started)
+    return len(days)
+
+
+def backfill_sales_rollups(start=None, end=None, chunk_days=31):
+    """
+    Recompute the rollups of the days `start` to `end`, `chunk_days` days at a time.
+
+    Without `start` and `end` every day from the first order to today is recomputed, and the
+    incremental refresh then carries on from the moment the backfill started.
+
+    Args:
+        start (date): The first day (defaults to the day of the oldest order).
+        end (date): The last day (defaults to today).
+        chunk_days (int): Days recomputed per transaction.
+
+    Returns:
+        int: The number of days recomputed.
+    """
+    full = start is None and end is None
+    started = timezone.now()
+    if start is None:
+        oldest = [
+            model.objects.aggregate(oldest=Min("created_at"))["oldest"]
+            for model in (Order, ArchivedOrder)
+        ]
+        oldest = [moment for moment in oldest if moment is not None]
+        start = timezone.localdate(min(oldest)) if oldest else timezone.localdate()
+    if end is None:
+        end = timezone.localdate()
+
+    days = 0
+    while start <= end:
+        chunk_end = min(start + timedelta(days=chunk_days - 1), end)
+        recompute_sales_rollups(start, chunk_end)
+        days += (chunk_end - start).days + 1
+        start = chunk_end + timedelta(days=1)
+
+    if full:
+        SalesRollupCursor.objects.filter(pk=_get_cursor().pk).update(position=started)
+    return days
+
+
+def mark_sales_day_stale(created_at):
+    StaleSalesDay.objects.get_or_create(day=timezone.localdate(created_at))
+
+
+def _filter_rollups(start, end, statuses, product=None, category=None):
+    if category is not None:
+        rollups = CategorySalesRollup.objects.filter(category=category)
+    else:
+        rollups = ProductSalesRollup.objects.all()
+        if product is not None:
+            rollups = rollups.filter(product=product)
+    return rollups.filter(day__range=(start, end), order_status__in=statuses)
+
+
+def get_revenue_series(
+    start, end, interval="day", statuses=REVENUE_STATUSES, product=None, category=None
+):
+    """
+    Return revenue, units and order count per period between `start` and `end`.
+
+    Args:
+        start (date): The first day of the series.
+        end (date): The last day of the series.
+        interval (str): `day`, `week` (starting on Monday) or `month`.
+        statuses (iterable): The order statuses counted.
+        product (int): Only count this product.
+        category (int): Only count the products of this category.
+
+    Returns:
+        QuerySet: `{"period", "revenue", "units", "order_count"}` dicts, oldest first; periods
+                  without sales are left out.
+    """
+    return (
+        _filter_rollups(start, end, statuses, product, category)
+        .annotate(period=Trunc("day", interval))
+        .values("period")
+        .annotate(
+            revenue=Sum("revenue"), units=Sum("units"), order_count=Sum("order_count")
+        )
+        .order_by("period")
+    )
+
+
+def get_top_products(
+    start, end, limit=10, order_by="revenue", statuses=REVENUE_STATUSES, category=None
+):
+    """
+    Return the `limit` best-selling products between `start` and `end`.
+
+    Args:
+        start (date): The first day counted.
+        end (date): The last day counted.
+        limit (int): The number of products returned.
+        order_by (str): `revenue` or `units`.
+        statuses (iterable): The order statuses counted.
+        category (int): Only rank the products of this category.
+
+    Returns:
+        QuerySet: `{"product", "name", "revenue", "units", "order_count"}` dicts, best first.
+    """
+    rollups = _filter_rollups(start, end, statuses)
+    if category is not None:
+        rollups = rollups.filter(product__categories=category)
+    return (
+        rollups.values("product", name=F("product__name"))
+        .annotate(
+            revenue=Sum("revenue"), units=Sum("units"), order_count=Sum("order_count")
+        )
+        .order_by(f"-{order_by}", "product")[:limit]
+    )
@@ -1,56 +1,205 @@
-from django.db.models.signals import post_delete, post_save
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_delete, pre_save
 from django.dispatch import receiver
 
-from .models import Order
+from product.models.product import Product
+from product.models.stock_ledger import StockMovement
+from product.stock import return_stock, stock_sharding, take_stock
+
+from .models import Order, StockReservation
+from .reservations import (
+    confirm_reservations,
+    order_reference,
+    release_reservations,
+    reserve_stock,
+    take_outstanding_holds,
+)
+from .rollups import mark_sales_day_stale
+from .transitions import (
+    CONFIRMED_STATUS,
+    RELEASED_STATUSES,
+    InvalidTransition,
+    can_transition,
+)
 
 """
-Signal receivers to adjust product stock when an order is created, updated, or deleted.
+Signal receivers to adjust product stock when an order is updated or deleted.
 
-- `update_stock_on_order_save`: Updates the stock quantity when an order is created or updated.
+- `update_stock_on_order_save`: Converts or releases stock holds when the order status changes,
+  and adjusts held or taken stock when the quantity or product of an order changes.
 - `update_stock_on_order_delete`: Restores the stock quantity when an order is deleted.
+- `update_stock_on_reservation_delete`: Restores the stock of a converted hold, or of a hold that
+  took its stock from a shard, when it is deleted.
+- `mark_sales_day_on_order_delete`: Queues the day of a deleted order for the sales rollup
+  refresh (see `order.rollups`), which cannot find deleted orders by `updated_at`.
+- `take_holds_on_sharding`: Takes the units of a product's outstanding holds out of its stock
+  when it is first sharded (see `product.stock.shard_stock`).
 
 Signal Handlers:
-    - post_save (Order): Triggered after an `Order` instance is saved.
-    - post_delete (Order): Triggered after an `Order` instance is deleted.
+    - pre_save (Order): Triggered before an `Order` instance is saved.
+    - pre_delete / post_delete (Order): Triggered before/after an `Order` instance is deleted.
+    - post_delete (Order): Also queues the order's day for the sales rollups.
+    - post_delete (StockReservation): Triggered after a hold is deleted, e.g. with its order.
+    - stock_sharding (Product): Triggered when a product is first sharded.
 
 Signal Handlers' Responsibilities:
-    1. **update_stock_on_order_save**: 
-        - If the order is newly created, it reduces the stock quantity of the ordered product by the quantity in the order, ensuring enough stock is available.
-        - If the order is updated (quantity changed), it adjusts the stock based on the difference between the original quantity and the updated quantity.
+    1. **update_stock_on_order_save**:
+        - New orders are skipped: their stock is held once, when the order is placed, by
+          `OrderSerializer.create` or `order.checkout.checkout`.
+        - A status change that the state machine of `order.transitions` does not allow is rejected
+          with `InvalidTransition` before anything is changed.
+        - When the status changes to `Payment_Confirmed`, the order's holds are converted into a stock decrement.
+        - When the status changes to `Canceled` or `Refunded`, the order's holds are released, and converted stock is returned.
+        - If the quantity or product of an order with holds changes, the holds are replaced (and converted again if they had been).
+          A checkout order re-holds its `OrderItem` lines, whose quantities its `quantity` only sums.
+        - If the quantity or product of an order without holds (placed before reservations existed) changes, the stock is adjusted by the difference, as before.
 
     2. **update_stock_on_order_delete**:
-        - When an order is deleted, the stock quantity of the associated product is increased by the order quantity, reflecting the reversal of the order.
+        - When an order without holds is deleted, the stock quantity of the associated product is increased by the order quantity, reflecting the reversal of the order.
+        - Orders with holds are handled by **update_stock_on_reservation_delete** as their holds are deleted with them.
+
+All adjustments are atomic conditional `UPDATE`s of the product row or, for sharded products, of
+one of its stock shards (see `product.stock`), recorded in the stock
+ledger with the order as reference, or holds checked under product row locks (see
+`order.reservations`), never a read-modify-write of the product row.
+The previous product, quantity and status come from the values the order was loaded with
+(`FieldTrackingMixin`), so an update does not read the order row again. Updates run before the
+order row is written, so an order whose change cannot be covered is not
+saved. Bulk status changes (see `order.transitions`) bypass these receivers and apply the same
+stock effects themselves.
 
 Exceptions:
-    - `ValueError`: Raised when there is insufficient stock to fulfill an order (for creation or update).
+    - `ValueError` (`order.reservations.InsufficientStock` for holds): Raised when there is insufficient stock to fulfill an order update.
+    - `order.transitions.InvalidTransition`: Raised when the order status may not move to the new status.
 """
 
 
-# Adjust stock when an order is created or updated
-@receiver(post_save, sender=Order)
-def update_stock_on_order_save(sender, instance, created, **kwargs):
-    product = instance.product
-    if created:
-        # Deduct stock for a new order
-        if product.stock_quantity >= instance.quantity:
-            product.stock_quantity -= instance.quantity
-            product.save()
-        else:
+def adjust_taken_stock(instance, original):
+    # Orders placed before reservations existed took their stock at placement time.
+    ledger = {
+        "reason": StockMovement.ORDER_CHANGE,
+        "reference": order_reference(instance),
+    }
+    if original["product_id"] != instance.product_id:
+        # The order moved to another product: take the new stock, then return the old.
+        if instance.product_id is not None and not take_stock(
+            instance.product_id, instance.quantity, **ledger
+        ):
             raise ValueError("Not enough stock available.")
-    else:
-        # If order is updated, adjust stock accordingly
-        original = sender.objects.get(pk=instance.pk)
-        difference = instance.quantity - original.quantity
-        if product.stock_quantity >= difference:
-            product.stock_quantity -= difference
-            product.save()
-        else:
+        if original["product_id"] is not None:
+            return_stock(original["product_id"], original["quantity"], **ledger)
+        return
+
+    if instance.product_id is None:
+        return
+    difference = instance.quantity - original["quantity"]
+    if difference > 0:
+        if not take_stock(instance.product_id, difference, **ledger):
             raise ValueError("Not enough stock available.")
+    elif difference < 0:
+        return_stock(instance.product_id, -difference, **ledger)
+
+
+def held_quantities(instance):
+    # Checkout orders hold their lines; their `quantity` is only the total of the lines.
+    lines = list(instance.items.values_list("product_id", "quantity"))
+    if lines:
+        quantities = Counter()
+        for product_id, quantity in lines:
+            if product_id is not None:
+                quantities[product_id] += quantity
+        return quantities
+    if instance.product_id is None:
+        return {}
+    return {instance.product_id: instance.quantity}
+
+
+def replace_holds(instance):
+    # Re-hold the new quantities; if the old holds had been paid for, take the stock again.
+    was_converted = release_reservations(instance)
+    quantities = held_quantities(instance)
+    if quantities:
+        reserve_stock(instance, quantities)
+        if was_converted:
+            confirm_reservations(instance)
+
+
+# Adjust stock when an existing order is changed
+@receiver(pre_save, sender=Order)
+def update_stock_on_order_save(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        # New orders hold their stock when they are placed (see `OrderSerializer.create`).
+        return
+
+    # The values the order was loaded with (see `FieldTrackingMixin`); no query is needed
+    # unless the instance was not loaded from the database.
+    original = instance.get_original_values("product", "quantity", "order_status")
+    if len(original) < 3:
+        return
+    if original["order_status"] != instance.order_status and not can_transition(
+        original["order_status"], instance.order_status
+    ):
+        raise InvalidTransition(original["order_status"], instance.order_status)
+
+    with transaction.atomic():
+        line_changed = (
+            original["product_id"] != instance.product_id
+            or original["quantity"] != instance.quantity
+        )
+        if line_changed:
+            holds = instance.reservations.exclude(status=StockReservation.RELEASED)
+            if holds.exists():
+                replace_holds(instance)
+            elif not instance.reservations.exists():
+                adjust_taken_stock(instance, original)
+
+        if original["order_status"] != instance.order_status:
+            if instance.order_status == CONFIRMED_STATUS:
+                confirm_reservations(instance)
+            elif instance.order_status in RELEASED_STATUSES:
+                release_reservations(instance)
+
+
+@receiver(pre_delete, sender=Order)
+def collect_holds_on_order_delete(sender, instance, **kwargs):
+    instance._has_reservations = instance.reservations.exists()
 
 
 # Adjust stock when an order is deleted
 @receiver(post_delete, sender=Order)
 def update_stock_on_order_delete(sender, instance, **kwargs):
-    product = instance.product
-    product.stock_quantity += instance.quantity
-    product.save()
+    if getattr(instance, "_has_reservations", False):
+        return
+    if instance.product_id is not None:
+        return_stock(
+            instance.product_id,
+            instance.quantity,
+            reason=StockMovement.ORDER_DELETE,
+            reference=order_reference(instance),
+        )
+
+
+# Deleted orders change the sales of the day they were placed
+@receiver(post_delete, sender=Order)
+def mark_sales_day_on_order_delete(sender, instance, **kwargs):
+    mark_sales_day_stale(instance.created_at)
+
+
+# Return the stock of a converted hold (or one that took its stock) when it is deleted
+@receiver(post_delete, sender=StockReservation)
+def update_stock_on_reservation_delete(sender, instance, **kwargs):
+    if instance.stock_taken or instance.status == StockReservation.CONVERTED:
+        return_stock(
+            instance.product_id,
+            instance.quantity,
+            reason=StockMovement.ORDER_DELETE,
+            reference=f"order:{instance.order_id}",
+        )
+
+
+# Take the units of outstanding holds out of a product's stock before it is split into shards
+@receiver(stock_sharding, sender=Product)
+def take_holds_on_sharding(sender, product_id, stock, **kwargs):
+    return take_outstanding_holds(product_id, stock)
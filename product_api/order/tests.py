@@ -1,12 +1,40 @@
 # Create your tests here.
+from datetime import timedelta
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from product.models import Product
+from product.models import Category, Product
+from product.stock import get_sharded_stock, shard_stock
 
-from .models import Order
+from .archive import archive_orders, get_order_history
+from .checkout import checkout
+from .models import (
+    ArchivedOrder,
+    CategorySalesRollup,
+    Order,
+    ProductSalesRollup,
+    StaleSalesDay,
+    StockReservation,
+)
+from .reservations import (
+    InsufficientStock,
+    get_available_quantity,
+    release_expired_reservations,
+    reserve_stock,
+)
+from .rollups import (
+    backfill_sales_rollups,
+    get_revenue_series,
+    get_top_products,
+    recompute_sales_rollups,
+    refresh_sales_rollups,
+)
+from .transitions import InvalidTransition, bulk_transition, can_transition
 
 
 class OrderModelTest(TestCase):
@@ -111,3 +139,586 @@ class OrderModelTest(TestCase):
             shipping_address="123 Test St, Test City, Test Country",
         )
         self.assertIsNone(order.product)
+
+
+class OrderStockSignalTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name="Signal Product", price=Decimal("10.00"), stock_quantity=10
+        )
+        self.other = Product.objects.create(
+            name="Other Product", price=Decimal("5.00"), stock_quantity=10
+        )
+        self.order = Order.objects.create(
+            product=self.product,
+            quantity=2,
+            total_price=Decimal("20.00"),
+            shipping_address="123 Test St",
+        )
+
+    def stock(self, product):
+        product.refresh_from_db()
+        return product.stock_quantity
+
+    def test_create_does_not_deduct(self):
+        """Test that saving a new order leaves stock alone; placing the order deducts it."""
+        self.assertEqual(self.stock(self.product), 10)
+
+    def test_quantity_increase(self):
+        """Test that raising the quantity takes only the difference."""
+        self.order.quantity = 5
+        self.order.save()
+        self.assertEqual(self.stock(self.product), 7)
+
+    def test_update_does_not_reread_order(self):
+        """Test that the stock signal takes the previous values from the loaded order."""
+        order = Order.objects.get(pk=self.order.pk)
+        order.quantity = 3
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+        self.assertFalse(
+            [
+                query
+                for query in queries
+                if query["sql"].startswith("SELECT")
+                and '"order_order"' in query["sql"].split("WHERE")[0]
+            ]
+        )
+        self.assertEqual(self.stock(self.product), 9)
+
+    def test_quantity_decrease(self):
+        """Test that lowering the quantity returns the difference."""
+        self.order.quantity = 1
+        self.order.save()
+        self.assertEqual(self.stock(self.product), 11)
+
+    def test_quantity_increase_insufficient(self):
+        """Test that an update the stock cannot cover is rejected before the order is saved."""
+        self.order.quantity = 20
+        with self.assertRaises(ValueError):
+            self.order.save()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.quantity, 2)
+        self.assertEqual(self.stock(self.product), 10)
+
+    def test_product_change(self):
+        """Test that moving an order to another product moves its stock."""
+        self.order.product = self.other
+        self.order.save()
+        self.assertEqual(self.stock(self.product), 12)
+        self.assertEqual(self.stock(self.other), 8)
+
+    def test_delete_restores_stock(self):
+        """Test that deleting an order returns its stock."""
+        self.order.delete()
+        self.assertEqual(self.stock(self.product), 12)
+
+
+class StockReservationTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name="Held Product", price=Decimal("10.00"), stock_quantity=10
+        )
+        self.order = self.place(4)
+
+    def place(self, quantity):
+        order = Order.objects.create(
+            product=self.product,
+            quantity=quantity,
+            total_price=self.product.price * quantity,
+            shipping_address="123 Test St",
+        )
+        reserve_stock(order, {self.product.pk: quantity})
+        return order
+
+    def set_status(self, order, status):
+        order.order_status = status
+        order.save()
+
+    def stock(self):
+        self.product.refresh_from_db()
+        return self.product.stock_quantity
+
+    def available(self):
+        self.product.refresh_from_db()
+        return get_available_quantity(self.product)
+
+    def test_hold_reduces_available_not_stock(self):
+        """Test that a hold lowers the available-to-promise quantity only."""
+        self.assertEqual(self.stock(), 10)
+        self.assertEqual(self.available(), 6)
+
+    def test_hold_beyond_available(self):
+        """Test that stock held by one order cannot be promised to another."""
+        with self.assertRaises(InsufficientStock) as raised:
+            self.place(7)
+        self.assertEqual(raised.exception.available, {self.product.pk: 6})
+
+    def test_payment_confirmed_converts_hold(self):
+        """Test that confirming the payment turns the hold into a stock decrement."""
+        self.set_status(self.order, "Payment_Confirmed")
+        self.assertEqual(self.stock(), 6)
+        self.assertEqual(self.available(), 6)
+        self.assertEqual(
+            self.order.reservations.get().status, StockReservation.CONVERTED
+        )
+
+    def test_cancel_releases_hold(self):
+        """Test that canceling an unpaid order releases its hold."""
+        self.set_status(self.order, "Canceled")
+        self.assertEqual(self.stock(), 10)
+        self.assertEqual(self.available(), 10)
+
+    def test_refund_returns_converted_stock(self):
+        """Test that refunding a paid order returns its stock."""
+        self.set_status(self.order, "Payment_Confirmed")
+        self.set_status(self.order, "Refunded")
+        self.assertEqual(self.stock(), 10)
+        self.assertEqual(
+            self.order.reservations.get().status, StockReservation.RELEASED
+        )
+
+    def test_expired_hold_stops_counting(self):
+        """Test that an expired hold no longer reduces availability, even before a sweep."""
+        self.order.reservations.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.available(), 10)
+
+    def test_sweeper_expires_holds_in_batches(self):
+        """Test that the sweeper marks only expired active holds as expired."""
+        for _ in range(3):
+            self.place(1)
+        past = timezone.now() - timedelta(seconds=1)
+        StockReservation.objects.exclude(order=self.order).update(expires_at=past)
+
+        self.assertEqual(release_expired_reservations(batch_size=2), 3)
+        self.assertEqual(
+            StockReservation.objects.filter(status=StockReservation.EXPIRED).count(), 3
+        )
+        self.assertEqual(self.order.reservations.get().status, StockReservation.ACTIVE)
+
+    def test_confirm_after_expiry_rechecks_stock(self):
+        """Test that a lapsed hold is only converted if the stock is still available."""
+        self.order.reservations.update(expires_at=timezone.now() - timedelta(seconds=1))
+        release_expired_reservations()
+        self.place(8)  # Takes the stock the lapsed hold no longer protects.
+
+        self.order.order_status = "Payment_Confirmed"
+        with self.assertRaises(InsufficientStock):
+            self.order.save()
+        self.assertEqual(self.stock(), 10)
+
+    def test_quantity_change_replaces_hold(self):
+        """Test that changing the quantity of an unpaid order replaces its hold."""
+        self.order.quantity = 6
+        self.order.save()
+        self.assertEqual(self.available(), 4)
+        self.assertEqual(self.stock(), 10)
+
+    def test_quantity_change_reholds_checkout_lines(self):
+        """Test that changing a checkout order re-holds its lines, which are taken when paid."""
+        other = Product.objects.create(
+            name="Other Product", price=Decimal("5.00"), stock_quantity=5
+        )
+        order = checkout(
+            None,
+            [
+                {"product": self.product, "quantity": 2},
+                {"product": other, "quantity": 3},
+            ],
+            "123 Test St",
+        )
+        order.quantity = 1
+        order.save()
+        self.assertEqual(
+            sorted(
+                order.reservations.filter(status=StockReservation.ACTIVE).values_list(
+                    "product_id", "quantity"
+                )
+            ),
+            [(self.product.pk, 2), (other.pk, 3)],
+        )
+
+        self.set_status(order, "Payment_Confirmed")
+        self.assertEqual(self.stock(), 8)
+        other.refresh_from_db()
+        self.assertEqual(other.stock_quantity, 2)
+
+    def test_delete_paid_order_returns_stock(self):
+        """Test that deleting a paid order returns its stock through its holds."""
+        self.set_status(self.order, "Payment_Confirmed")
+        self.order.delete()
+        self.assertEqual(self.stock(), 10)
+
+    def test_delete_unpaid_order_keeps_stock(self):
+        """Test that deleting an unpaid order only drops its hold."""
+        self.order.delete()
+        self.assertEqual(self.stock(), 10)
+        self.assertEqual(self.available(), 10)
+
+
+class ShardedStockReservationTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name="Flash Sale Product", price=Decimal("10.00"), stock_quantity=10
+        )
+        shard_stock(self.product.pk, 4)
+        self.order = Order.objects.create(
+            product=self.product,
+            quantity=4,
+            total_price=Decimal("40.00"),
+            shipping_address="123 Test St",
+        )
+        reserve_stock(self.order, {self.product.pk: 4})
+
+    def stock(self):
+        return get_sharded_stock([self.product.pk])[self.product.pk]
+
+    def set_status(self, status):
+        self.order.order_status = status
+        self.order.save()
+
+    def test_hold_takes_from_shards(self):
+        """Test that a hold on a sharded product takes its units from the shards."""
+        self.assertEqual(self.stock(), 6)
+        self.assertEqual(get_available_quantity(self.product), 6)
+        self.assertTrue(self.order.reservations.get().stock_taken)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 10)  # Cached total, not touched.
+
+    def test_hold_beyond_shard_stock(self):
+        """Test that a sharded hold fails when the shards hold too little in total."""
+        order = Order.objects.create(
+            product=self.product,
+            quantity=7,
+            total_price=Decimal("70.00"),
+            shipping_address="123 Test St",
+        )
+        with self.assertRaises(InsufficientStock) as raised:
+            reserve_stock(order, {self.product.pk: 7})
+        self.assertEqual(raised.exception.available, {self.product.pk: 6})
+        self.assertEqual(self.stock(), 6)
+
+    def test_payment_confirmed_keeps_taken_stock(self):
+        """Test that confirming a sharded hold converts it without taking stock again."""
+        self.set_status("Payment_Confirmed")
+        self.assertEqual(self.stock(), 6)
+        self.assertEqual(
+            self.order.reservations.get().status, StockReservation.CONVERTED
+        )
+
+    def test_cancel_returns_stock_to_shards(self):
+        """Test that canceling an unpaid order puts the units back into the shards."""
+        self.set_status("Canceled")
+        self.assertEqual(self.stock(), 10)
+
+    def test_sweeper_returns_expired_stock(self):
+        """Test that the sweeper returns the units of expired sharded holds."""
+        self.order.reservations.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(release_expired_reservations(), 1)
+        self.assertEqual(self.stock(), 10)
+        reservation = self.order.reservations.get()
+        self.assertEqual(reservation.status, StockReservation.EXPIRED)
+        self.assertFalse(reservation.stock_taken)
+
+    def test_delete_order_returns_stock(self):
+        """Test that deleting an order with a sharded hold returns its units."""
+        self.order.delete()
+        self.assertEqual(self.stock(), 10)
+
+    def test_sharding_takes_outstanding_holds(self):
+        """Test that holds placed before sharding are taken out of the sharded stock."""
+        product = Product.objects.create(
+            name="Later Flash Sale", price=Decimal("10.00"), stock_quantity=10
+        )
+        order = Order.objects.create(
+            product=product,
+            quantity=3,
+            total_price=Decimal("30.00"),
+            shipping_address="123 Test St",
+        )
+        reserve_stock(order, {product.pk: 3})
+
+        self.assertEqual(shard_stock(product.pk, 4), 7)
+        self.assertEqual(get_sharded_stock([product.pk]), {product.pk: 7})
+        self.assertEqual(get_available_quantity(product), 7)
+        self.assertTrue(order.reservations.get().stock_taken)
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 7)
+
+        order.order_status = "Canceled"
+        order.save()
+        self.assertEqual(get_sharded_stock([product.pk]), {product.pk: 10})
+
+
+class OrderTransitionTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name="Bulk Product", price=Decimal("10.00"), stock_quantity=20
+        )
+        self.orders = [self.place(2) for _ in range(4)]
+
+    def place(self, quantity):
+        order = Order.objects.create(
+            product=self.product,
+            quantity=quantity,
+            total_price=self.product.price * quantity,
+            shipping_address="123 Test St",
+        )
+        reserve_stock(order, {self.product.pk: quantity})
+        return order
+
+    def ids(self, orders):
+        return [order.pk for order in orders]
+
+    def stock(self):
+        self.product.refresh_from_db()
+        return self.product.stock_quantity
+
+    def test_state_machine(self):
+        """Test the allowed moves of the order state machine."""
+        self.assertTrue(can_transition("Pending", "Payment_Confirmed"))
+        self.assertTrue(can_transition("Shipped", "Refunded"))
+        self.assertFalse(can_transition("Pending", "Shipped"))
+        self.assertFalse(can_transition("Canceled", "Pending"))
+
+    def test_invalid_moves_are_rejected(self):
+        """Test that only orders whose status allows the move are updated."""
+        updated, rejected = bulk_transition(self.ids(self.orders) + [0], "Shipped")
+        self.assertEqual(updated, [])
+        self.assertEqual(
+            rejected[self.orders[0].pk], "Cannot move from Pending to Shipped."
+        )
+        self.assertEqual(rejected[0], "Order does not exist.")
+
+    def test_invalid_save_is_rejected(self):
+        """Test that saving a single order with a disallowed status changes nothing."""
+        order = self.orders[0]
+        order.order_status = "Canceled"
+        order.save()
+        self.assertEqual(self.stock(), 20)
+
+        order.order_status = "Payment_Confirmed"
+        with self.assertRaises(InvalidTransition):
+            order.save()
+        order.refresh_from_db()
+        self.assertEqual(order.order_status, "Canceled")
+        self.assertEqual(self.stock(), 20)
+
+    def test_shipping_is_one_update_per_batch(self):
+        """Test that a move without stock effects locks and updates each batch once."""
+        bulk_transition(self.ids(self.orders), "Payment_Confirmed")
+        self.assertEqual(self.stock(), 12)
+
+        # 2 batches of (savepoint, select, update, release savepoint)
+        with self.assertNumQueries(8):
+            updated, rejected = bulk_transition(
+                self.ids(self.orders), "Shipped", batch_size=3
+            )
+        self.assertEqual(updated, self.ids(self.orders))
+        self.assertEqual(rejected, {})
+        self.assertEqual(Order.objects.filter(order_status="Shipped").count(), 4)
+        self.assertEqual(self.stock(), 12)
+
+    def test_cancel_releases_stock(self):
+        """Test that bulk cancellations and refunds return converted stock."""
+        bulk_transition(self.ids(self.orders[:2]), "Payment_Confirmed")
+        self.assertEqual(self.stock(), 16)
+
+        updated, _ = bulk_transition(self.ids(self.orders), "Canceled")
+        self.assertEqual(len(updated), 4)
+        self.assertEqual(self.stock(), 20)
+        self.assertFalse(
+            StockReservation.objects.exclude(status=StockReservation.RELEASED).exists()
+        )
+
+    def test_confirm_without_stock_is_rejected(self):
+        """Test that an order whose lapsed hold can no longer be covered stays unchanged."""
+        self.orders[0].reservations.update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=7)
+
+        updated, rejected = bulk_transition(self.ids(self.orders), "Payment_Confirmed")
+        self.assertEqual(updated, self.ids(self.orders[1:]))
+        self.assertEqual(rejected, {self.orders[0].pk: "Not enough stock available."})
+        self.orders[0].refresh_from_db()
+        self.assertEqual(self.orders[0].order_status, "Pending")
+        self.assertEqual(self.stock(), 1)
+
+
+class OrderArchiveTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="archive@example.com", password="password123", username="archive"
+        )
+        self.product = Product.objects.create(
+            name="Archived Product", price=Decimal("10.00"), stock_quantity=10
+        )
+        self.old = timezone.now() - timedelta(days=365)
+
+    def order(self, status, quantity=1, updated_at=None):
+        order = Order.objects.create(
+            user=self.user,
+            product=self.product,
+            quantity=quantity,
+            total_price=self.product.price * quantity,
+            shipping_address="123 Test St",
+        )
+        reserve_stock(order, {self.product.pk: quantity})
+        for step in {"Delivered": ["Payment_Confirmed", "Shipped", "Delivered"]}.get(
+            status, [status]
+        ):
+            bulk_transition([order.pk], step)
+        Order.objects.filter(pk=order.pk).update(updated_at=updated_at or self.old)
+        return order
+
+    def test_closed_old_orders_are_moved(self):
+        """Test that only closed orders older than the cutoff leave the hot table."""
+        delivered = self.order("Delivered", quantity=2)
+        canceled = self.order("Canceled")
+        pending = self.order("Pending")
+        recent = self.order("Canceled", updated_at=timezone.now())
+
+        self.assertEqual(archive_orders(batch_size=1), 2)
+        self.assertEqual(
+            set(Order.objects.values_list("pk", flat=True)), {pending.pk, recent.pk}
+        )
+        archived = ArchivedOrder.objects.get(pk=delivered.pk)
+        self.assertEqual(archived.order_status, "Delivered")
+        self.assertEqual(archived.quantity, 2)
+        self.assertTrue(ArchivedOrder.objects.filter(pk=canceled.pk).exists())
+        self.assertFalse(
+            StockReservation.objects.filter(order_id=delivered.pk).exists()
+        )
+
+    def test_archiving_keeps_stock(self):
+        """Test that archiving a delivered order does not return its stock."""
+        self.order("Delivered", quantity=3)
+        archive_orders()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 7)
+
+    def test_history_covers_both_tables(self):
+        """Test that a user's history lists hot and archived orders, newest first."""
+        archived = self.order("Canceled")
+        pending = self.order("Pending")
+        archive_orders()
+
+        history = list(get_order_history(self.user))
+        self.assertEqual([row["id"] for row in history], [pending.pk, archived.pk])
+        self.assertEqual([row["archived"] for row in history], [False, True])
+        self.assertEqual(
+            [row["id"] for row in get_order_history(self.user, "Canceled")],
+            [archived.pk],
+        )
+
+
+class SalesRollupTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="sales@example.com", password="password123", username="sales"
+        )
+        self.toys = Category.objects.create(name="Toys")
+        self.games = Category.objects.create(name="Games")
+        self.ball = Product.objects.create(
+            name="Ball", price=Decimal("10.00"), stock_quantity=100
+        )
+        self.ball.categories.add(self.toys)
+        self.chess = Product.objects.create(
+            name="Chess", price=Decimal("5.00"), stock_quantity=100
+        )
+        self.chess.categories.add(self.toys, self.games)
+        self.today = timezone.localdate()
+
+        self.single = Order.objects.create(
+            user=self.user,
+            product=self.ball,
+            quantity=2,
+            total_price=Decimal("20.00"),
+            shipping_address="123 Test St",
+        )
+        reserve_stock(self.single, {self.ball.pk: 2})
+        self.cart = checkout(
+            self.user,
+            [
+                {"product": self.ball.pk, "quantity": 1},
+                {"product": self.chess.pk, "quantity": 3},
+            ],
+            "123 Test St",
+        )
+        bulk_transition([self.single.pk, self.cart.pk], "Payment_Confirmed")
+
+    def rollup(self, model, **filters):
+        return model.objects.values_list("revenue", "units", "order_count").get(
+            day=self.today, **filters
+        )
+
+    def test_backfill_aggregates_products_and_categories(self):
+        """Test that single-product orders and checkout lines are rolled up per day."""
+        self.assertEqual(backfill_sales_rollups(), 1)
+        paid = {"order_status": "Payment_Confirmed"}
+        self.assertEqual(
+            self.rollup(ProductSalesRollup, product=self.ball, **paid),
+            (Decimal("30.00"), 3, 2),
+        )
+        self.assertEqual(
+            self.rollup(ProductSalesRollup, product=self.chess, **paid),
+            (Decimal("15.00"), 3, 1),
+        )
+        # The checkout order holds both toys but is counted once for the category.
+        self.assertEqual(
+            self.rollup(CategorySalesRollup, category=self.toys, **paid),
+            (Decimal("45.00"), 6, 2),
+        )
+        self.assertEqual(
+            self.rollup(CategorySalesRollup, category=self.games, **paid),
+            (Decimal("15.00"), 3, 1),
+        )
+
+    def test_refresh_follows_status_changes_and_deletes(self):
+        """Test that the incremental refresh recomputes the days of changed orders."""
+        backfill_sales_rollups()
+        bulk_transition([self.single.pk], "Shipped")
+        self.assertEqual(refresh_sales_rollups(), 1)
+        self.assertEqual(
+            self.rollup(ProductSalesRollup, product=self.ball, order_status="Shipped"),
+            (Decimal("20.00"), 2, 1),
+        )
+
+        self.cart.delete()
+        self.assertTrue(StaleSalesDay.objects.filter(day=self.today).exists())
+        refresh_sales_rollups()
+        self.assertFalse(StaleSalesDay.objects.exists())
+        self.assertFalse(
+            ProductSalesRollup.objects.filter(order_status="Payment_Confirmed").exists()
+        )
+
+    def test_archived_orders_are_counted(self):
+        """Test that moving orders to the archive leaves the rollups unchanged."""
+        bulk_transition([self.cart.pk], "Canceled")
+        Order.objects.filter(pk=self.cart.pk).update(
+            updated_at=timezone.now() - timedelta(days=365)
+        )
+        recompute_sales_rollups(self.today, self.today)
+        before = set(ProductSalesRollup.objects.values_list("product", "units"))
+        archive_orders()
+        recompute_sales_rollups(self.today, self.today)
+        self.assertEqual(
+            set(ProductSalesRollup.objects.values_list("product", "units")), before
+        )
+
+    def test_reports(self):
+        """Test the revenue series and the top products read from the rollups."""
+        backfill_sales_rollups()
+        series = list(get_revenue_series(self.today, self.today, interval="month"))
+        self.assertEqual(len(series), 1)
+        self.assertEqual(series[0]["period"], self.today.replace(day=1))
+        self.assertEqual(series[0]["revenue"], Decimal("45.00"))
+        self.assertFalse(
+            get_revenue_series(self.today, self.today, statuses=["Shipped"])
+        )
+
+        top = list(get_top_products(self.today, self.today, order_by="units"))
+        self.assertEqual([row["name"] for row in top], ["Ball", "Chess"])
+        top = get_top_products(self.today, self.today, category=self.games)
+        self.assertEqual([row["product"] for row in top], [self.chess.pk])
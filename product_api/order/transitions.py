@@ -0,0 +1,143 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order
+from .reservations import InsufficientStock, confirm_reservations, release_reservations
+
+"""
+Order status state machine and bulk status transitions.
+
+`TRANSITIONS` lists, for every status of `Order.ORDER_STATUS_CHOICES`, the statuses an order can
+move to next. `bulk_transition` moves many orders to one status at a time, for operations staff
+shipping or cancelling orders in bulk (`POST /api/orders/transition/` and the order admin
+actions):
+
+    - Orders are processed in batches of primary keys. Each batch selects (and locks) the orders
+      whose current status may move to the target status: the transition rules are a
+      `order_status IN (...)` condition of that query, so invalid transitions are never loaded.
+    - The eligible orders of the batch are then moved with a single `UPDATE`. `QuerySet.update()`
+      sends no signals, so `update_stock_on_order_save` does not re-query every order.
+    - Only transitions that affect stock run per-order work first, inside the batch transaction:
+      `Payment_Confirmed` converts the order's holds into a stock decrement and `Canceled` /
+      `Refunded` release them (see `order.reservations`). An order whose holds can no longer be
+      covered is rejected and left unchanged; the rest of the batch still moves.
+
+Saving a single order goes through the same rules: `update_stock_on_order_save` raises
+`InvalidTransition` for a status change `TRANSITIONS` does not allow, and `OrderSerializer` and
+the order admin form reject it as a validation error first.
+
+Classes:
+    - InvalidTransition: Raised when an order is saved with a status it may not move to.
+
+Constants:
+    - TRANSITIONS (dict): Maps each status to the set of statuses it may move to.
+    - CONFIRMED_STATUS (str): The status that converts holds into a stock decrement.
+    - RELEASED_STATUSES (tuple): The statuses that release holds and return converted stock.
+
+Functions:
+    - can_transition(from_status, to_status): Whether the state machine allows the move.
+    - bulk_transition(order_ids, to_status, batch_size): Move orders to `to_status` in batches.
+"""
+
+CONFIRMED_STATUS = "Payment_Confirmed"
+RELEASED_STATUSES = ("Canceled", "Refunded")
+
+TRANSITIONS = {
+    "Pending": {"Payment_Confirmed", "Canceled"},
+    "Payment_Confirmed": {"Shipped", "Canceled", "Refunded"},
+    "Shipped": {"Delivered", "Refunded"},
+    "Delivered": {"Refunded"},
+    "Canceled": set(),
+    "Refunded": set(),
+}
+
+
+class InvalidTransition(ValueError):
+    """
+    Raised when an order is saved with a status its current status may not move to.
+    """
+
+    def __init__(self, from_status, to_status):
+        super().__init__(f"Cannot move from {from_status} to {to_status}.")
+
+
+def can_transition(from_status, to_status):
+    return to_status in TRANSITIONS.get(from_status, ())
+
+
+def get_source_statuses(to_status):
+    """
+    Return the statuses that may move to `to_status`, sorted.
+    """
+    return sorted(
+        status for status, targets in TRANSITIONS.items() if to_status in targets
+    )
+
+
+def _apply_stock_effects(orders, to_status, rejected):
+    # Run the stock work of each order in its own savepoint; orders that fail are rejected.
+    applied = []
+    for order in orders:
+        try:
+            with transaction.atomic():
+                if to_status == CONFIRMED_STATUS:
+                    confirm_reservations(order)
+                else:
+                    release_reservations(order)
+        except InsufficientStock:
+            rejected[order.pk] = "Not enough stock available."
+            continue
+        applied.append(order.pk)
+    return applied
+
+
+def bulk_transition(order_ids, to_status, batch_size=500):
+    """
+    Move the given orders to `to_status`, validating every move against `TRANSITIONS`.
+
+    Args:
+        order_ids (iterable): Primary keys of the orders to move.
+        to_status (str): The target status, one of `Order.ORDER_STATUS_CHOICES`.
+        batch_size (int): Orders locked and updated per transaction.
+
+    Returns:
+        tuple: The sorted primary keys of the orders that were moved, and a dict mapping the
+               primary key of every other order to the reason it was not.
+    """
+    sources = get_source_statuses(to_status)
+    affects_stock = to_status == CONFIRMED_STATUS or to_status in RELEASED_STATUSES
+    order_ids = sorted(set(order_ids))
+    updated = []
+    rejected = {}
+
+    for start in range(0, len(order_ids), batch_size):
+        batch = order_ids[start : start + batch_size]
+        with transaction.atomic():
+            eligible = (
+                Order.objects.select_for_update()
+                .filter(pk__in=batch, order_status__in=sources)
+                .order_by("pk")
+            )
+            if affects_stock:
+                moved = _apply_stock_effects(
+                    list(eligible.only("pk")), to_status, rejected
+                )
+            else:
+                moved = list(eligible.values_list("pk", flat=True))
+            Order.objects.filter(pk__in=moved).update(
+                order_status=to_status, updated_at=timezone.now()
+            )
+        updated.extend(moved)
+
+        remaining = set(batch) - set(moved) - set(rejected)
+        if remaining:
+            current = dict(
+                Order.objects.filter(pk__in=remaining).values_list("pk", "order_status")
+            )
+            for pk in sorted(remaining):
+                if pk not in current:
+                    rejected[pk] = "Order does not exist."
+                else:
+                    rejected[pk] = f"Cannot move from {current[pk]} to {to_status}."
+
+    return updated, rejected
@@ -4,6 +4,7 @@ from .models.category import Category
 from .models.product import Product
 from .models.product_wishlist import Wishlist
 from .models.review import Review
+from .models.stock_shard import StockShard
 
 """
 Django Admin configuration for the Product, Category, Review, and Wishlist models.
@@ -22,6 +23,7 @@ Admin Configurations:
         - Displays the product name, stock quantity, price, and associated categories in the list view.
         - Allows search and filtering by product attributes and categories.
         - Prevents editing of created and updated dates.
+        - Shows the stock shards of products with sharded inventory, read-only.
 
     - CategoryAdmin: Customizes the admin interface for the Category model.
         - Displays the category name and its parent category in the list view.
@@ -42,6 +44,14 @@ Each model has specific customizations for how it appears and behaves in the Dja
 """
 
 
+class StockShardInline(admin.TabularInline):
+    model = StockShard
+    fields = ["index", "quantity"]
+    readonly_fields = ["index", "quantity"]
+    extra = 0
+    can_delete = False
+
+
 class ProductAdmin(admin.ModelAdmin):
     list_display = [
         "name",
@@ -52,6 +62,7 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ["name", "stock_quantity", "price", "stock_quantity"]
     list_filter = ["categories"]  # Allow filtering by categories in the sidebar
     readonly_fields = ["updated_date", "created_date"]  # Prevent manual editing
+    inlines = [StockShardInline]
 
     def display_categories(self, obj):
         return ", ".join([category.name for category in obj.categories.all()])
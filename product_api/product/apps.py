@@ -12,6 +12,9 @@ Attributes:
     - name: Specifies the name of the app, which is 'product'. This is the app that contains the models,
       views, and other related components for handling products.
 
+Methods:
+    - ready: Connects the signal receivers in `product.signals` that invalidate cached catalog data.
+
 This configuration class is automatically used by Django when the application is started to set up
 the necessary app configurations and model behaviors.
 """
@@ -20,3 +23,6 @@ the necessary app configurations and model behaviors.
 class ProductConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "product"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,68 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+"""
+Versioned cache namespaces for catalog data.
+
+Cached catalog responses are stored with Django's cache `version` argument set to the current
+version of their namespace. Invalidating a namespace only bumps that version number, so every
+entry written under the old version becomes unreachable at once (and later expires on its own)
+without having to know or delete individual keys. This works with any Django cache backend, but a
+bump only reaches the processes that share the cache: with the local-memory cache (used when
+`REDIS_URL` is not set) the other workers keep serving their entries until
+`API_RESPONSE_CACHE_TIMEOUT` expires them.
+
+Namespaces:
+    - CATALOG_NAMESPACE: Product list/detail responses. Bumped whenever a product, product image,
+      product category assignment, category or stock level changes.
+    - CATEGORY_TREE_NAMESPACE: The nested category tree. Bumped whenever a category or a product
+      category assignment changes, or a product is deleted.
+
+Functions:
+    - get_cache_version(namespace): Return the current version of a namespace.
+    - invalidate_cache(namespace): Bump the version of a namespace, now and again on commit.
+"""
+
+CATALOG_NAMESPACE = "catalog"
+CATEGORY_TREE_NAMESPACE = "category-tree"
+
+
+def _version_key(namespace):
+    return f"cache-version:{namespace}"
+
+
+def get_cache_version(namespace):
+    """
+    Return the current version number of `namespace`, initialising it if needed.
+
+    A missing version (first use, or evicted from the cache) is initialised from the clock rather
+    than from 1, so entries written under an older, evicted version can never be served again.
+    """
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(namespace):
+    key = _version_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def invalidate_cache(namespace):
+    """
+    Invalidate every entry of `namespace`.
+
+    The version is bumped immediately and once more after the surrounding transaction commits,
+    so a concurrent reader that repopulated the cache from pre-commit data cannot leave a stale
+    entry behind.
+    """
+    _bump(namespace)
+    transaction.on_commit(lambda: _bump(namespace))
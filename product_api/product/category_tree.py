@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .cache import CATEGORY_TREE_NAMESPACE, get_cache_version
+from .models.category import Category
+
+"""
+Nested category hierarchy for navigation menus.
+
+The whole tree is read with one flat query (every category with its direct product count) and
+assembled in memory by `parent_category_id`, then cached under the category-tree namespace, which
+`product.signals` invalidates on any category change, category assignment change or product
+deletion.
+
+Functions:
+    - build_category_tree(): Build the nested tree from the database.
+    - get_category_tree(): Return the cached tree, building it on a miss.
+"""
+
+CATEGORY_TREE_CACHE_KEY = "category-tree"
+
+
+def build_category_tree():
+    """
+    Build the nested category hierarchy from a single query.
+
+    Each node holds `product_count` (products assigned directly to the category) and
+    `total_product_count` (the sum of `product_count` over the node's subtree, so a product
+    assigned to several categories of the subtree is counted once per category).
+
+    Returns:
+        list: The root nodes, each with its `subcategories` nested recursively, ordered by name.
+    """
+    rows = (
+        Category.objects.annotate(product_count=Count("product"))
+        .values("id", "name", "parent_category_id", "product_count")
+        .order_by("name")
+    )
+
+    nodes = {}
+    for row in rows:
+        nodes[row["id"]] = {
+            "id": row["id"],
+            "name": row["name"],
+            "parent_category": row["parent_category_id"],
+            "product_count": row["product_count"],
+            "total_product_count": row["product_count"],
+            "subcategories": [],
+        }
+
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node["parent_category"])
+        if parent is None:
+            roots.append(node)
+        else:
+            parent["subcategories"].append(node)
+
+    def add_totals(node):
+        node["total_product_count"] += sum(
+            add_totals(child) for child in node["subcategories"]
+        )
+        return node["total_product_count"]
+
+    for root in roots:
+        add_totals(root)
+    return roots
+
+
+def get_category_tree():
+    """
+    Return the nested category hierarchy from the cache, rebuilding it when it was invalidated.
+    """
+    version = get_cache_version(CATEGORY_TREE_NAMESPACE)
+    tree = cache.get(CATEGORY_TREE_CACHE_KEY, version=version)
+    if tree is None:
+        tree = build_category_tree()
+        cache.set(
+            CATEGORY_TREE_CACHE_KEY,
+            tree,
+            getattr(settings, "API_RESPONSE_CACHE_TIMEOUT", 300),
+            version=version,
+        )
+    return tree
@@ -0,0 +1,96 @@
+from django.db.models import Count, F, Q
+from django.db.models.functions import Coalesce
+
+from .models.product import Product
+from .stock import annotate_sharded_stock
+
+"""
+Facet counts for product listings.
+
+Given an already filtered product queryset, compute the aggregates a storefront shows next to a
+listing: how many products fall in each category, in each price range and in/out of stock.
+
+Queries:
+    - One aggregate query over the matching products computes every price-range bucket and the
+      in-stock/out-of-stock split together, using conditional `COUNT(...) FILTER (WHERE ...)`.
+      The stock of a sharded product is the sum of its shards (see `product.stock`), read with a
+      correlated subquery of the same query, since its `stock_quantity` is only refreshed when
+      the shards are rebalanced.
+    - One grouped query over the product/category link table computes the per-category counts.
+      It stays separate: a product in several categories is one row per category there, which
+      would count it several times in the other facets.
+
+Both queries take the filtered queryset as a `pk IN (subquery)` condition, so joins added by the
+filters (e.g. `categories__name`) can never count a product twice.
+
+Functions:
+    - get_product_facets(queryset, price_ranges): Return the facet counts for `queryset`.
+"""
+
+DEFAULT_PRICE_RANGES = [(0, 50), (50, 100), (100, 500), (500, None)]
+
+
+def price_range_label(low, high):
+    return f"{low}-{high}" if high is not None else f"{low}+"
+
+
+def get_product_facets(queryset, price_ranges=DEFAULT_PRICE_RANGES):
+    """
+    Compute category, price-range and availability counts for the products in `queryset`.
+
+    Args:
+        queryset (QuerySet): The filtered product queryset the listing is built from.
+        price_ranges (list): `(low, high)` tuples; `low` is inclusive, `high` exclusive and `None`
+                             means unbounded.
+
+    Returns:
+        dict: `categories` (list of id/name/count), `price_ranges` (list of label/min/max/count)
+              and `availability` (in_stock/out_of_stock counts).
+    """
+    product_ids = queryset.order_by().values("pk")
+
+    aggregates = {
+        "in_stock": Count("pk", filter=Q(available_stock__gt=0)),
+        "out_of_stock": Count("pk", filter=Q(available_stock__lte=0)),
+    }
+    for index, (low, high) in enumerate(price_ranges):
+        condition = Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        aggregates[f"price_{index}"] = Count("pk", filter=condition)
+
+    products = annotate_sharded_stock(Product.objects.filter(pk__in=product_ids))
+    counts = products.annotate(
+        available_stock=Coalesce("sharded_stock", F("stock_quantity"))
+    ).aggregate(**aggregates)
+
+    categories = (
+        Product.categories.through.objects.filter(product_id__in=product_ids)
+        .values("category_id", "category__name")
+        .annotate(count=Count("product_id"))
+        .order_by("category__name")
+    )
+
+    return {
+        "categories": [
+            {
+                "id": row["category_id"],
+                "name": row["category__name"],
+                "count": row["count"],
+            }
+            for row in categories
+        ],
+        "price_ranges": [
+            {
+                "label": price_range_label(low, high),
+                "min": low,
+                "max": high,
+                "count": counts[f"price_{index}"],
+            }
+            for index, (low, high) in enumerate(price_ranges)
+        ],
+        "availability": {
+            "in_stock": counts["in_stock"],
+            "out_of_stock": counts["out_of_stock"],
+        },
+    }
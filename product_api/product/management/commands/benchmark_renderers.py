@@ -0,0 +1,151 @@
+import timeit
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from apis.renderers import MessagePackRenderer, ORJSONRenderer, msgpack
+from apis.serializers.order_serializer import OrderSerializer
+from apis.serializers.product_serializers import ProductSerializer
+from order.models import Order
+from product.models.category import Category
+from product.models.product import Product
+from product.models.product_image import ProductImage
+
+"""
+Management command comparing response renderers on realistic payloads.
+
+The payloads are pages of real `ProductSerializer` and `OrderSerializer` output: fixture products
+(with images and categories) and orders are inserted in a transaction, serialized like the list
+endpoints serialize them and rolled back, so the numbers reflect what the API actually spends in
+rendering. Only the rendering is timed.
+
+Usage:
+    python manage.py benchmark_renderers [--rows 100] [--repeat 200]
+"""
+
+
+def paginate(request, rows, results):
+    return {
+        "count": rows * 10,
+        "next": request.build_absolute_uri(f"?limit={rows}&offset={rows}"),
+        "previous": None,
+        "results": results,
+    }
+
+
+def build_payloads(rows):
+    """
+    Return paginated product and order payloads serialized from `rows` fixture rows each.
+
+    The fixture rows are bulk-inserted, so no signal (search indexing, stock ledger) runs, and
+    rolled back once serialized.
+    """
+    prefix = f"bench-{uuid.uuid4().hex[:8]}"
+    statuses = [status for status, _ in Order.ORDER_STATUS_CHOICES]
+    factory = APIRequestFactory()
+    # Absolute image URLs are built from the request host, which must be an allowed one.
+    host = next((h for h in settings.ALLOWED_HOSTS if "*" not in h), "localhost")
+    with transaction.atomic():
+        categories = Category.objects.bulk_create(
+            Category(name=f"{prefix} category {i}") for i in range(5)
+        )
+        products = Product.objects.bulk_create(
+            Product(
+                name=f"{prefix} product {i}",
+                description="A fairly long product description. " * 10,
+                price=Decimal(f"{i % 500}.99"),
+                stock_quantity=i % 40,
+            )
+            for i in range(rows)
+        )
+        ProductImage.objects.bulk_create(
+            ProductImage(
+                product=product,
+                image=f"product_images/{prefix}-{product.pk}-{j}.jpg",
+                caption=f"View {j}" if j else None,
+            )
+            for product in products
+            for j in range(3)
+        )
+        Product.categories.through.objects.bulk_create(
+            Product.categories.through(product=product, category=category)
+            for i, product in enumerate(products)
+            for category in (categories[0], categories[1 + i % 4])
+        )
+        user = get_user_model().objects.create(
+            email=f"{prefix}@example.com", username=prefix
+        )
+        Order.objects.bulk_create(
+            Order(
+                user=user,
+                product=products[i % len(products)],
+                quantity=1 + i % 4,
+                total_price=Decimal(f"{(1 + i % 4) * 19}.99"),
+                shipping_address=f"{i} Main Street, Springfield",
+                order_status=statuses[i % len(statuses)],
+            )
+            for i in range(rows)
+        )
+
+        product_request = Request(factory.get("/api/products/", HTTP_HOST=host))
+        product_data = ProductSerializer(
+            Product.objects.filter(name__startswith=prefix)
+            .prefetch_related("images", "categories")
+            .order_by("pk"),
+            many=True,
+            context={"request": product_request},
+        ).data
+        order_request = Request(factory.get("/api/orders/", HTTP_HOST=host))
+        order_data = OrderSerializer(
+            Order.objects.filter(user=user).prefetch_related("items").order_by("pk"),
+            many=True,
+            context={"request": order_request},
+        ).data
+        transaction.set_rollback(True)
+
+    return [
+        ("products", paginate(product_request, rows, product_data)),
+        ("orders", paginate(order_request, rows, order_data)),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Benchmark the JSON and MessagePack response renderers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=100, help="Rows per rendered page."
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=200, help="Renders timed per renderer."
+        )
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        repeat = options["repeat"]
+        renderers = [("json (stdlib)", JSONRenderer()), ("orjson", ORJSONRenderer())]
+        if msgpack is not None:
+            renderers.append(("msgpack", MessagePackRenderer()))
+
+        for payload_name, payload in build_payloads(rows):
+            self.stdout.write(f"{payload_name} page, {rows} rows:")
+            baseline = None
+            for name, renderer in renderers:
+                size = len(renderer.render(payload, renderer.media_type))
+                seconds = timeit.timeit(
+                    lambda: renderer.render(payload, renderer.media_type),
+                    number=repeat,
+                )
+                per_render = seconds / repeat * 1000
+                baseline = baseline or per_render
+                self.stdout.write(
+                    f"  {name:<14} {per_render:8.3f} ms/render  "
+                    f"{baseline / per_render:5.1f}x  {size:>8} bytes"
+                )
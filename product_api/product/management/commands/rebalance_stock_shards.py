@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from product.stock import rebalance_shards
+
+"""
+Management command that rebalances the stock shards of sharded products.
+
+Random takes drain some shards faster than others; once most shards of a product run dry,
+orders fall back to locking all of them. Rebalancing spreads each product's stock evenly across
+its shards again and refreshes the cached total in `Product.stock_quantity` (used by filters and
+facets). Run it once from cron, or as a long-running worker process with `--interval`.
+
+Usage:
+    python manage.py rebalance_stock_shards [--interval 5]
+"""
+
+
+class Command(BaseCommand):
+    help = "Spread the stock of sharded products evenly across their shards."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="Keep running, rebalancing every INTERVAL seconds.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            rebalanced = rebalance_shards()
+            self.stdout.write(f"Rebalanced the stock shards of {rebalanced} products.")
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from product.models.product import Product
+from product.search import index_products
+
+"""
+Management command to rebuild the product search index from scratch.
+
+The index is kept up to date incrementally by signals; this command is for the initial backfill
+and for recovering after bulk changes that bypass signals (e.g. `QuerySet.update()`).
+
+Usage:
+    python manage.py rebuild_search_index [--batch-size 500]
+"""
+
+
+class Command(BaseCommand):
+    help = "Rebuild the inverted index used by product search."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of products reindexed per batch.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_pk = 0
+        total = 0
+        while True:
+            product_ids = list(
+                Product.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not product_ids:
+                break
+            index_products(product_ids)
+            last_pk = product_ids[-1]
+            total += len(product_ids)
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} products."))
@@ -0,0 +1,100 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from product.models.product import Product
+from product.models.stock_shard import StockShard
+from product.stock import get_ledger_stock, set_sharded_stock
+
+"""
+Management command to reconcile product stock with the stock ledger.
+
+Recomputes each product's stock as its snapshot plus the movements recorded after it and reports
+each product whose `stock_quantity` (the sum of its stock shards for a sharded product) drifted
+from it. With `--fix`, the drifting products are reset to the ledger value.
+
+Products are reconciled in primary-key batches, each in its own transaction: the batch's product
+rows and stock shards are locked first, and the ledger is only then recomputed for those products
+(two grouped queries per batch). Every stock change updates the product row or a shard and
+records its movement in one transaction, so while the locks are held the stock and the ledger
+cannot move apart, and a movement committed during the run is never mistaken for drift or
+overwritten by a stale total. Only one batch of products is locked at a time.
+
+Usage:
+    python manage.py reconcile_stock [--fix] [--batch-size 500]
+"""
+
+
+class Command(BaseCommand):
+    help = "Report (and optionally fix) products whose stock drifted from the ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Reset drifting products to the stock computed from the ledger.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of products locked and reconciled per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                products = list(
+                    Product.objects.select_for_update(no_key=True)
+                    .filter(pk__gt=last_pk)
+                    .order_by("pk")
+                    .values_list("pk", "name", "stock_quantity")[
+                        : options["batch_size"]
+                    ]
+                )
+                if not products:
+                    break
+                last_pk = products[-1][0]
+                pks = [pk for pk, _, _ in products]
+                sharded = {}
+                for product_id, quantity in (
+                    StockShard.objects.select_for_update()
+                    .filter(product_id__in=pks)
+                    .order_by("product_id", "index")
+                    .values_list("product_id", "quantity")
+                ):
+                    sharded[product_id] = sharded.get(product_id, 0) + quantity
+                ledger = get_ledger_stock(pks)
+                drifted += self.reconcile(products, sharded, ledger, options["fix"])
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Stock matches the ledger."))
+        elif options["fix"]:
+            self.stdout.write(
+                self.style.SUCCESS(f"Reset {drifted} products to the ledger.")
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(f"{drifted} products drifted from the ledger.")
+            )
+
+    def reconcile(self, products, sharded, ledger, fix):
+        drifted = 0
+        for pk, name, stock_quantity in products:
+            expected = ledger.get(pk, 0)
+            stock_quantity = sharded.get(pk, stock_quantity)
+            if stock_quantity == expected:
+                continue
+            drifted += 1
+            self.stdout.write(
+                f"Product {pk} ({name}): stock {stock_quantity}, "
+                f"ledger {expected}, drift {stock_quantity - expected:+d}"
+            )
+            if not fix:
+                continue
+            if pk in sharded:
+                set_sharded_stock(pk, expected, record=False)
+            else:
+                Product.objects.filter(pk=pk).update(stock_quantity=expected)
+        return drifted
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from product.models.product import Product
+from product.stock import shard_stock
+
+"""
+Management command to switch products to (or from) sharded inventory.
+
+Splits the stock of each given product evenly across `--shards` stock shards, so concurrent
+orders decrement different rows instead of queueing on the product row (see `product.stock`).
+Use it ahead of a flash sale; `--shards 0` folds the shards back into `stock_quantity`
+afterwards. Running it again on a sharded product changes its number of shards.
+
+Usage:
+    python manage.py shard_stock PRODUCT_ID [PRODUCT_ID ...] [--shards 16]
+"""
+
+
+class Command(BaseCommand):
+    help = "Split the stock of products across stock shards (0 shards turns it off)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("product_ids", nargs="+", type=int)
+        parser.add_argument(
+            "--shards",
+            type=int,
+            default=16,
+            help="Number of shards per product, or 0 to stop sharding.",
+        )
+
+    def handle(self, *args, **options):
+        shards = options["shards"]
+        if shards < 0:
+            raise CommandError("--shards must be 0 or more.")
+        for product_id in options["product_ids"]:
+            try:
+                total = shard_stock(product_id, shards)
+            except Product.DoesNotExist:
+                raise CommandError(f"Product {product_id} does not exist.")
+            if shards:
+                message = f"Product {product_id}: {total} units across {shards} shards."
+            else:
+                message = f"Product {product_id}: {total} units, no longer sharded."
+            self.stdout.write(self.style.SUCCESS(message))
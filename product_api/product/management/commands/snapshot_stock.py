@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from product.stock import compact_ledger
+
+"""
+Management command to compact the stock ledger into per-product snapshots.
+
+Movements older than `--keep-days` are folded into each product's `StockSnapshot` and deleted;
+newer movements are kept as the detailed audit trail. Run it periodically, e.g. nightly.
+
+Usage:
+    python manage.py snapshot_stock [--keep-days 30]
+"""
+
+
+class Command(BaseCommand):
+    help = "Fold old stock movements into per-product snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=30,
+            help="Keep movements from the last KEEP_DAYS days uncompacted.",
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["keep_days"])
+        count = compact_ledger(before)
+        self.stdout.write(
+            self.style.SUCCESS(f"Compacted {count} stock movements into snapshots.")
+        )
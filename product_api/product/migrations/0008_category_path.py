@@ -0,0 +1,45 @@
+# Generated by Django 5.1.4 on 2026-10-18 05:12
+
+from django.db import migrations, models
+
+
+def populate_category_paths(apps, schema_editor):
+    Category = apps.get_model("product", "Category")
+    # Walk the tree top-down so every parent path is known before its children.
+    level = list(Category.objects.filter(parent_category__isnull=True))
+    paths = {}
+    while level:
+        for category in level:
+            parent_path = paths.get(category.parent_category_id, "/")
+            category.path = f"{parent_path}{category.pk}/"
+            paths[category.pk] = category.path
+        Category.objects.bulk_update(level, ["path"], batch_size=500)
+        level = list(
+            Category.objects.filter(parent_category_id__in=[c.pk for c in level])
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0007_productsearchterm"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="path",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=512
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(
+                fields=["path"],
+                name="category_path_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        migrations.RunPython(populate_category_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.1.4 on 2026-10-18 05:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def snapshot_existing_stock(apps, schema_editor):
+    # Existing stock becomes the opening balance of the ledger.
+    Product = apps.get_model("product", "Product")
+    StockSnapshot = apps.get_model("product", "StockSnapshot")
+    StockSnapshot.objects.bulk_create(
+        [
+            StockSnapshot(product_id=pk, quantity=stock_quantity, movement_id=0)
+            for pk, stock_quantity in Product.objects.values_list(
+                "pk", "stock_quantity"
+            ).iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0008_category_path"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("quantity", models.IntegerField()),
+                ("movement_id", models.BigIntegerField(default=0)),
+                ("taken_at", models.DateTimeField(auto_now=True)),
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_snapshot",
+                        to="product.product",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="StockMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("delta", models.IntegerField()),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("order", "Order"),
+                            ("order_change", "Order change"),
+                            ("order_cancel", "Order cancellation"),
+                            ("order_delete", "Order deletion"),
+                            ("adjustment", "Adjustment"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("reference", models.CharField(blank=True, default="", max_length=64)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_movements",
+                        to="product.product",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["product", "id"], name="stock_movement_product_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(snapshot_existing_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+from product.search import build_postings
+
+
+def index_existing_products(apps, schema_editor, batch_size=500):
+    Product = apps.get_model("product", "Product")
+    ProductSearchTerm = apps.get_model("product", "ProductSearchTerm")
+    Categories = Product.categories.through
+    # Products created before the index existed have no postings; index them in pk batches.
+    last_pk = 0
+    while True:
+        products = list(
+            Product.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .only("pk", "name", "description")[:batch_size]
+        )
+        if not products:
+            break
+        product_ids = [product.pk for product in products]
+        category_names = {}
+        for product_id, name in Categories.objects.filter(
+            product_id__in=product_ids
+        ).values_list("product_id", "category__name"):
+            category_names.setdefault(product_id, []).append(name)
+
+        ProductSearchTerm.objects.filter(product_id__in=product_ids).delete()
+        ProductSearchTerm.objects.bulk_create(
+            [
+                ProductSearchTerm(product_id=product.pk, term=term, weight=weight)
+                for product in products
+                for term, weight in build_postings(
+                    product, category_names.get(product.pk, [])
+                ).items()
+            ],
+            batch_size=1000,
+        )
+        last_pk = product_ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0010_stock_shard"),
+    ]
+
+    operations = [
+        migrations.RunPython(index_existing_products, migrations.RunPython.noop),
+    ]
@@ -1,2 +1,5 @@
 from .category import Category
 from .product import Product
+from .product_search import ProductSearchTerm
+from .stock_ledger import StockMovement, StockSnapshot
+from .stock_shard import StockShard
@@ -1,4 +1,9 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
+
+from .tracking import FieldTrackingMixin
 
 """
 Category model to represent product categories with potential hierarchical relationships (parent-child categories).
@@ -8,14 +13,29 @@ Fields:
     - created_at (DateTimeField): Timestamp for when the category is created.
     - updated_at (DateTimeField): Timestamp for the last time the category was updated.
     - parent_category (ForeignKey): A self-referential foreign key to represent parent-child category relationships. Can be null if the category has no parent (i.e., it's a top-level category).
+    - path (CharField): Materialized path of the category, the ids from the root down to the category itself
+      (e.g. "/1/4/9/"). Every descendant's path starts with it, so a whole subtree is selected with a single
+      indexed prefix match. Maintained by `save`; deleting a category cascades to its descendants.
+
+Changes to `name` and `parent_category` are tracked in memory (see `FieldTrackingMixin`), so saving a
+loaded category whose parent did not change leaves the paths alone, and only a rename reindexes its
+products for search (see `product.signals`).
+
+Meta:
+    - indexes: An index on `path` (with `varchar_pattern_ops` on PostgreSQL so `LIKE 'prefix%'` can use it).
 
 Methods:
     - get_subcategories: Returns all the subcategories under the current category.
+    - get_descendants: Returns every category below the current category, at any depth.
+    - save: Saves the category and keeps its path, and the paths of its descendants, up to date when
+      its parent changes.
     - __str__: Returns the name of the category for string representation.
 """
 
 
-class Category(models.Model):
+class Category(FieldTrackingMixin, models.Model):
+    tracked_fields = ("name", "parent_category")
+
     name = models.CharField(max_length=255, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -27,10 +47,72 @@ class Category(models.Model):
         blank=True,
         on_delete=models.CASCADE,
     )
+    path = models.CharField(max_length=512, blank=True, default="", editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["path"],
+                name="category_path_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ]
 
     def get_subcategories(self):
         # This method returns all the subcategories under this category
         return self.subcategories.all()
 
+    def get_descendants(self):
+        # Every category whose path extends this one, excluding the category itself
+        return Category.objects.filter(path__startswith=self.path).exclude(pk=self.pk)
+
+    def build_path(self):
+        if self.parent_category_id is None:
+            return f"/{self.pk}/"
+        parent_path = (
+            Category.objects.filter(pk=self.parent_category_id)
+            .values_list("path", flat=True)
+            .get()
+        )
+        if self.path and parent_path.startswith(self.path):
+            raise ValidationError(
+                "A category cannot be moved under its own subcategory."
+            )
+        return f"{parent_path}{self.pk}/"
+
+    def save(self, *args, **kwargs):
+        """
+        Save the category, then recompute its materialized path.
+
+        When the category is moved to a different parent, the paths of all its descendants are
+        rewritten with a single UPDATE that swaps the old path prefix for the new one. A loaded
+        category whose parent did not change keeps its path without any query.
+        """
+        old_path = self.path
+        if old_path:
+            original = self.get_original_values("parent_category")
+            if original.get("parent_category_id") == self.parent_category_id:
+                super().save(*args, **kwargs)
+                return
+            # Reject cycles before anything is written.
+            new_path = self.build_path()
+        super().save(*args, **kwargs)
+        if not old_path:
+            new_path = self.build_path()
+
+        if new_path != old_path:
+            Category.objects.filter(pk=self.pk).update(path=new_path)
+            if old_path:
+                Category.objects.filter(path__startswith=old_path).exclude(
+                    pk=self.pk
+                ).update(
+                    path=Concat(
+                        Value(new_path),
+                        Substr("path", len(old_path) + 1),
+                        output_field=models.CharField(),
+                    )
+                )
+            self.path = new_path
+
     def __str__(self):
         return self.name
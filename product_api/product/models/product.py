@@ -1,6 +1,7 @@
 from django.db import models
 
 from product.models.category import Category
+from product.models.tracking import FieldTrackingMixin
 
 """
 Product model to represent products in the system.
@@ -15,12 +16,25 @@ Fields:
     - updated_date (DateTimeField): The timestamp of the last update made to the product.
     - categories (ManyToManyField): A many-to-many relationship to the Category model, allowing a product to belong to multiple categories.
 
+Changes to name, description, price and stock are tracked in memory (see `FieldTrackingMixin`).
+`save()` never writes the stock of an existing product: the stock may have been changed by the
+conditional `UPDATE`s of `product.stock` since the instance was loaded, and writing the loaded value
+back would undo them. A changed `stock_quantity` is applied as a difference instead, after the
+other fields are saved (see `product.signals`).
+
+Meta:
+    - indexes: A composite (price, id) index so keyset pagination ordered by price can seek straight
+      to the next page. Ordering by name is already served by the unique index on `name`.
+
 Methods:
     - __str__: Returns the name of the product as the string representation of the product.
+    - save: Saves the product, leaving a changed stock to be applied as a difference.
 """
 
 
-class Product(models.Model):
+class Product(FieldTrackingMixin, models.Model):
+    tracked_fields = ("name", "description", "price", "stock_quantity")
+
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -29,5 +43,32 @@ class Product(models.Model):
     updated_date = models.DateTimeField(auto_now=True)
     categories = models.ManyToManyField(Category, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["price", "id"], name="product_price_id_idx"),
+        ]
+
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        self._stock_change = None
+        update_fields = kwargs.get("update_fields")
+        loaded = self.get_original_values("stock_quantity").get("stock_quantity")
+        if (
+            not self._state.adding
+            and loaded is not None
+            and (update_fields is None or "stock_quantity" in update_fields)
+        ):
+            self._stock_change = self.stock_quantity - loaded
+            if update_fields is None:
+                # Like Django, only the loaded fields of a partially loaded instance are saved.
+                update_fields = [
+                    field.name
+                    for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname in self.__dict__
+                ]
+            kwargs["update_fields"] = {
+                name for name in update_fields if name != "stock_quantity"
+            } | {"updated_date"}
+        super().save(*args, **kwargs)
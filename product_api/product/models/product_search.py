@@ -0,0 +1,36 @@
+from django.db import models
+
+from product.models.product import Product
+
+"""
+ProductSearchTerm model backing the product full-text search engine (see `product.search`).
+
+Each row is one posting of the inverted index: a normalized term and the weighted frequency with
+which it occurs in one product's name, description and category names. Searching looks terms up
+through the (term, product) unique index instead of scanning product text with LIKE.
+
+Fields:
+    - term (CharField): A normalized (lower-cased, stop-word filtered) token.
+    - product (ForeignKey): The product whose text contains the term. Postings are removed with it.
+    - weight (FloatField): Field-weighted, sub-linear term frequency of the term in the product.
+
+Meta:
+    - unique_together: One posting per (term, product) pair; its index serves term lookups.
+
+Methods:
+    - __str__: Returns the term and the product id of the posting.
+"""
+
+
+class ProductSearchTerm(models.Model):
+    term = models.CharField(max_length=64)
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="search_terms"
+    )
+    weight = models.FloatField()
+
+    class Meta:
+        unique_together = ("term", "product")
+
+    def __str__(self):
+        return f"{self.term} -> product {self.product_id}"
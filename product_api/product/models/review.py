@@ -3,6 +3,7 @@ from django.db import models
 from django.forms import ValidationError
 
 from product.models import Product
+from product.models.tracking import FieldTrackingMixin
 
 """
 Review model to represent product reviews in the system.
@@ -15,6 +16,8 @@ Fields:
     - created_at (DateTimeField): The timestamp when the review was created.
     - updated_at (DateTimeField): The timestamp of the last update to the review.
 
+Changes to the rating and comment are tracked in memory (see `FieldTrackingMixin`).
+
 Meta:
     - unique_together: Ensures that a user can only review a product once.
 
@@ -27,7 +30,9 @@ Methods:
 user = get_user_model()
 
 
-class Review(models.Model):
+class Review(FieldTrackingMixin, models.Model):
+    tracked_fields = ("rating", "comment")
+
     # Define rating choices
     RATING_CHOICES = [(i, str(i)) for i in range(1, 6)]  # 1 to 5 ratings
 
@@ -0,0 +1,74 @@
+from django.db import models
+
+from product.models.product import Product
+
+"""
+Append-only stock ledger (see `product.stock`).
+
+Every change to a product's stock is recorded as a `StockMovement` insert in the same
+transaction as the change: stock taken or returned by orders, and manual adjustments (product
+creation, edits in the admin or through the API). Rows are never updated. `StockSnapshot` folds
+older movements into one balance per product, so the ledger can be compacted, and the current
+stock of a product can always be recomputed as its snapshot plus the movements after it.
+
+StockMovement fields:
+    - product (ForeignKey): The product whose stock moved. Movements are removed with it.
+    - delta (IntegerField): Units added (positive) or removed (negative).
+    - reason (CharField): Why the stock moved: an order taking stock, an order change, a
+      cancellation, an order deletion, an expired hold or a manual adjustment.
+    - reference (CharField): What caused the movement, e.g. `order:42`.
+    - created_at (DateTimeField): When the movement was recorded.
+
+StockSnapshot fields:
+    - product (OneToOneField): The product the snapshot belongs to.
+    - quantity (IntegerField): The stock balance after every movement up to `movement_id`.
+    - movement_id (BigIntegerField): The id of the last movement folded into `quantity`.
+    - taken_at (DateTimeField): When the snapshot was taken.
+"""
+
+
+class StockMovement(models.Model):
+    ORDER = "order"
+    ORDER_CHANGE = "order_change"
+    ORDER_CANCEL = "order_cancel"
+    ORDER_DELETE = "order_delete"
+    ORDER_EXPIRE = "order_expire"
+    ADJUSTMENT = "adjustment"
+    REASON_CHOICES = [
+        (ORDER, "Order"),
+        (ORDER_CHANGE, "Order change"),
+        (ORDER_CANCEL, "Order cancellation"),
+        (ORDER_DELETE, "Order deletion"),
+        (ORDER_EXPIRE, "Hold expiry"),
+        (ADJUSTMENT, "Adjustment"),
+    ]
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="stock_movements"
+    )
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    reference = models.CharField(max_length=64, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "id"], name="stock_movement_product_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.delta:+d} {self.product_id} ({self.reason})"
+
+
+class StockSnapshot(models.Model):
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, related_name="stock_snapshot"
+    )
+    quantity = models.IntegerField()
+    movement_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return (
+            f"{self.product_id}: {self.quantity} (through movement {self.movement_id})"
+        )
@@ -0,0 +1,38 @@
+from django.db import models
+
+from product.models.product import Product
+
+"""
+Sharded stock counters (see `product.stock`).
+
+A product in sharded-inventory mode keeps its stock in several `StockShard` rows instead of in
+`Product.stock_quantity`. Each take decrements one randomly chosen shard with enough stock, so
+concurrent orders for the same product lock different rows instead of queueing on the product
+row. The product's stock is the sum of its shards; `Product.stock_quantity` only keeps the total
+as of the last rebalance (see the `rebalance_stock_shards` management command), and the API
+reports the live sum.
+
+Fields:
+    - product (ForeignKey): The sharded product. Shards are removed with it.
+    - index (PositiveSmallIntegerField): The position of the shard, from 0. Shards are always
+      locked in index order when several are locked together.
+    - quantity (PositiveIntegerField): The units held by the shard.
+"""
+
+
+class StockShard(models.Model):
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="stock_shards"
+    )
+    index = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "index"], name="unique_stock_shard"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}[{self.index}]: {self.quantity}"
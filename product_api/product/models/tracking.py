@@ -0,0 +1,123 @@
+"""
+In-memory field change tracking for models.
+
+`FieldTrackingMixin` snapshots the values of a model's tracked fields when an instance is loaded
+from the database (`from_db`), refreshed (`refresh_from_db`) or saved, so signal receivers can
+tell which fields a save changes, and what their old values were, without querying the row
+again. `pre_save` and `post_save` receivers both see the snapshot taken before the save; it is
+replaced once `save()` returns.
+
+The snapshot holds the values this instance loaded, not a fresh read: a row changed by another
+process after the instance was loaded is not seen. Fields that were deferred (`.only()` /
+`.defer()`) or never loaded (instances built in memory) have no snapshot;
+`get_original_values` reads those from the database, in one query, only when they are asked
+for.
+
+Usage:
+    class Order(FieldTrackingMixin, models.Model):
+        tracked_fields = ("product", "quantity", "order_status")
+"""
+
+
+class FieldTrackingMixin:
+    """
+    Track the changes made to a model instance's fields since it was loaded or last saved.
+
+    Attributes:
+        tracked_fields (tuple): Names of the tracked fields; None tracks every concrete field
+                                except the primary key.
+
+    Methods:
+        is_tracked: Whether a snapshot was taken (the instance was loaded or saved).
+        get_changed_fields(): Map the attnames of the changed tracked fields to their old values.
+        has_changed(name): Whether a tracked field differs from its snapshot.
+        get_original_values(*names): The snapshot values of the given fields, keyed by attname.
+    """
+
+    tracked_fields = None
+
+    @classmethod
+    def get_tracked_attnames(cls):
+        if cls.tracked_fields is None:
+            fields = [
+                field for field in cls._meta.concrete_fields if not field.primary_key
+            ]
+        else:
+            fields = [cls._meta.get_field(name) for name in cls.tracked_fields]
+        return [field.attname for field in fields]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {}
+        instance.snapshot_fields(cls.get_tracked_attnames())
+        return instance
+
+    def snapshot_fields(self, attnames):
+        # Deferred fields are absent from the instance `__dict__` and are not snapshotted.
+        snapshot = self.__dict__.setdefault("_loaded_values", {})
+        for attname in attnames:
+            if attname in self.__dict__:
+                snapshot[attname] = self.__dict__[attname]
+
+    def _attnames(self, names):
+        return [self._meta.get_field(name).attname for name in names]
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        tracked = self.get_tracked_attnames()
+        if fields is not None:
+            refreshed = set(self._attnames(fields))
+            tracked = [attname for attname in tracked if attname in refreshed]
+        self.snapshot_fields(tracked)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        tracked = self.get_tracked_attnames()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            saved = set(self._attnames(update_fields))
+            tracked = [attname for attname in tracked if attname in saved]
+        self.snapshot_fields(tracked)
+
+    @property
+    def is_tracked(self):
+        return "_loaded_values" in self.__dict__
+
+    def get_changed_fields(self):
+        """
+        Return `{attname: old value}` for every snapshotted field whose value changed.
+        """
+        snapshot = self.__dict__.get("_loaded_values", {})
+        return {
+            attname: old
+            for attname, old in snapshot.items()
+            if attname in self.__dict__ and self.__dict__[attname] != old
+        }
+
+    def has_changed(self, name):
+        return self._attnames([name])[0] in self.get_changed_fields()
+
+    def get_original_values(self, *names):
+        """
+        Return the values the given fields had when the instance was loaded or last saved.
+
+        Fields without a snapshot are read from the database in a single query; a row that no
+        longer exists leaves them out.
+
+        Args:
+            *names (str): Field names (or attnames, e.g. `product_id`).
+
+        Returns:
+            dict: Maps each field's attname to its original value.
+        """
+        attnames = self._attnames(names)
+        snapshot = self.__dict__.get("_loaded_values", {})
+        values = {
+            attname: snapshot[attname] for attname in attnames if attname in snapshot
+        }
+        missing = [attname for attname in attnames if attname not in values]
+        if missing and self.pk is not None:
+            row = type(self)._base_manager.filter(pk=self.pk).values(*missing).first()
+            values.update(row or {})
+        return values
@@ -0,0 +1,211 @@
+import math
+import re
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    FloatField,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+
+from .models.product import Product
+from .models.product_search import ProductSearchTerm
+
+"""
+Ranked full-text search over products.
+
+Products are indexed into `ProductSearchTerm`, an inverted index holding one posting per
+(term, product). A search looks its terms up through the index, scores every matching product with
+a TF-IDF style relevance score and orders by it, instead of running `icontains` LIKE scans over
+joined text columns. The index is portable (plain B-tree lookups on any database backend) and is
+updated incrementally by the receivers in `product.signals`.
+
+Scoring:
+    - Each field contributes `FIELD_WEIGHTS[field] * (1 + log(tf))` to a term's posting weight, so a
+      match in the name outranks one in a category name, which outranks one in the description.
+    - At query time every posting weight is multiplied by the term's inverse document frequency
+      `log(1 + N / df)`, so rare terms count for more than common ones.
+
+Functions:
+    - stem(token): Reduce a plural token to its singular form.
+    - tokenize(text): Split text into normalized index terms.
+    - index_product(product): (Re)build the postings of a single product.
+    - index_products(product_ids): (Re)build the postings of several products.
+    - search_products(queryset, query): Filter a product queryset to matches, annotated with `search_rank`.
+"""
+
+FIELD_WEIGHTS = {"name": 10.0, "categories": 5.0, "description": 1.0}
+
+# Seconds the catalog size used for IDF is cached for; it only needs to be roughly right.
+DOCUMENT_COUNT_TIMEOUT = 300
+DOCUMENT_COUNT_CACHE_KEY = "search:document-count"
+
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 10
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the to was "
+    "were will with".split()
+)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def stem(token):
+    """
+    Reduce simple English plurals to their singular form ("laptops" -> "laptop", "batteries" ->
+    "battery") so singular and plural queries match the same postings.
+    """
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if (
+        len(token) > 3
+        and token.endswith("s")
+        and not token.endswith(("ss", "us", "is"))
+    ):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """
+    Split `text` into lower-cased, singularized alphanumeric terms, dropping stop words and
+    one-letter tokens.
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        list: The terms in order of appearance (duplicates kept).
+    """
+    return [
+        stem(token)[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall((text or "").lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def build_postings(product, category_names):
+    """
+    Return a `{term: weight}` mapping for a product's name, description and category names.
+    """
+    weights = Counter()
+    fields = {
+        "name": product.name,
+        "description": product.description,
+        "categories": " ".join(category_names),
+    }
+    for field, text in fields.items():
+        for term, tf in Counter(tokenize(text)).items():
+            weights[term] += FIELD_WEIGHTS[field] * (1 + math.log(tf))
+    return weights
+
+
+def index_products(product_ids):
+    """
+    Rebuild the postings of the given products.
+
+    The products, their category names and their old postings are handled with one query each,
+    followed by a single bulk insert.
+
+    Args:
+        product_ids (iterable): Primary keys of the products to reindex.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+
+    products = Product.objects.filter(pk__in=product_ids).only("name", "description")
+    category_names = {}
+    for product_id, name in Product.categories.through.objects.filter(
+        product_id__in=product_ids
+    ).values_list("product_id", "category__name"):
+        category_names.setdefault(product_id, []).append(name)
+
+    postings = [
+        ProductSearchTerm(product_id=product.pk, term=term, weight=weight)
+        for product in products
+        for term, weight in build_postings(
+            product, category_names.get(product.pk, [])
+        ).items()
+    ]
+
+    with transaction.atomic():
+        ProductSearchTerm.objects.filter(product_id__in=product_ids).delete()
+        ProductSearchTerm.objects.bulk_create(postings, batch_size=1000)
+
+
+def index_product(product):
+    """
+    Rebuild the postings of a single product.
+    """
+    index_products([product.pk])
+
+
+def get_document_count():
+    count = cache.get(DOCUMENT_COUNT_CACHE_KEY)
+    if count is None:
+        count = Product.objects.count()
+        cache.set(DOCUMENT_COUNT_CACHE_KEY, count, DOCUMENT_COUNT_TIMEOUT)
+    return count
+
+
+def search_products(queryset, query):
+    """
+    Restrict `queryset` to products matching `query`, annotated with their relevance.
+
+    Any product containing at least one query term matches; products matching more (and rarer)
+    terms, or matching in more important fields, get a higher `search_rank`.
+
+    Args:
+        queryset (QuerySet): The product queryset to search within (already filtered).
+        query (str): The raw search string.
+
+    Returns:
+        QuerySet: The matching products annotated with `search_rank` (unordered). A query with no
+        indexable terms returns an empty queryset.
+    """
+    no_match = queryset.none().annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    )
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return no_match
+
+    document_frequencies = dict(
+        ProductSearchTerm.objects.filter(term__in=terms)
+        .values_list("term")
+        .annotate(df=Count("id"))
+        .values_list("term", "df")
+    )
+    if not document_frequencies:
+        return no_match
+
+    document_count = max(get_document_count(), 1)
+    score = Case(
+        *[
+            When(term=term, then=F("weight") * math.log(1 + document_count / df))
+            for term, df in document_frequencies.items()
+        ],
+        default=0.0,
+        output_field=FloatField(),
+    )
+
+    postings = ProductSearchTerm.objects.filter(term__in=list(document_frequencies))
+    rank = (
+        postings.filter(product=OuterRef("pk"))
+        .values("product")
+        .annotate(rank=Sum(score))
+        .values("rank")
+    )
+    return queryset.filter(pk__in=postings.values("product")).annotate(
+        search_rank=Subquery(rank, output_field=FloatField())
+    )
@@ -0,0 +1,178 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import CATALOG_NAMESPACE, CATEGORY_TREE_NAMESPACE, invalidate_cache
+from .models.category import Category
+from .models.product import Product
+from .models.product_image import ProductImage
+from .models.stock_ledger import StockMovement
+from .search import index_product, index_products
+from .stock import change_stock, record_movements, set_sharded_stock
+
+"""
+Signal receivers that keep cached catalog data and the product search index consistent with the
+database.
+
+Signal Handlers:
+    - post_save / post_delete (Product, ProductImage, Category): Invalidate the catalog cache.
+    - m2m_changed (Product.categories): Invalidate the catalog cache when category assignments change.
+    - post_save / post_delete (Category), post_delete (Product), m2m_changed (Product.categories):
+      Invalidate the cached category tree and its product counts.
+    - post_save (Product): Reindex the product for search.
+    - m2m_changed (Product.categories): Reindex the products whose categories changed.
+    - post_save (Category): Reindex the products of a renamed category.
+    - pre_delete / post_delete (Category): Reindex the products that lose a deleted category.
+    - post_save / post_delete (ProductImage), m2m_changed (Product.categories), post_delete (Category):
+      Touch `updated_date` of the affected products, so their conditional GET validators change
+      along with their nested images and categories.
+    - post_save (Product): Record the stock set on creation as an adjustment in the stock ledger,
+      and apply a stock changed through `save()` (admin and API edits), which `Product.save()`
+      does not write: by the difference to the loaded value (`change_stock`), so concurrent
+      order takes are kept and the ledger adds up, or, for a sharded product, by spreading the
+      new total across its shards (see `product.stock`).
+
+Stock changes made by orders go through the atomic `QuerySet.update()` helpers in `product.stock`,
+which send no signals and invalidate the catalog cache themselves. Deleted products drop their
+postings through the cascade.
+"""
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_on_change(sender, **kwargs):
+    invalidate_cache(CATALOG_NAMESPACE)
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def invalidate_catalog_on_categories_change(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_cache(CATALOG_NAMESPACE)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Product)
+def invalidate_category_tree_on_change(sender, **kwargs):
+    invalidate_cache(CATEGORY_TREE_NAMESPACE)
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def invalidate_category_tree_on_categories_change(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_cache(CATEGORY_TREE_NAMESPACE)
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(
+    sender, instance, created=False, update_fields=None, **kwargs
+):
+    # Saves that only touch non-text columns (e.g. stock) leave the postings unchanged.
+    if update_fields is not None and not {"name", "description"} & set(update_fields):
+        return
+    # So do saves of a loaded product whose name and description did not change.
+    if not created and instance.is_tracked:
+        if not (instance.has_changed("name") or instance.has_changed("description")):
+            return
+    index_product(instance)
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def index_products_on_categories_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action == "pre_clear" and reverse:
+        # The cleared products are only known before the rows are removed.
+        instance._affected_product_ids = list(
+            instance.product_set.values_list("pk", flat=True)
+        )
+    elif action in ("post_add", "post_remove"):
+        index_products(pk_set if reverse else [instance.pk])
+    elif action == "post_clear":
+        if reverse:
+            index_products(getattr(instance, "_affected_product_ids", []))
+        else:
+            index_product(instance)
+
+
+@receiver(post_save, sender=Category)
+def index_products_on_category_save(
+    sender, instance, created, update_fields=None, **kwargs
+):
+    # The postings only hold the names of a product's own categories, so only a rename matters.
+    if created or (update_fields is not None and "name" not in update_fields):
+        return
+    if instance.is_tracked and not instance.has_changed("name"):
+        return
+    index_products(instance.product_set.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def collect_products_on_category_delete(sender, instance, **kwargs):
+    instance._affected_product_ids = list(
+        instance.product_set.values_list("pk", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Category)
+def index_products_on_category_delete(sender, instance, **kwargs):
+    index_products(getattr(instance, "_affected_product_ids", []))
+
+
+def touch_products(product_ids):
+    # QuerySet.update() sends no signals, so touching never re-enters these receivers.
+    Product.objects.filter(pk__in=product_ids).update(updated_date=timezone.now())
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def touch_product_on_image_change(sender, instance, **kwargs):
+    touch_products([instance.product_id])
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def touch_products_on_categories_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action in ("post_add", "post_remove"):
+        touch_products(pk_set if reverse else [instance.pk])
+    elif action == "post_clear":
+        if reverse:
+            touch_products(getattr(instance, "_affected_product_ids", []))
+        else:
+            touch_products([instance.pk])
+
+
+@receiver(post_delete, sender=Category)
+def touch_products_on_category_delete(sender, instance, **kwargs):
+    touch_products(getattr(instance, "_affected_product_ids", []))
+
+
+@receiver(post_save, sender=Product)
+def record_stock_adjustment_on_product_save(
+    sender, instance, created, raw=False, **kwargs
+):
+    if raw:
+        return
+    if created:
+        record_movements(
+            {instance.pk: instance.stock_quantity}, StockMovement.ADJUSTMENT, "created"
+        )
+        return
+    change = getattr(instance, "_stock_change", None)
+    if not change:
+        return
+    # `Product.save()` left the stock column alone: a sharded product's shards are reset to the
+    # new total, an unsharded product's stock is changed by the difference to the loaded value.
+    if not set_sharded_stock(instance.pk, instance.stock_quantity, reference="edited"):
+        instance.stock_quantity = change_stock(instance.pk, change, reference="edited")
+    instance.snapshot_fields(["stock_quantity"])
@@ -0,0 +1,579 @@
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, Max, OuterRef, Q, Subquery, Sum, When
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .cache import CATALOG_NAMESPACE, invalidate_cache
+from .models.product import Product
+from .models.stock_ledger import StockMovement, StockSnapshot
+from .models.stock_shard import StockShard
+
+"""
+Atomic stock adjustments.
+
+Stock is never read into Python, changed and saved back: that read-modify-write lets two
+concurrent checkouts both see the same quantity and oversell. Every adjustment is instead a
+single `UPDATE` evaluated by the database against the current row, and a decrement is conditional
+on enough stock being left:
+
+    UPDATE product_product
+       SET stock_quantity = stock_quantity - n
+     WHERE id = %s AND stock_quantity >= n
+
+The row lock is held only for that statement (or until the surrounding transaction ends), and
+the number of updated rows tells whether the decrement succeeded. Because `QuerySet.update()`
+sends no signals, the helpers touch `updated_date` and invalidate the catalog cache themselves.
+
+Every successful adjustment also appends a `StockMovement` to the stock ledger in the same
+transaction, tagged with a `reason` and a `reference` (e.g. `order:42`), so stock can be audited
+and recomputed (see the `snapshot_stock` and `reconcile_stock` management commands).
+
+Products expecting bursts of concurrent orders (flash sales) can be switched to sharded
+inventory (`shard_stock`): their stock is split across `StockShard` rows and every take is a
+conditional `UPDATE` of one randomly chosen shard that is not locked by another transaction
+(`SELECT ... FOR UPDATE SKIP LOCKED`), falling back to locking all shards only when no single
+shard can cover the quantity. `take_stock` and `return_stock` pick the sharded or the product-row
+path by themselves; `rebalance_shards` evens the shards out and refreshes the cached total in
+`Product.stock_quantity`. When a product is first sharded, `shard_stock` sends `stock_sharding`
+inside its transaction so other apps can take units out of the stock before it is split (the
+order app takes its outstanding holds there), without this module knowing about them.
+
+Functions:
+    - decrement_stock(product_id, quantity): Take stock if enough is left; return whether it did.
+    - decrement_stocks(quantities): Take stock for several products in one statement, all or none.
+    - increment_stock(product_id, quantity): Put stock back (cancellations, deletions).
+    - change_stock(product_id, delta): Change stock by `delta`, stopping at zero (stock edits).
+    - record_movements(deltas, reason, reference): Append movements to the ledger.
+    - compact_ledger(before): Fold movements older than `before` into the snapshots.
+    - get_ledger_stock(product_ids): Recompute stock from the snapshots and later movements.
+    - get_sharded_stock(product_ids): Summed shard stock of the sharded products among `product_ids`.
+    - annotate_sharded_stock(queryset): Annotate products with their summed shard stock.
+    - take_stock(product_id, quantity): Take stock from the shards or the product row.
+    - return_stock(product_id, quantity): Put stock back into the shards or the product row.
+    - shard_stock(product_id, shards): Switch a product to `shards` shards (0 switches back).
+    - set_sharded_stock(product_id, total): Reset a sharded product's stock to `total`.
+    - rebalance_shards(product_ids): Even out the shards and refresh the cached totals.
+
+Signals:
+    - stock_sharding: Sent with `product_id` and `stock` when a product is first sharded;
+      receivers return the units they took out of `stock`.
+"""
+
+stock_sharding = Signal()
+
+
+def record_movements(deltas, reason, reference=""):
+    """
+    Append one `StockMovement` per product to the ledger, with a single insert.
+
+    Args:
+        deltas (dict): Maps product primary keys to the units added (positive) or removed.
+        reason (str): One of `StockMovement.REASON_CHOICES`.
+        reference (str): What caused the movements, e.g. `order:42`.
+    """
+    StockMovement.objects.bulk_create(
+        [
+            StockMovement(
+                product_id=pk, delta=delta, reason=reason, reference=reference
+            )
+            for pk, delta in deltas.items()
+            if delta
+        ]
+    )
+
+
+def _adjust_stock(product_id, queryset, delta, reason, reference):
+    with transaction.atomic():
+        updated = queryset.update(
+            stock_quantity=F("stock_quantity") + delta, updated_date=timezone.now()
+        )
+        if updated:
+            record_movements({product_id: delta}, reason, reference)
+    if updated:
+        invalidate_cache(CATALOG_NAMESPACE)
+    return bool(updated)
+
+
+def decrement_stock(
+    product_id, quantity, reason=StockMovement.ADJUSTMENT, reference=""
+):
+    """
+    Atomically take `quantity` units of a product's stock.
+
+    Args:
+        product_id (int): The primary key of the product.
+        quantity (int): The number of units to take.
+        reason (str): The ledger reason of the movement.
+        reference (str): The ledger reference of the movement.
+
+    Returns:
+        bool: True if the stock was decremented, False if not enough was left (or the product
+              does not exist), in which case nothing was changed.
+    """
+    if quantity <= 0:
+        return True
+    queryset = Product.objects.filter(pk=product_id, stock_quantity__gte=quantity)
+    return _adjust_stock(product_id, queryset, -quantity, reason, reference)
+
+
+def decrement_stocks(quantities, reason=StockMovement.ADJUSTMENT, reference=""):
+    """
+    Atomically take stock for several products with a single conditional `UPDATE`.
+
+    Every product must have enough stock for its quantity. The caller must run this inside a
+    transaction and roll it back when False is returned, since the statement may already have
+    decremented the products that did have enough stock.
+
+    Args:
+        quantities (dict): Maps product primary keys to the number of units to take.
+        reason (str): The ledger reason of the movements.
+        reference (str): The ledger reference of the movements.
+
+    Returns:
+        bool: True if every product was decremented.
+    """
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return True
+    conditions = reduce(
+        or_,
+        (Q(pk=pk, stock_quantity__gte=quantity) for pk, quantity in quantities.items()),
+    )
+    delta = Case(
+        *[When(pk=pk, then=-quantity) for pk, quantity in quantities.items()],
+        default=0,
+    )
+    updated = Product.objects.filter(conditions).update(
+        stock_quantity=F("stock_quantity") + delta, updated_date=timezone.now()
+    )
+    if updated:
+        invalidate_cache(CATALOG_NAMESPACE)
+    if updated != len(quantities):
+        return False
+    record_movements(
+        {pk: -quantity for pk, quantity in quantities.items()}, reason, reference
+    )
+    return True
+
+
+def increment_stock(
+    product_id, quantity, reason=StockMovement.ADJUSTMENT, reference=""
+):
+    """
+    Atomically return `quantity` units to a product's stock.
+    """
+    if quantity <= 0:
+        return
+    _adjust_stock(
+        product_id, Product.objects.filter(pk=product_id), quantity, reason, reference
+    )
+
+
+def change_stock(product_id, delta, reason=StockMovement.ADJUSTMENT, reference=""):
+    """
+    Change the stock of an unsharded product by `delta`, stopping at zero.
+
+    Applies a stock edit made against the stock an instance was loaded with (see
+    `Product.save()`): a decrease beyond the stock left empties it instead of being refused. The
+    row is locked while the stock is read and written, so the recorded movement is the change
+    that was actually made.
+
+    Args:
+        product_id (int): The primary key of the product.
+        delta (int): The units to add (positive) or remove.
+        reason (str): The ledger reason of the movement.
+        reference (str): The ledger reference of the movement.
+
+    Returns:
+        int: The product's stock afterwards.
+    """
+    with transaction.atomic():
+        # FOR NO KEY UPDATE does not block concurrent orders referencing the product.
+        previous = (
+            Product.objects.select_for_update(no_key=True)
+            .values_list("stock_quantity", flat=True)
+            .get(pk=product_id)
+        )
+        stock = max(previous + delta, 0)
+        if stock != previous:
+            Product.objects.filter(pk=product_id).update(
+                stock_quantity=stock, updated_date=timezone.now()
+            )
+            record_movements({product_id: stock - previous}, reason, reference)
+    if stock != previous:
+        invalidate_cache(CATALOG_NAMESPACE)
+    return stock
+
+
+def compact_ledger(before):
+    """
+    Fold every movement recorded before `before` into the per-product snapshots and delete it.
+
+    New snapshots are the old snapshot plus the sum of the folded movements, computed with one
+    grouped query; the snapshots are rewritten and the movements deleted in the same
+    transaction. Only movements older than `before` are folded, which leaves a wide margin for
+    transactions still in flight (whose movements may commit with a lower id).
+
+    Args:
+        before (datetime): Movements created before this moment are compacted.
+
+    Returns:
+        int: The number of movements folded into the snapshots.
+    """
+    with transaction.atomic():
+        last_id = StockMovement.objects.filter(created_at__lt=before).aggregate(
+            last_id=Max("id")
+        )["last_id"]
+        if last_id is None:
+            return 0
+
+        folded = StockMovement.objects.filter(id__lte=last_id)
+        deltas = dict(
+            folded.values("product_id")
+            .annotate(total=Sum("delta"))
+            .values_list("product_id", "total")
+        )
+        snapshots = dict(
+            StockSnapshot.objects.select_for_update()
+            .filter(product_id__in=list(deltas))
+            .values_list("product_id", "quantity")
+        )
+        StockSnapshot.objects.filter(product_id__in=list(deltas)).delete()
+        StockSnapshot.objects.bulk_create(
+            [
+                StockSnapshot(
+                    product_id=product_id,
+                    quantity=snapshots.get(product_id, 0) + delta,
+                    movement_id=last_id,
+                )
+                for product_id, delta in deltas.items()
+            ],
+            batch_size=1000,
+        )
+        count, _ = folded.delete()
+    return count
+
+
+def get_ledger_stock(product_ids=None):
+    """
+    Recompute the stock of the products among `product_ids` (every product when None) from the
+    ledger.
+
+    Returns:
+        dict: Maps product primary keys to their snapshot quantity plus the sum of the movements
+              recorded after the snapshot (products without a snapshot start from 0).
+    """
+    snapshots = StockSnapshot.objects.all()
+    later = StockMovement.objects.filter(
+        Q(product__stock_snapshot__isnull=True)
+        | Q(id__gt=F("product__stock_snapshot__movement_id"))
+    )
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        snapshots = snapshots.filter(product_id__in=product_ids)
+        later = later.filter(product_id__in=product_ids)
+    stock = dict(snapshots.values_list("product_id", "quantity"))
+    for product_id, total in (
+        later.values("product_id")
+        .annotate(total=Sum("delta"))
+        .values_list("product_id", "total")
+    ):
+        stock[product_id] = stock.get(product_id, 0) + total
+    return stock
+
+
+def split_stock(total, shards):
+    """
+    Split `total` units as evenly as possible into `shards` quantities.
+    """
+    base, extra = divmod(total, shards)
+    return [base + (index < extra) for index in range(shards)]
+
+
+def get_sharded_stock(product_ids=None):
+    """
+    Return `{product_id: summed shard quantity}` for the sharded products among `product_ids`
+    (every sharded product when None). Products that are not sharded are left out.
+    """
+    shards = StockShard.objects.all()
+    if product_ids is not None:
+        shards = shards.filter(product_id__in=list(product_ids))
+    return dict(
+        shards.values("product_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("product_id", "total")
+    )
+
+
+def annotate_sharded_stock(queryset):
+    """
+    Annotate a product queryset with `sharded_stock`, the summed stock of each product's shards
+    (None for products that are not sharded), as a correlated subquery of the same query.
+    """
+    totals = (
+        StockShard.objects.filter(product=OuterRef("pk"))
+        .order_by()
+        .values("product")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    return queryset.annotate(sharded_stock=Subquery(totals[:1]))
+
+
+def is_sharded(product_id):
+    return StockShard.objects.filter(product_id=product_id).exists()
+
+
+def _record_shard_change(product_id, delta, reason, reference):
+    record_movements({product_id: delta}, reason, reference)
+    invalidate_cache(CATALOG_NAMESPACE)
+
+
+def take_sharded_stock(
+    product_id, quantity, reason=StockMovement.ADJUSTMENT, reference=""
+):
+    """
+    Take `quantity` units from the shards of a sharded product.
+
+    A random shard that holds enough units and is not locked by a concurrent take is decremented
+    with a conditional `UPDATE`. When no such shard is found, every shard of the product is locked
+    in index order and the quantity is taken from the fullest shards first.
+
+    Returns:
+        bool: True if the stock was taken, False if the shards hold less than `quantity` in total
+              (or the product is not sharded), in which case nothing was changed.
+    """
+    if quantity <= 0:
+        return True
+    with transaction.atomic():
+        shard = (
+            StockShard.objects.select_for_update(skip_locked=True)
+            .filter(product_id=product_id, quantity__gte=quantity)
+            .order_by("?")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if shard is not None and StockShard.objects.filter(
+            pk=shard, quantity__gte=quantity
+        ).update(quantity=F("quantity") - quantity):
+            _record_shard_change(product_id, -quantity, reason, reference)
+            return True
+
+        shards = list(
+            StockShard.objects.select_for_update()
+            .filter(product_id=product_id)
+            .order_by("index")
+        )
+        if sum(shard.quantity for shard in shards) < quantity:
+            return False
+        remaining = quantity
+        for shard in sorted(shards, key=lambda shard: -shard.quantity):
+            taken = min(shard.quantity, remaining)
+            shard.quantity -= taken
+            remaining -= taken
+            if not remaining:
+                break
+        StockShard.objects.bulk_update(shards, ["quantity"])
+        _record_shard_change(product_id, -quantity, reason, reference)
+    return True
+
+
+def return_sharded_stock(
+    product_id, quantity, reason=StockMovement.ADJUSTMENT, reference=""
+):
+    """
+    Return `quantity` units to a random unlocked shard of a sharded product.
+
+    Returns:
+        bool: False if the product is not sharded, in which case nothing was changed.
+    """
+    if quantity <= 0:
+        return True
+    with transaction.atomic():
+        shard = (
+            StockShard.objects.select_for_update(skip_locked=True)
+            .filter(product_id=product_id)
+            .order_by("?")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if shard is None:
+            # Every shard is locked (or there are none): wait for the first one.
+            shard = (
+                StockShard.objects.filter(product_id=product_id)
+                .order_by("index")
+                .values_list("pk", flat=True)
+                .first()
+            )
+            if shard is None:
+                return False
+        StockShard.objects.filter(pk=shard).update(quantity=F("quantity") + quantity)
+        _record_shard_change(product_id, quantity, reason, reference)
+    return True
+
+
+def take_stock(product_id, quantity, reason=StockMovement.ADJUSTMENT, reference=""):
+    """
+    Take stock from a product's shards if it is sharded, or from its row otherwise.
+
+    Returns:
+        bool: True if the stock was taken.
+    """
+    if is_sharded(product_id):
+        return take_sharded_stock(product_id, quantity, reason, reference)
+    return decrement_stock(product_id, quantity, reason, reference)
+
+
+def return_stock(product_id, quantity, reason=StockMovement.ADJUSTMENT, reference=""):
+    """
+    Put stock back into a product's shards if it is sharded, or into its row otherwise.
+    """
+    if not return_sharded_stock(product_id, quantity, reason, reference):
+        increment_stock(product_id, quantity, reason, reference)
+
+
+def _write_shards(product_id, shards, count, total):
+    # `shards` are the product's locked shards, in index order. Existing rows are updated in
+    # place (a concurrent take waiting on one of them then sees the new quantity), missing ones
+    # are created and surplus ones deleted.
+    quantities = split_stock(total, count) if count else []
+    kept = shards[:count]
+    for shard, quantity in zip(kept, quantities):
+        shard.quantity = quantity
+    StockShard.objects.bulk_update(kept, ["quantity"])
+    StockShard.objects.bulk_create(
+        [
+            StockShard(product_id=product_id, index=index, quantity=quantity)
+            for index, quantity in enumerate(quantities)
+            if index >= len(shards)
+        ]
+    )
+    StockShard.objects.filter(pk__in=[shard.pk for shard in shards[count:]]).delete()
+
+
+def shard_stock(product_id, shards):
+    """
+    Switch a product to sharded inventory with `shards` shards, or back to a single counter.
+
+    The current stock (the shard sum for an already sharded product, `stock_quantity`
+    otherwise) is split evenly across the shards; with `shards=0` the shards are folded back into
+    `stock_quantity` and deleted. The total is unchanged, so no movement is recorded, except when
+    a product is first sharded: its unexpired holds then take their units out of the stock before
+    it is split (see `stock_sharding`), like holds placed on a sharded product, so the shards never
+    promise held units a second time.
+
+    Args:
+        product_id (int): The primary key of the product.
+        shards (int): The number of shards, or 0 to stop sharding.
+
+    Returns:
+        int: The product's stock.
+    """
+    with transaction.atomic():
+        # FOR NO KEY UPDATE does not block concurrent orders referencing the product.
+        product = (
+            Product.objects.select_for_update(no_key=True)
+            .only("pk", "stock_quantity")
+            .get(pk=product_id)
+        )
+        current = list(
+            StockShard.objects.select_for_update()
+            .filter(product_id=product_id)
+            .order_by("index")
+        )
+        total = (
+            sum(shard.quantity for shard in current)
+            if current
+            else product.stock_quantity
+        )
+        if shards and not current:
+            for _, taken in stock_sharding.send(
+                sender=Product, product_id=product_id, stock=total
+            ):
+                total -= taken
+        _write_shards(product_id, current, shards, total)
+        Product.objects.filter(pk=product_id).update(
+            stock_quantity=total, updated_date=timezone.now()
+        )
+    invalidate_cache(CATALOG_NAMESPACE)
+    return total
+
+
+def set_sharded_stock(
+    product_id, total, reason=StockMovement.ADJUSTMENT, reference="", record=True
+):
+    """
+    Set the stock of a sharded product to `total`, spread evenly across its shards.
+
+    Args:
+        product_id (int): The primary key of the product.
+        total (int): The new stock of the product.
+        reason (str): The ledger reason of the movement.
+        reference (str): The ledger reference of the movement.
+        record (bool): Whether to record the change in the ledger; False when the shards are
+                       reset to the ledger itself (`reconcile_stock --fix`).
+
+    Returns:
+        bool: False if the product is not sharded, in which case nothing was changed.
+    """
+    with transaction.atomic():
+        shards = list(
+            StockShard.objects.select_for_update()
+            .filter(product_id=product_id)
+            .order_by("index")
+        )
+        if not shards:
+            return False
+        previous = sum(shard.quantity for shard in shards)
+        _write_shards(product_id, shards, len(shards), total)
+        Product.objects.filter(pk=product_id).update(stock_quantity=total)
+        if record:
+            record_movements({product_id: total - previous}, reason, reference)
+    invalidate_cache(CATALOG_NAMESPACE)
+    return True
+
+
+def rebalance_shards(product_ids=None):
+    """
+    Even out the shards of sharded products and refresh their cached `stock_quantity`.
+
+    Shards drift apart as random takes drain some faster than others; a drained shard only costs
+    a retry, but once most are drained takes fall back to locking every shard. Each product is
+    rebalanced in its own short transaction, and only when its shards differ by more than one
+    unit; the cached total is only written when it changed.
+
+    Args:
+        product_ids (iterable): The products to rebalance (every sharded product when None).
+
+    Returns:
+        int: The number of products whose shards were rewritten.
+    """
+    if product_ids is None:
+        product_ids = StockShard.objects.values_list("product_id", flat=True).distinct()
+    rebalanced = 0
+    for product_id in sorted(set(product_ids)):
+        with transaction.atomic():
+            product = (
+                Product.objects.select_for_update(no_key=True)
+                .only("pk", "stock_quantity")
+                .filter(pk=product_id)
+                .first()
+            )
+            shards = list(
+                StockShard.objects.select_for_update()
+                .filter(product_id=product_id)
+                .order_by("index")
+            )
+            if product is None or not shards:
+                continue
+            quantities = [shard.quantity for shard in shards]
+            total = sum(quantities)
+            if max(quantities) - min(quantities) > 1:
+                _write_shards(product_id, shards, len(shards), total)
+                rebalanced += 1
+            if product.stock_quantity != total:
+                Product.objects.filter(pk=product_id).update(stock_quantity=total)
+    return rebalanced
@@ -1,3 +1,6 @@
+from unittest import mock
+
+from django.forms import ValidationError
 from django.test import TestCase
 
 from product.models.category import Category
@@ -51,3 +54,70 @@ class CategoryModelTest(TestCase):
         self.assertEqual(str(self.electronics), "Electronics")
         self.assertEqual(str(self.fashion), "Fashion")
         self.assertEqual(str(self.phones), "Phones")
+
+
+class CategoryPathTest(TestCase):
+    def setUp(self):
+        self.electronics = Category.objects.create(name="Electronics")
+        self.computers = Category.objects.create(
+            name="Computers", parent_category=self.electronics
+        )
+        self.laptops = Category.objects.create(
+            name="Laptops", parent_category=self.computers
+        )
+        self.gaming = Category.objects.create(
+            name="Gaming Laptops", parent_category=self.laptops
+        )
+        self.fashion = Category.objects.create(name="Fashion")
+
+    def test_paths_on_create(self):
+        """Test that new categories get their materialized path."""
+        self.assertEqual(self.electronics.path, f"/{self.electronics.pk}/")
+        self.assertEqual(
+            self.gaming.path,
+            f"/{self.electronics.pk}/{self.computers.pk}/{self.laptops.pk}/{self.gaming.pk}/",
+        )
+
+    def test_get_descendants(self):
+        """Test that descendants at any depth are returned."""
+        self.assertEqual(
+            set(self.electronics.get_descendants()),
+            {self.computers, self.laptops, self.gaming},
+        )
+
+    def test_reparent_updates_descendant_paths(self):
+        """Test that moving a subtree rewrites the paths below it."""
+        self.computers.parent_category = self.fashion
+        self.computers.save()
+
+        self.gaming.refresh_from_db()
+        self.assertEqual(
+            self.gaming.path,
+            f"/{self.fashion.pk}/{self.computers.pk}/{self.laptops.pk}/{self.gaming.pk}/",
+        )
+        self.assertEqual(set(self.electronics.get_descendants()), set())
+
+        self.computers.parent_category = None
+        self.computers.save()
+        self.laptops.refresh_from_db()
+        self.assertEqual(self.laptops.path, f"/{self.computers.pk}/{self.laptops.pk}/")
+
+    def test_rename_keeps_paths(self):
+        """Test that saving a category without moving it does not recompute any path."""
+        laptops = Category.objects.get(pk=self.laptops.pk)
+        laptops.name = "Notebooks"
+        with mock.patch.object(Category, "build_path") as build_path:
+            laptops.save()
+        build_path.assert_not_called()
+        self.assertEqual(laptops.path, self.laptops.path)
+
+    def test_cannot_move_under_descendant(self):
+        """Test that a category cannot become a child of its own descendant."""
+        self.electronics.parent_category = self.gaming
+        with self.assertRaises(ValidationError):
+            self.electronics.save()
+
+    def test_delete_removes_subtree(self):
+        """Test that deleting a category deletes its descendants."""
+        self.computers.delete()
+        self.assertFalse(Category.objects.filter(pk=self.gaming.pk).exists())
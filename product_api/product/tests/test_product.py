@@ -59,3 +59,51 @@ class ProductModelTest(TestCase):
             stock_quantity=5,
         )
         self.assertEqual(product_without_category.categories.count(), 0)
+
+
+class ProductFieldTrackingTest(TestCase):
+    def setUp(self):
+        Product.objects.create(
+            name="Tracked", description="Before", price=10, stock_quantity=5
+        )
+        self.product = Product.objects.get(name="Tracked")
+
+    def test_changed_fields(self):
+        """Test that only fields changed since loading are reported, with their old values."""
+        self.assertEqual(self.product.get_changed_fields(), {})
+        self.product.stock_quantity = 8
+        self.product.description = "After"
+        self.assertEqual(
+            self.product.get_changed_fields(),
+            {"stock_quantity": 5, "description": "Before"},
+        )
+        self.assertTrue(self.product.has_changed("stock_quantity"))
+        self.assertFalse(self.product.has_changed("name"))
+
+    def test_snapshot_is_replaced_on_save(self):
+        """Test that a save makes the saved values the new originals."""
+        self.product.stock_quantity = 8
+        self.product.save()
+        self.assertEqual(self.product.get_changed_fields(), {})
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.product.get_original_values("stock_quantity"),
+                {"stock_quantity": 8},
+            )
+
+    def test_refresh_from_db_updates_snapshot(self):
+        """Test that refreshing takes a new snapshot of the refreshed fields."""
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=2)
+        self.product.refresh_from_db()
+        self.assertEqual(
+            self.product.get_original_values("stock_quantity"), {"stock_quantity": 2}
+        )
+
+    def test_deferred_fields_are_read_once(self):
+        """Test that originals of deferred fields are read from the database when asked for."""
+        product = Product.objects.only("pk", "name").get(pk=self.product.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                product.get_original_values("name", "price", "stock_quantity"),
+                {"name": "Tracked", "price": 10, "stock_quantity": 5},
+            )
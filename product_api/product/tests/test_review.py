@@ -32,6 +32,15 @@ class ReviewModelTest(TestCase):
         self.assertEqual(review.rating, 5)
         self.assertEqual(review.comment, "Excellent product!")
 
+    def test_rating_change_is_tracked(self):
+        """Test that a changed rating is reported with its previous value."""
+        Review.objects.create(
+            user=self.user, product=self.product, rating=2, comment="Meh."
+        )
+        review = Review.objects.get(user=self.user, product=self.product)
+        review.rating = 4
+        self.assertEqual(review.get_changed_fields(), {"rating": 2})
+
     def test_str_representation(self):
         """Test the string representation of the review."""
         review = Review.objects.create(
@@ -0,0 +1,133 @@
+import importlib
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from product.models.category import Category
+from product.models.product import Product
+from product.models.product_search import ProductSearchTerm
+from product.search import search_products, tokenize
+
+
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.laptops = Category.objects.create(name="Laptops")
+        self.gaming_laptop = Product.objects.create(
+            name="Gaming Laptop",
+            description="A fast laptop with a dedicated graphics card.",
+            price=1500,
+            stock_quantity=3,
+        )
+        self.gaming_laptop.categories.add(self.laptops)
+        self.office_laptop = Product.objects.create(
+            name="Office Notebook",
+            description="Light and quiet, ideal for spreadsheets.",
+            price=700,
+            stock_quantity=5,
+        )
+        self.office_laptop.categories.add(self.laptops)
+        self.mouse = Product.objects.create(
+            name="Gaming Mouse",
+            description="Pairs well with any laptop.",
+            price=50,
+            stock_quantity=10,
+        )
+
+    def search(self, query):
+        results = search_products(Product.objects.all(), query)
+        return list(results.order_by("-search_rank", "pk"))
+
+    def test_tokenize(self):
+        """Test that text is lower-cased and stop words and one-letter tokens are dropped."""
+        self.assertEqual(
+            tokenize("The Gaming-Laptop, a 2nd PC!"), ["gaming", "laptop", "2nd", "pc"]
+        )
+
+    def test_ranks_name_matches_first(self):
+        """Test that a name match outranks category and description matches."""
+        self.assertEqual(
+            self.search("laptop"),
+            [self.gaming_laptop, self.office_laptop, self.mouse],
+        )
+
+    def test_description_is_searched(self):
+        """Test that terms that only appear in the description are found."""
+        self.assertEqual(self.search("spreadsheets"), [self.office_laptop])
+
+    def test_more_matching_terms_rank_higher(self):
+        """Test that a product matching every query term comes first."""
+        self.assertEqual(self.search("gaming laptop")[0], self.gaming_laptop)
+
+    def test_no_match(self):
+        """Test that unknown or stop-word-only queries return nothing."""
+        self.assertEqual(self.search("tablet"), [])
+        self.assertEqual(self.search("the and"), [])
+
+    def test_index_updates_on_product_save(self):
+        """Test that renaming a product updates its postings."""
+        self.mouse.name = "Wireless Trackball"
+        self.mouse.save()
+        self.assertEqual(self.search("trackball"), [self.mouse])
+        self.assertNotIn(self.mouse, self.search("mouse"))
+
+    def test_index_updates_on_category_changes(self):
+        """Test that category assignments and renames update the postings."""
+        accessories = Category.objects.create(name="Accessories")
+        self.mouse.categories.add(accessories)
+        self.assertEqual(self.search("accessories"), [self.mouse])
+
+        accessories.name = "Peripherals"
+        accessories.save()
+        self.assertEqual(self.search("peripherals"), [self.mouse])
+        self.assertEqual(self.search("accessories"), [])
+
+        accessories.delete()
+        self.assertEqual(self.search("peripherals"), [])
+
+    def test_category_saves_reindex_only_on_rename(self):
+        """Test that only renaming a category reindexes its products."""
+        self.mouse.categories.add(self.laptops)
+        other = Category.objects.create(name="Computers")
+        with mock.patch("product.signals.index_products") as index_products:
+            self.laptops.parent_category = other
+            self.laptops.save()
+            index_products.assert_not_called()
+            self.laptops.name = "Notebooks"
+            self.laptops.save()
+            index_products.assert_called_once()
+
+    def test_postings_removed_with_product(self):
+        """Test that deleting a product deletes its postings."""
+        product_id = self.mouse.id
+        self.mouse.delete()
+        self.assertFalse(
+            ProductSearchTerm.objects.filter(product_id=product_id).exists()
+        )
+
+    def test_rebuild_search_index_command(self):
+        """Test that the rebuild command restores a wiped index."""
+        ProductSearchTerm.objects.all().delete()
+        call_command(
+            "rebuild_search_index", batch_size=2, stdout=open("/dev/null", "w")
+        )
+        self.assertEqual(self.search("spreadsheets"), [self.office_laptop])
+
+    def test_migration_indexes_existing_products(self):
+        """Test that the backfill migration indexes the products created before the index."""
+        migration = importlib.import_module(
+            "product.migrations.0011_backfill_product_search_terms"
+        )
+        postings = set(
+            ProductSearchTerm.objects.values_list("product_id", "term", "weight")
+        )
+        ProductSearchTerm.objects.all().delete()
+        migration.index_existing_products(apps, None, batch_size=2)
+        self.assertEqual(
+            set(ProductSearchTerm.objects.values_list("product_id", "term", "weight")),
+            postings,
+        )
+        self.assertEqual(self.search("spreadsheets"), [self.office_laptop])
@@ -0,0 +1,317 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from product.models.product import Product
+from product.models.stock_ledger import StockMovement, StockSnapshot
+from product.stock import (
+    compact_ledger,
+    decrement_stock,
+    decrement_stocks,
+    get_ledger_stock,
+    get_sharded_stock,
+    increment_stock,
+    rebalance_shards,
+    return_stock,
+    shard_stock,
+    take_stock,
+)
+
+
+class StockAdjustmentTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name="Stocked", price=10, stock_quantity=5
+        )
+
+    def test_decrement_stock(self):
+        """Test that stock is taken when enough is left."""
+        self.assertTrue(decrement_stock(self.product.pk, 3))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 2)
+
+    def test_decrement_stock_insufficient(self):
+        """Test that a decrement larger than the stock changes nothing."""
+        self.assertFalse(decrement_stock(self.product.pk, 6))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 5)
+
+    def test_decrement_stock_is_single_update(self):
+        """
+        Test that the decrement is one conditional UPDATE plus a ledger insert, without reading
+        the row first.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            decrement_stock(self.product.pk, 1)
+        statements = [
+            query["sql"].split()[0]
+            for query in queries
+            if "SAVEPOINT" not in query["sql"]
+        ]
+        self.assertEqual(statements, ["UPDATE", "INSERT"])
+
+    def test_increment_stock(self):
+        """Test that stock is returned."""
+        increment_stock(self.product.pk, 4)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 9)
+
+    def test_movements_are_recorded(self):
+        """Test that every adjustment appends a movement to the ledger."""
+        other = Product.objects.create(name="Other", price=10, stock_quantity=5)
+        decrement_stock(self.product.pk, 2, StockMovement.ORDER, "order:1")
+        decrement_stocks(
+            {self.product.pk: 1, other.pk: 3}, StockMovement.ORDER, "order:2"
+        )
+        increment_stock(self.product.pk, 1, StockMovement.ORDER_CANCEL, "order:1")
+        decrement_stock(self.product.pk, 50, StockMovement.ORDER, "order:3")  # rejected
+
+        movements = StockMovement.objects.filter(reference__startswith="order:")
+        self.assertEqual(
+            list(
+                movements.order_by("pk").values_list("product_id", "delta", "reference")
+            ),
+            [
+                (self.product.pk, -2, "order:1"),
+                (self.product.pk, -1, "order:2"),
+                (other.pk, -3, "order:2"),
+                (self.product.pk, 1, "order:1"),
+            ],
+        )
+
+    def test_product_edits_are_recorded(self):
+        """Test that the initial stock and stock edits through save() are adjustments."""
+        self.product.stock_quantity = 8
+        self.product.save()
+        self.product.price = 12
+        self.product.save()
+        self.assertEqual(
+            list(
+                self.product.stock_movements.order_by("pk").values_list(
+                    "delta", "reason", "reference"
+                )
+            ),
+            [(5, "adjustment", "created"), (3, "adjustment", "edited")],
+        )
+
+    def test_stale_save_keeps_concurrent_takes(self):
+        """Test that saving a stale product applies its stock edit as a difference."""
+        stale = Product.objects.get(pk=self.product.pk)
+        decrement_stock(self.product.pk, 2)
+        stale.price = 12
+        stale.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 3)
+
+        stale.stock_quantity = 8
+        stale.save()
+        self.assertEqual(stale.stock_quantity, 6)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 6)
+        self.assertEqual(self.product.price, 12)
+        self.assertEqual(get_ledger_stock()[self.product.pk], 6)
+
+        stale.stock_quantity = (
+            0  # Loaded as 6 now: empties the stock, never below zero.
+        )
+        decrement_stock(self.product.pk, 4)
+        stale.save()
+        self.assertEqual(stale.stock_quantity, 0)
+        self.assertEqual(get_ledger_stock()[self.product.pk], 0)
+
+
+@skipIf(
+    connection.vendor == "sqlite",
+    "SQLite's shared in-memory test database locks whole tables across concurrent transactions.",
+)
+class StockConcurrencyTest(TransactionTestCase):
+    threads = 20
+    stock = 7
+
+    def setUp(self):
+        self.product = Product.objects.create(
+            name="Contended", price=10, stock_quantity=self.stock
+        )
+
+    def test_concurrent_decrements_never_oversell(self):
+        """
+        Test that many threads buying the same product at once take exactly the available stock.
+        """
+        barrier = threading.Barrier(self.threads)
+        results = []
+        errors = []
+
+        def buy():
+            try:
+                barrier.wait()
+                results.append(decrement_stock(self.product.pk, 1))
+            except Exception as exc:  # surfaced by the assertions below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=buy) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results.count(True), self.stock)
+        self.assertEqual(results.count(False), self.threads - self.stock)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+
+
+class StockLedgerTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name="Ledger", price=10, stock_quantity=20
+        )
+        decrement_stock(self.product.pk, 5, StockMovement.ORDER, "order:1")
+        increment_stock(self.product.pk, 2, StockMovement.ORDER_CANCEL, "order:1")
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command("reconcile_stock", *args, stdout=out)
+        return out.getvalue()
+
+    def test_ledger_matches_stock(self):
+        """Test that the ledger recomputes the current stock."""
+        self.assertEqual(get_ledger_stock()[self.product.pk], 17)
+        self.assertIn("Stock matches the ledger.", self.reconcile())
+
+    def test_compaction_keeps_balance(self):
+        """Test that snapshots fold old movements without changing the recomputed stock."""
+        call_command("snapshot_stock", keep_days=0, stdout=StringIO())
+        self.assertFalse(StockMovement.objects.exists())
+        self.assertEqual(StockSnapshot.objects.get(product=self.product).quantity, 17)
+
+        decrement_stock(self.product.pk, 7, StockMovement.ORDER, "order:2")
+        self.assertEqual(get_ledger_stock()[self.product.pk], 10)
+
+        compact_ledger(timezone.now() + timedelta(seconds=1))
+        self.assertEqual(StockSnapshot.objects.get(product=self.product).quantity, 10)
+        self.assertIn("Stock matches the ledger.", self.reconcile())
+
+    def test_compaction_keeps_recent_movements(self):
+        """Test that movements newer than the retention window are kept."""
+        call_command("snapshot_stock", keep_days=30, stdout=StringIO())
+        self.assertEqual(self.product.stock_movements.count(), 3)
+
+    def test_drift_is_reported_and_fixed(self):
+        """Test that stock changed behind the ledger's back is reported and can be reset."""
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=30)
+
+        self.assertIn("ledger 17, drift +13", self.reconcile())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 30)
+
+        self.reconcile("--fix")
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 17)
+
+    def test_reconcile_in_batches(self):
+        """Test that every batch of products is checked against its own ledger."""
+        other = Product.objects.create(name="Other", price=10, stock_quantity=8)
+        self.assertEqual(get_ledger_stock([other.pk]), {other.pk: 8})
+        Product.objects.filter(pk=other.pk).update(stock_quantity=6)
+
+        output = self.reconcile("--batch-size", "1", "--fix")
+        self.assertIn(f"Product {other.pk} (Other): stock 6, ledger 8", output)
+        self.assertIn("Reset 1 products to the ledger.", output)
+        other.refresh_from_db()
+        self.assertEqual(other.stock_quantity, 8)
+
+
+class StockShardTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name="Sharded", price=10, stock_quantity=10
+        )
+        shard_stock(self.product.pk, 4)
+
+    def quantities(self):
+        return list(
+            self.product.stock_shards.order_by("index").values_list(
+                "quantity", flat=True
+            )
+        )
+
+    def test_stock_is_split_evenly(self):
+        """Test that sharding spreads the stock across the shards."""
+        self.assertEqual(self.quantities(), [3, 3, 2, 2])
+        self.assertEqual(get_sharded_stock([self.product.pk]), {self.product.pk: 10})
+
+    def test_take_from_one_shard(self):
+        """Test that a take decrements a single shard and is recorded in the ledger."""
+        self.assertTrue(take_stock(self.product.pk, 2, StockMovement.ORDER, "order:1"))
+        self.assertEqual(sum(self.quantities()), 8)
+        self.assertEqual(get_ledger_stock()[self.product.pk], 8)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 10)
+
+    def test_take_falls_back_to_siblings(self):
+        """Test that a take larger than any shard is spread across several shards."""
+        self.assertTrue(take_stock(self.product.pk, 7))
+        self.assertEqual(sum(self.quantities()), 3)
+        self.assertFalse(take_stock(self.product.pk, 4))
+        self.assertEqual(sum(self.quantities()), 3)
+
+    def test_return_and_rebalance(self):
+        """Test that returned stock lands in a shard and rebalancing evens the shards out."""
+        take_stock(self.product.pk, 7)
+        return_stock(self.product.pk, 5)
+        self.assertEqual(sum(self.quantities()), 8)
+
+        rebalance_shards()
+        self.assertEqual(self.quantities(), [2, 2, 2, 2])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 8)
+
+    def test_rebalance_refreshes_cached_total(self):
+        """Test that rebalancing refreshes the cached total even when the shards are even."""
+        take_stock(self.product.pk, 2)
+        rebalance_shards()
+        take_stock(self.product.pk, 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 8)
+
+        self.assertEqual(rebalance_shards(), 0)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 7)
+
+    def test_product_edit_sets_shards(self):
+        """Test that editing the stock of a sharded product resets its shards."""
+        take_stock(self.product.pk, 4)
+        self.product.refresh_from_db()
+        self.product.stock_quantity = 20
+        self.product.save()
+        self.assertEqual(self.quantities(), [5, 5, 5, 5])
+        self.assertEqual(get_ledger_stock()[self.product.pk], 20)
+
+    def test_unshard_folds_back(self):
+        """Test that turning sharding off moves the shard total back to the product."""
+        take_stock(self.product.pk, 3)
+        self.assertEqual(shard_stock(self.product.pk, 0), 7)
+        self.assertFalse(self.product.stock_shards.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 7)
+
+    def test_reconcile_uses_shard_total(self):
+        """Test that reconciliation compares the ledger with the shard total."""
+        take_stock(self.product.pk, 3)
+        out = StringIO()
+        call_command("reconcile_stock", stdout=out)
+        self.assertIn("Stock matches the ledger.", out.getvalue())
+
+        self.product.stock_shards.filter(index=0).update(quantity=50)
+        call_command("reconcile_stock", "--fix", stdout=StringIO())
+        self.assertEqual(sum(self.quantities()), 7)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import importlib.util
 import os
 from datetime import timedelta
 from pathlib import Path
@@ -107,6 +108,62 @@ else:
             'PORT': config('DB_PORT', default='5432'),
         }
     }
+# Cache
+# The cache holds the cached API responses and the versions of their namespaces (see
+# product.cache), so invalidation only reaches every gunicorn worker when the cache is shared:
+# set REDIS_URL in production. Without it each process has its own local-memory cache and, after
+# a write, the other workers serve their cached catalog pages until API_RESPONSE_CACHE_TIMEOUT
+# runs out, which is kept short for that reason.
+REDIS_URL = config("REDIS_URL", default="")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "product-api",
+        }
+    }
+
+# Lifetime (seconds) of cached API responses; they are also invalidated on every catalog change.
+API_RESPONSE_CACHE_TIMEOUT = 300 if REDIS_URL else 30
+
+# Idempotency-Key handling for unsafe order/wishlist requests (see apis.mixins.IdempotentMixin):
+# seconds a completed key is kept, a duplicate waits for the in-flight request, and an in-flight
+# key is held before it is considered abandoned.
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+# Seconds an unpaid order holds its stock (see order.reservations).
+STOCK_RESERVATION_TTL = 15 * 60
+
+# Days after their last update that closed orders are moved to the archive (see order.archive).
+ORDER_ARCHIVE_AFTER_DAYS = 180
+
+# Seconds the incremental sales rollup refresh re-reads before its last position, so orders
+# committed late by long transactions are not missed (see order.rollups).
+SALES_ROLLUP_OVERLAP = 10 * 60
+
+# Password hashing executor for the auth endpoints (see users.hashing): hashes admitted at once
+# across the workers sharing the cache, hashing threads per process, and seconds a request waits
+# for its hash. The admission slots live in the cache, so they only span the gunicorn workers
+# with REDIS_URL set. The limit stays below the worker count (gunicorn reads WEB_CONCURRENCY
+# too), so a burst of logins always leaves a sync worker free for other requests.
+AUTHENTICATION_BACKENDS = ["users.backends.HashingExecutorBackend"]
+WEB_CONCURRENCY = config("WEB_CONCURRENCY", default=2, cast=int)
+PASSWORD_HASHING_MAX_CONCURRENT = config(
+    "PASSWORD_HASHING_MAX_CONCURRENT", default=max(1, WEB_CONCURRENCY - 1), cast=int
+)
+PASSWORD_HASHING_THREADS = 2
+PASSWORD_HASHING_TIMEOUT = 10
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -157,7 +214,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         # "rest_framework.permissions.IsAuthenticatedOrReadOnly",
@@ -166,8 +223,36 @@ REST_FRAMEWORK = {
     # pagination
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     "PAGE_SIZE": 3,
+    # orjson-backed JSON rendering/parsing (see apis/renderers.py and apis/parsers.py)
+    "DEFAULT_RENDERER_CLASSES": [
+        "apis.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "apis.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    # token-bucket rate limits of the views with a throttle_scope (see apis/throttling.py)
+    "DEFAULT_THROTTLE_CLASSES": ["apis.throttling.TokenBucketThrottle"],
+}
+
+# Rate limits per "<throttle_scope>.<action>", per authenticated user and/or client address. The
+# buckets live in the cache, so they only span the gunicorn workers with REDIS_URL set.
+RATE_LIMITS = {
+    "token.post": {"ip": "20/min"},
+    "register.create": {"ip": "10/min"},
+    "orders.create": {"user": "30/min", "ip": "120/min"},
+    "orders.checkout": {"user": "30/min", "ip": "120/min"},
 }
 
+# MessagePack is optional; when installed, clients can send `Accept: application/msgpack`
+if importlib.util.find_spec("msgpack") is not None:
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].insert(
+        1, "apis.renderers.MessagePackRenderer"
+    )
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"].insert(1, "apis.parsers.MessagePackParser")
+
 # SIMPLE_JWT = {
 #     "ACCESS_TOKEN_LIFETIME": timedelta(days=10),
 # }
@@ -176,8 +261,24 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": True,  # This ensures refresh tokens are rotated after use
     "BLACKLIST_AFTER_ROTATION": True,  # Blacklist refresh tokens after rotation
+    # Stamps the token version and user flags into tokens (see users.authentication)
+    "TOKEN_OBTAIN_SERIALIZER": "apis.serializers.user_serializer.UserTokenObtainPairSerializer",
+    # Checks the refresh token blacklist through an in-memory filter (see users.blacklist)
+    "TOKEN_REFRESH_SERIALIZER": "apis.serializers.user_serializer.FilteredTokenRefreshSerializer",
 }
 
+# Seconds an authenticated user is cached by users.authentication.CachedJWTAuthentication;
+# saving the user evicts it sooner.
+JWT_USER_CACHE_TIMEOUT = 60
+
+# The refresh token blacklist filter of users.blacklist: whether it is used (it needs the cache
+# shared by every worker, so that a token blacklisted by one worker is seen by the others;
+# without it every refresh queries the blacklist table), seconds between full rebuilds, and its
+# false positive rate.
+TOKEN_BLACKLIST_FILTER_SHARED = bool(REDIS_URL)
+TOKEN_BLACKLIST_FILTER_REBUILD = 10 * 60
+TOKEN_BLACKLIST_FILTER_ERROR_RATE = 0.01
+
 AUTH_USER_MODEL = "users.CustomUser"
 
 APPEND_SLASH = False
@@ -10,6 +10,7 @@ Attributes:
     - default_auto_field: Sets the default type for auto-incrementing primary keys to 'BigAutoField',
       which uses a 64-bit integer to represent unique IDs.
     - name: Defines the name of the app as 'users', which is used to identify the app within the Django project.
+    - ready: Connects the receivers in `users.signals` that evict cached users.
 
 This configuration class ensures that Django correctly initializes and manages the 'users' app during startup.
 """
@@ -18,3 +19,6 @@ This configuration class ensures that Django correctly initializes and manages t
 class UsersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "users"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication,
+    JWTStatelessUserAuthentication,
+)
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+"""
+JWT authentication without a user query per request.
+
+`JWTAuthentication` loads the user row on every authenticated request just to set
+`request.user`. The classes here avoid that:
+
+    - `CachedJWTAuthentication` resolves the user through the default cache (per process with the
+      local-memory cache, shared with Redis or Memcached), keyed by user id and token version,
+      for `JWT_USER_CACHE_TIMEOUT` seconds. Saving or deleting a user evicts its entries, now and
+      again once the transaction commits, so deactivations and permission changes take effect on
+      the next request. Changes made with `QuerySet.update()` send no signals and are picked up
+      when the entry expires.
+    - `TokenClaimsAuthentication` builds a lightweight `TokenUser` from the token claims alone,
+      with no query and no cache lookup, for stateless endpoints that only need the user id.
+      Those claims are as old as the token and the token version is not checked, so it must not
+      guard staff-only endpoints: a demoted user or a revoked token would keep its access until
+      the token expires.
+
+The token version is `CustomUser.token_version`, stamped into tokens as the `token_version`
+claim at login (see `apis.serializers.user_serializer.UserTokenObtainPairSerializer`); tokens
+without the claim count as version 0. Changing a password bumps the version, so every token
+issued before the change is rejected.
+
+Functions:
+    - user_cache_key(user_id, version): The cache key of a user resolved for a token version.
+    - evict_cached_user(user): Remove a user's cached entries, now and after commit.
+"""
+
+TOKEN_VERSION_CLAIM = "token_version"
+# The claims stamped into tokens at login, which `TokenClaimsAuthentication` relies on.
+USER_CLAIMS = ("username", "is_staff", "is_superuser", TOKEN_VERSION_CLAIM)
+
+
+def user_cache_key(user_id, version):
+    return f"jwt-user:{user_id}:{version}"
+
+
+def _evict(user_id, versions):
+    cache.delete_many([user_cache_key(user_id, version) for version in versions])
+
+
+def evict_cached_user(user):
+    """
+    Remove the cached entries of `user` for its current and previous token version.
+
+    The entries are removed immediately and once more after the surrounding transaction commits,
+    so a request that re-cached the user from pre-commit data cannot leave a stale entry behind.
+    """
+    versions = {user.token_version, max(user.token_version - 1, 0)}
+    _evict(user.pk, versions)
+    transaction.on_commit(lambda: _evict(user.pk, versions))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    `JWTAuthentication` that resolves users from the cache.
+
+    A cache miss loads the user like `JWTAuthentication` does (rejecting unknown and inactive
+    users), checks that the token version is still current and caches the user.
+
+    Methods:
+        get_user(validated_token): Return the cached user for the token, loading it on a miss.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        version = validated_token.get(TOKEN_VERSION_CLAIM, 0)
+        key = user_cache_key(user_id, version)
+
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            if user.token_version != version:
+                raise AuthenticationFailed(
+                    _("Token has been revoked."), code="token_revoked"
+                )
+            cache.set(key, user, getattr(settings, "JWT_USER_CACHE_TIMEOUT", 60))
+        return user
+
+
+class TokenClaimsAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticate with a `TokenUser` built from the token claims, without any lookup.
+
+    Only tokens issued at login carry the `username`, `is_staff` and `is_superuser` claims; a
+    token without them is rejected rather than treated as a non-staff user.
+
+    Methods:
+        get_user(validated_token): Return a `TokenUser` backed by the token.
+    """
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            raise InvalidToken(_("Token contained no user claims"))
+        return super().get_user(validated_token)
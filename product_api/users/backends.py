@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from users.hashing import hash_password, verify_password
+
+"""
+Authentication backend that hashes on the password hashing executor.
+
+`HashingExecutorBackend` behaves like Django's `ModelBackend` (which it replaces in
+`AUTHENTICATION_BACKENDS`), but the password check, the dummy hash run for unknown users (so
+their response time does not reveal that the account does not exist) and the upgrade of outdated
+hashes all run on the bounded executor of `users.hashing`. The user is read and saved on the
+request thread.
+
+Only requests marked `hashing_admission` by the API views that answer a rejected hash (see
+`apis.mixins.HashingAdmissionMixin`) go through the executor. Every other caller, such as the
+admin login, hashes inline exactly like `ModelBackend`, so it never fails with an unhandled
+`HashingOverloaded`.
+
+Exceptions:
+    - `users.hashing.HashingOverloaded`: Propagates when the hash of an API request is not
+      admitted; the token endpoint answers it with 503.
+"""
+
+
+class HashingExecutorBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if not getattr(request, "hashing_admission", False):
+            return super().authenticate(request, username, password, **kwargs)
+
+        user_model = get_user_model()
+        if username is None:
+            username = kwargs.get(user_model.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = user_model._default_manager.get_by_natural_key(username)
+        except user_model.DoesNotExist:
+            hash_password(password)
+            return None
+
+        correct, outdated = verify_password(password, user.password)
+        if not correct or not self.user_can_authenticate(user):
+            return None
+        if outdated:
+            user.password = hash_password(password)
+            user.save(update_fields=["password"])
+        return user
@@ -0,0 +1,271 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+"""
+Refresh token blacklist checks through an in-memory Bloom filter.
+
+With `ROTATE_REFRESH_TOKENS` and `BLACKLIST_AFTER_ROTATION`, every refresh blacklists the token
+it was given, so `BlacklistedToken` grows with every refresh and every logout, and every refresh
+starts by looking its token up in it. `FilteredRefreshToken` first asks a Bloom filter of the
+blacklisted token ids (jti) kept by each process:
+
+    - A jti that is not in the filter is not blacklisted, and the refresh runs no blacklist query.
+    - A jti that is in the filter is confirmed with the usual query, since a Bloom filter has
+      false positives (`TOKEN_BLACKLIST_FILTER_ERROR_RATE` of the tokens that were never
+      blacklisted).
+
+The filter is only used with `TOKEN_BLACKLIST_FILTER_SHARED`, which requires a cache shared by
+every worker (Redis, i.e. `REDIS_URL`; the setting defaults to whether it is set). A worker's
+filter cannot see tokens blacklisted by other workers on its own, as the generation counter of a
+local-memory cache is per process, and a refresh token replayed on another worker must still be
+rejected. Without a shared cache every check therefore queries the table directly, as
+simplejwt's own check does.
+
+Keeping the filter complete:
+
+    - Tokens blacklisted by this process are added at once (see `users.signals`), and bump a
+      generation counter in the shared cache once committed. A bump that only moves the counter
+      past the generation this process has applied is applied at once: the filter already holds
+      the token.
+    - Before every check, the filter reads the rows added since its last read when the
+      generation counter moved past the one it applied, i.e. another worker blacklisted a token.
+      The read is incremental: the rows past the last id read, plus the ids skipped within the
+      last `SYNC_OVERLAP` ids, which may belong to transactions that committed out of id order.
+      A token blacklisted by any worker is therefore seen by the next check on every worker.
+      The only window left is between the commit of a blacklisting transaction and its
+      generation bump, which runs right after the commit.
+    - A missing counter (never set, or evicted) means bumps may have been lost: the check then
+      queries the table, and the counter is restored.
+    - Entries cannot be removed from a Bloom filter, so it is rebuilt from the unexpired
+      blacklisted tokens every `TOKEN_BLACKLIST_FILTER_REBUILD` seconds, and sooner once it holds
+      more tokens than it was sized for. Expired tokens are rejected before the blacklist check,
+      so they are left out. The new filter is built outside the lock and swapped in, so other
+      checks do not wait for the rebuild.
+
+The tables themselves are pruned by the `prune_tokens` management command.
+
+Classes:
+    - BloomFilter: A fixed-size Bloom filter of strings.
+    - FilteredRefreshToken: `RefreshToken` whose blacklist check goes through the filter.
+
+Functions:
+    - is_blacklisted(jti): Whether the refresh token with this jti is blacklisted.
+    - note_blacklisted(blacklisted_token): Add a newly blacklisted token to the filter.
+    - rebuild_blacklist_filter(): Rebuild the filter of this process from the database.
+"""
+
+GENERATION_KEY = "token-blacklist:generation"
+SYNC_OVERLAP = 100
+MIN_CAPACITY = 10000
+
+
+class BloomFilter:
+    """
+    A Bloom filter of strings, sized for `capacity` items at `error_rate` false positives.
+
+    Attributes:
+        capacity (int): The number of items the filter was sized for.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1)
+        self._size = max(
+            8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self._hashes = max(1, round(self._size / self.capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: the k positions are derived from two 64-bit halves of one digest.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big") | 1
+        return [(first + i * second) % self._size for i in range(self._hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+_lock = threading.Lock()
+_filter = None
+_last_id = 0
+# Ids within `SYNC_OVERLAP` of `_last_id` that were not found, e.g. of uncommitted transactions.
+_gaps = frozenset()
+# The number of tokens the filter held when built, and the last id then.
+_built_count = 0
+_built_last_id = 0
+# Ids within `SYNC_OVERLAP` of `_last_id` that were not found, e.g. of uncommitted transactions.
+_gaps = frozenset()
+_generation = None
+_built_at = 0.0
+_rebuilding = False
+
+
+def _build():
+    # Runs without the lock: the generation is read before the rows, so tokens blacklisted while
+    # the filter is built move it, and the first sync after the swap catches up with them.
+    cache.add(GENERATION_KEY, 0, None)
+    generation = cache.get(GENERATION_KEY)
+    last_id = BlacklistedToken.objects.aggregate(last=Max("id"))["last"] or 0
+    unexpired = BlacklistedToken.objects.filter(
+        id__lte=last_id, token__expires_at__gt=timezone.now()
+    )
+    count = unexpired.count()
+    bloom = BloomFilter(
+        max(count * 2, MIN_CAPACITY),
+        getattr(settings, "TOKEN_BLACKLIST_FILTER_ERROR_RATE", 0.01),
+    )
+    for jti in unexpired.values_list("token__jti", flat=True).iterator():
+        bloom.add(jti)
+    recent = BlacklistedToken.objects.filter(
+        id__gt=last_id - SYNC_OVERLAP, id__lte=last_id
+    ).values_list("id", flat=True)
+    gaps = frozenset(range(max(last_id - SYNC_OVERLAP, 0) + 1, last_id)) - set(recent)
+    return bloom, last_id, gaps, count, generation
+
+
+def _rebuild_due(now):
+    rebuild_every = getattr(settings, "TOKEN_BLACKLIST_FILTER_REBUILD", 10 * 60)
+    return (
+        _filter is None
+        or now - _built_at >= rebuild_every
+        or _built_count + _last_id - _built_last_id > _filter.capacity
+    )
+
+
+def _catch_up(generation):
+    global _last_id, _gaps, _generation
+    # The new rows, and the skipped ids of transactions that may have committed out of id order.
+    rows = BlacklistedToken.objects.filter(Q(id__gt=_last_id) | Q(id__in=_gaps))
+    found = set()
+    for pk, jti in rows.values_list("id", "token__jti"):
+        _filter.add(jti)
+        found.add(pk)
+    last_id = max(found, default=_last_id)
+    skipped = range(max(_last_id, last_id - SYNC_OVERLAP) + 1, last_id)
+    _gaps = frozenset(
+        pk for pk in _gaps.union(skipped) - found if pk > last_id - SYNC_OVERLAP
+    )
+    _last_id = last_id
+    _generation = generation
+
+
+def _sync():
+    # Returns whether the filter can be trusted, i.e. the generation counter is in the cache.
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Never set, or evicted: bumps may have been lost. Restore it and read the latest rows,
+        # but do not trust the filter for this check.
+        cache.add(GENERATION_KEY, 0, None)
+        _catch_up(None)
+        return False
+    if generation != _generation:
+        _catch_up(generation)
+    return True
+
+
+def rebuild_blacklist_filter():
+    """
+    Rebuild the filter of this process from the database and swap it in.
+
+    The filter is built without holding the lock, so checks keep using the previous filter (or
+    query the table when there is none yet) meanwhile.
+    """
+    global _filter, _last_id, _gaps, _built_count, _built_last_id, _generation, _built_at
+    bloom, last_id, gaps, count, generation = _build()
+    with _lock:
+        _filter, _last_id, _gaps, _generation = bloom, last_id, gaps, generation
+        _built_count, _built_last_id = count, last_id
+        _built_at = time.monotonic()
+
+
+def is_blacklisted(jti):
+    """
+    Return whether the refresh token with this `jti` is blacklisted.
+
+    With `TOKEN_BLACKLIST_FILTER_SHARED`, only a jti found in the filter is looked up in
+    `BlacklistedToken`; without it, or while the filter cannot be trusted, every jti is.
+    """
+    global _rebuilding
+    if not getattr(settings, "TOKEN_BLACKLIST_FILTER_SHARED", False):
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    with _lock:
+        rebuild = not _rebuilding and _rebuild_due(time.monotonic())
+        if rebuild:
+            _rebuilding = True
+    if rebuild:
+        try:
+            rebuild_blacklist_filter()
+        finally:
+            with _lock:
+                _rebuilding = False
+
+    with _lock:
+        trusted = _filter is not None and _sync()
+        candidate = not trusted or jti in _filter
+    return candidate and BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+def _bump_generation(jti=None):
+    global _generation
+    cache.add(GENERATION_KEY, 0, None)
+    try:
+        generation = cache.incr(GENERATION_KEY)
+    except ValueError:
+        return
+    with _lock:
+        if jti is None or _filter is None:
+            return
+        # The filter may have been swapped for one built before the token was committed.
+        _filter.add(jti)
+        if _generation is not None and generation == _generation + 1:
+            # No other worker bumped the counter since: there is nothing to read.
+            _generation = generation
+
+
+def note_blacklisted(blacklisted_token):
+    """
+    Add a newly blacklisted token to the filter, and tell the other workers once committed.
+
+    A token whose transaction rolls back stays in the filter, where it is a false positive until
+    the next rebuild.
+    """
+    jti = blacklisted_token.token.jti
+    with _lock:
+        if _filter is not None:
+            _filter.add(jti)
+    transaction.on_commit(lambda: _bump_generation(jti))
+
+
+class FilteredRefreshToken(RefreshToken):
+    """
+    `RefreshToken` that checks the blacklist through the Bloom filter of `is_blacklisted`.
+
+    Methods:
+        check_blacklist(): Raise `TokenError` if the token is blacklisted.
+    """
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
@@ -0,0 +1,247 @@
+import math
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+
+"""
+Bounded password hashing executor.
+
+Password hashing (PBKDF2 by default) is deliberately slow and CPU-bound. Run inline, a burst of
+logins or registrations occupies every request worker and the catalog reads queue behind it. The
+auth endpoints therefore hash through `run_hashing`:
+
+    - Admission control: a hash is admitted only while one of `PASSWORD_HASHING_MAX_CONCURRENT`
+      slots is free. A slot is a key of the default cache, claimed with an atomic `add` and
+      deleted when the hash finishes; each slot carries its own `SLOT_TIMEOUT` expiry, far longer
+      than any hash, which only matters for slots leaked by a killed worker. The key cannot have
+      expired and been claimed by another request while the claim is younger than its expiry, so
+      a single `delete` frees it; an older claim is left to expire instead. A hash that is not
+      admitted raises `HashingOverloaded` at once, which the API answers with
+      `503 Service Unavailable` and a `Retry-After` header, instead of queueing behind the others.
+    - The slots only bound hashing across workers when the cache is shared by them, i.e. when
+      `REDIS_URL` is set (see the settings); with the local-memory cache each process has its own
+      slots. The limit defaults to one less than the gunicorn worker count (`WEB_CONCURRENCY`),
+      so even with sync workers, which serve one request at a time, a burst of logins never
+      occupies every worker.
+    - Execution: admitted hashes run on a per-process pool of `PASSWORD_HASHING_THREADS` threads,
+      and a caller waits at most `PASSWORD_HASHING_TIMEOUT` seconds for its result. With threaded
+      workers (`gunicorn --worker-class gthread`) the other request threads of the worker keep
+      serving requests meanwhile, since `hashlib.pbkdf2_hmac` releases the GIL; a sync worker
+      waits for the hash either way.
+    - Metrics: the queue depth (admitted hashes waiting for a thread), the hashes in progress,
+      and the queue wait and hashing time of the latest hashes are kept per process (see
+      `get_hashing_metrics` and `GET /api/metrics/hashing/`).
+
+The executor runs no database queries: only the hash itself is offloaded, the user is read and
+saved on the request thread.
+
+Exceptions:
+    - HashingOverloaded: Raised when a hash is not admitted or does not finish in time.
+
+Functions:
+    - run_hashing(func, *args): Run a hashing function on the executor, with admission control.
+    - hash_password(password): `make_password` on the executor.
+    - verify_password(password, encoded): `check_password` on the executor.
+    - get_hashing_metrics(): Queue depth, rejections and latency of this process.
+"""
+
+SLOT_KEY = "password-hashing:slot:{}"
+# A slot expires this long after it was claimed, so slots leaked by a killed worker are eventually
+# given back. Hashes take well under a second; the caller gives up after PASSWORD_HASHING_TIMEOUT.
+SLOT_TIMEOUT = 300
+SLOT_RELEASE_MARGIN = 10
+SAMPLES = 1000
+
+
+class HashingOverloaded(Exception):
+    """
+    Raised when a password hash is not admitted, or not finished within the timeout.
+
+    Attributes:
+        retry_after (int): Seconds after which the client may retry.
+    """
+
+    def __init__(self, retry_after=1):
+        super().__init__("Password hashing is overloaded, retry later.")
+        self.retry_after = retry_after
+
+
+_lock = threading.Lock()
+_executor = None
+_queued = 0
+_running = 0
+_completed = 0
+_rejected = 0
+_waits = deque(maxlen=SAMPLES)
+_durations = deque(maxlen=SAMPLES)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "PASSWORD_HASHING_THREADS", 2),
+                thread_name_prefix="password-hashing",
+            )
+        return _executor
+
+
+def _slot_keys():
+    limit = getattr(settings, "PASSWORD_HASHING_MAX_CONCURRENT", 4)
+    return [SLOT_KEY.format(index) for index in range(limit)]
+
+
+def _acquire_slot():
+    """
+    Claim a free hashing slot and return `(key, claimed_at)`, or None when every slot is taken.
+    """
+    keys = _slot_keys()
+    taken = cache.get_many(keys)
+    free = [key for key in keys if key not in taken]
+    # Start at a random free slot, so concurrent callers rarely race for the same key.
+    random.shuffle(free)
+    token = uuid.uuid4().hex
+    for key in free:
+        claimed_at = time.monotonic()
+        if cache.add(key, token, SLOT_TIMEOUT):
+            return key, claimed_at
+    return None
+
+
+def _release_slot(slot):
+    key, claimed_at = slot
+    # Until its expiry (less a margin for clock drift) the key can only hold our claim.
+    if time.monotonic() - claimed_at < SLOT_TIMEOUT - SLOT_RELEASE_MARGIN:
+        cache.delete(key)
+
+
+def _retry_after():
+    # Roughly the time the threads need to work through the hashes already admitted.
+    threads = getattr(settings, "PASSWORD_HASHING_THREADS", 2)
+    limit = getattr(settings, "PASSWORD_HASHING_MAX_CONCURRENT", 4)
+    average = sum(_durations) / len(_durations) if _durations else 0
+    return max(1, math.ceil(average * limit / threads))
+
+
+def _reject():
+    global _rejected
+    with _lock:
+        _rejected += 1
+        retry_after = _retry_after()
+    raise HashingOverloaded(retry_after)
+
+
+def _run(func, args, slot, submitted):
+    global _queued, _running, _completed
+    started = time.monotonic()
+    with _lock:
+        _queued -= 1
+        _running += 1
+        _waits.append(started - submitted)
+    try:
+        return func(*args)
+    finally:
+        # Freed before the caller gets the result, and also when the caller stopped waiting.
+        _release_slot(slot)
+        with _lock:
+            _running -= 1
+            _completed += 1
+            _durations.append(time.monotonic() - started)
+
+
+def run_hashing(func, *args):
+    """
+    Run `func(*args)` on the hashing executor and return its result.
+
+    Args:
+        func (callable): A CPU-bound hashing function that does not touch the database.
+        *args: Its arguments.
+
+    Raises:
+        HashingOverloaded: The hash was not admitted, or did not finish in time (it still
+                           completes in the background and frees its slot then).
+    """
+    global _queued
+    slot = _acquire_slot()
+    if slot is None:
+        _reject()
+    with _lock:
+        _queued += 1
+    try:
+        future = _get_executor().submit(_run, func, args, slot, time.monotonic())
+    except BaseException:
+        with _lock:
+            _queued -= 1
+        _release_slot(slot)
+        raise
+    try:
+        return future.result(timeout=getattr(settings, "PASSWORD_HASHING_TIMEOUT", 10))
+    except FutureTimeoutError:
+        _reject()
+
+
+def hash_password(password):
+    return run_hashing(make_password, password)
+
+
+def verify_password(password, encoded):
+    """
+    Check `password` against the `encoded` hash on the executor.
+
+    Returns:
+        tuple: Whether the password is correct, and whether the hash should be upgraded to the
+               preferred hasher (see `django.contrib.auth.hashers.check_password`).
+    """
+    outdated = []
+    correct = run_hashing(check_password, password, encoded, outdated.append)
+    return correct, bool(outdated)
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def get_hashing_metrics():
+    """
+    Return the hashing metrics of this process.
+
+    Returns:
+        dict: `queue_depth` (admitted hashes waiting for a thread), `running`, `completed` and
+              `rejected` counts, `in_progress` (admitted hashes across the workers sharing the
+              cache), the admission `limit` and `threads`, and the `wait` and `duration`
+              latencies (seconds: mean, p50, p95 and max) of the latest hashes.
+    """
+    with _lock:
+        waits = list(_waits)
+        durations = list(_durations)
+        metrics = {
+            "queue_depth": _queued,
+            "running": _running,
+            "completed": _completed,
+            "rejected": _rejected,
+        }
+    metrics.update(
+        in_progress=len(cache.get_many(_slot_keys())),
+        limit=getattr(settings, "PASSWORD_HASHING_MAX_CONCURRENT", 4),
+        threads=getattr(settings, "PASSWORD_HASHING_THREADS", 2),
+    )
+    for name, samples in (("wait", waits), ("duration", durations)):
+        metrics[name] = {
+            "mean": sum(samples) / len(samples) if samples else 0.0,
+            "p50": _percentile(samples, 0.5),
+            "p95": _percentile(samples, 0.95),
+            "max": max(samples, default=0.0),
+        }
+    return metrics
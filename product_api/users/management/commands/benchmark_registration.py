@@ -0,0 +1,98 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory
+
+from apis.views.user_views import RegisterViewSet
+
+"""
+Management command measuring the throughput of `POST /api/register/`.
+
+Registers `--users` users through `RegisterViewSet` twice: once running the uniqueness checks
+registration used to make before inserting (two unique validators and three `exists()` queries,
+one of them over the password column), and once as it runs now, a single INSERT. The command
+reports registrations per second and queries per registration.
+
+Password hashing dominates registration time with the production hashers, hiding the database
+round trips; the fast MD5 hasher is used unless `--real-hasher` is given. The benchmark users
+are deleted at the end.
+
+Usage:
+    python manage.py benchmark_registration [--users 500] [--real-hasher]
+"""
+
+FAST_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+
+class Command(BaseCommand):
+    help = "Benchmark user registration with and without the uniqueness pre-checks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=500, help="Registrations per flow."
+        )
+        parser.add_argument(
+            "--real-hasher",
+            action="store_true",
+            help="Hash passwords with the configured hashers.",
+        )
+
+    def handle(self, *args, **options):
+        if options["real_hasher"]:
+            self.benchmark(options["users"])
+        else:
+            with override_settings(PASSWORD_HASHERS=FAST_HASHERS):
+                self.benchmark(options["users"])
+
+    def benchmark(self, count):
+        users = get_user_model().objects
+        view = RegisterViewSet.as_view({"post": "create"})
+        factory = APIRequestFactory()
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        sequence = iter(range(count * 2))
+
+        def next_user():
+            n = next(sequence)
+            return {
+                "email": f"{prefix}-{n}@example.com",
+                "username": f"{prefix}-{n}",
+                "password": f"benchmark-password-{n}",
+            }
+
+        def post(data):
+            response = view(factory.post("/api/register/", data, format="json"))
+            assert response.status_code == 201, response.data
+
+        def prechecked():
+            # The queries registration used to run before inserting.
+            data = next_user()
+            users.filter(email=data["email"]).exists()
+            users.filter(username=data["username"]).exists()
+            users.filter(email=data["email"]).exists()
+            users.filter(username=data["username"]).exists()
+            users.filter(password=data["password"]).exists()
+            post(data)
+
+        def single_insert():
+            post(next_user())
+
+        flows = [("pre-checked", prechecked), ("single insert", single_insert)]
+        self.stdout.write(f"{count} registrations per flow:")
+        try:
+            for name, flow in flows:
+                with CaptureQueriesContext(connection) as queries:
+                    flow()
+                started = time.perf_counter()
+                for _ in range(count - 1):
+                    flow()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"  {name:<14} {(count - 1) / elapsed:8.1f} users/s  "
+                    f"{len(queries):4d} queries/user"
+                )
+        finally:
+            users.filter(username__startswith=prefix).delete()
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.models import IdempotencyKey
+
+"""
+Management command to delete expired idempotency keys in bulk.
+
+Expired keys are never served again (a request with an expired key claims it afresh), so they
+only take up space. The command deletes them in primary-key batches, each a single `DELETE`
+statement, so a large backlog never holds a long lock. Run it periodically, e.g. from cron.
+
+Usage:
+    python manage.py clear_idempotency_keys [--batch-size 5000]
+"""
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of keys deleted per statement.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        now = timezone.now()
+        expired = IdempotencyKey.objects.filter(expires_at__lte=now)
+        total = 0
+        while True:
+            batch = list(
+                expired.order_by("pk").values_list("pk", flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            # No signals or cascades are attached to the model, so this is a single DELETE.
+            deleted, _ = IdempotencyKey.objects.filter(pk__in=batch).delete()
+            total += deleted
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Deleted {total} expired idempotency keys.")
+        )
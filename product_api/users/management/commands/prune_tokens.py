@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+"""
+Management command to delete expired refresh tokens from the token blacklist tables.
+
+Every login adds an `OutstandingToken` row and, with refresh token rotation, every refresh and
+logout adds an `OutstandingToken` and a `BlacklistedToken` row. An expired token is rejected
+before the blacklist is consulted, so its rows are dead weight. The command deletes them in
+primary-key batches, each batch in its own transaction with one `DELETE` per table, so a large
+backlog never holds a long lock (simplejwt's `flushexpiredtokens` deletes them all in a single
+statement).
+
+Run it periodically, e.g. from cron. The blacklist filters of the workers drop the pruned tokens
+at their next rebuild (see `users.blacklist`).
+
+Usage:
+    python manage.py prune_tokens [--batch-size 5000]
+"""
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted refresh tokens."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of outstanding tokens deleted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+        outstanding = blacklisted = 0
+        while True:
+            batch = list(
+                expired.order_by("pk").values_list("pk", flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            with transaction.atomic():
+                deleted, _ = BlacklistedToken.objects.filter(token__in=batch).delete()
+                blacklisted += deleted
+                deleted, _ = OutstandingToken.objects.filter(pk__in=batch).delete()
+                outstanding += deleted
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {outstanding} expired outstanding tokens "
+                f"and {blacklisted} blacklisted tokens."
+            )
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 06:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0004_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="customuser",
+            name="password",
+            field=models.CharField(max_length=255),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connections, models, router, transaction
 from django.forms import ValidationError
 
 """
@@ -11,17 +12,34 @@ instead of the default username.
 Attributes:
     - username: A unique string field to store the user's username (max length 25).
     - email: A unique string field to store the user's email (max length 255).
-    - password: A string field to store the user's hashed password (max length 255).
+    - password: A string field to store the user's hashed password (max length 255). Salted hashes are
+      never looked up, so the column is not indexed.
+    - token_version: Stamped into the user's JWTs; bumped when the password is changed, which revokes the tokens
+      issued before (see `users.authentication`).
     - USERNAME_FIELD: Specifies that email will be used as the unique identifier for user authentication.
     - REQUIRED_FIELDS: A list of fields that are required to create a user (in addition to the USERNAME_FIELD).
     - objects: CustomUserManager instance to manage user creation.
 
+Users are created with a single INSERT (see `CustomUserManager.create_user`): the unique indexes on email
+and username reject duplicates, which are reported as `ValidationError`s keyed by field.
+
 This model enables email-based login and is used in place of the default Django user model.
 """
 
 
 class CustomUserManager(BaseUserManager):
-    def create_user(self, email, password, username):
+    def create_user(
+        self, email, password, username, encoded_password=None, **extra_fields
+    ):
+        """
+        Create a user with a single INSERT.
+
+        Email and username uniqueness is enforced by their unique indexes rather than checked
+        beforehand; a violation raises the same `ValidationError` the checks did, keyed by the
+        field it concerns. The existence queries that tell the fields apart only run once the
+        INSERT has failed. `encoded_password`, an already hashed password (see `users.hashing`),
+        is stored instead of hashing `password`.
+        """
         if not email:
             raise ValueError("Email Required!!")
 
@@ -30,36 +48,95 @@ class CustomUserManager(BaseUserManager):
 
         email = self.normalize_email(email)
 
-        # Check if the email already exists
-        if CustomUser.objects.filter(email=email).exists():
-            raise ValidationError("Email must be unique.")
-
-        # Check if the username already exists
-        if CustomUser.objects.filter(username=username).exists():
-            raise ValidationError("Username must be unique.")
-
-        # Check if the password already exists
-        if CustomUser.objects.filter(password=password).exists():
-            raise ValidationError("Password must be unique.")
-
-        user = self.model(email=email, username=username)
-        user.set_password(password)
-        user.save(using=self._db)
+        user = self.model(email=email, username=username, **extra_fields)
+        if encoded_password is not None:
+            user.password = encoded_password
+        else:
+            user.set_password(password)
+        connection = connections[self._db or router.db_for_write(self.model)]
+        try:
+            if connection.in_atomic_block:
+                # A failed INSERT aborts the enclosing transaction unless it ran in a savepoint.
+                with transaction.atomic(using=connection.alias):
+                    user.save(using=connection.alias, force_insert=True)
+            else:
+                user.save(using=connection.alias, force_insert=True)
+        except IntegrityError:
+            if self.filter(email=email).exists():
+                raise ValidationError({"email": "Email must be unique."})
+            if self.filter(username=username).exists():
+                raise ValidationError({"username": "Username must be unique."})
+            raise
         return user
 
-    def create_superuser(self, email, password, username):
-        user = self.create_user(email, password, username)
-        user.is_staff = True
-        user.is_superuser = True
-        user.save(using=self._db)
-        return user
+    def create_superuser(self, email, password, username, **extra_fields):
+        extra_fields.setdefault("is_staff", True)
+        extra_fields.setdefault("is_superuser", True)
+        return self.create_user(email, password, username, **extra_fields)
 
 
 class CustomUser(AbstractUser):
     username = models.CharField(unique=True, max_length=25)
     email = models.EmailField(unique=True, max_length=255)
-    password = models.CharField(unique=True, max_length=255)
+    password = models.CharField(max_length=255)
+    token_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = "email"  # set email as username
     REQUIRED_FIELDS = ["username"]
     objects = CustomUserManager()
+
+    def save(self, *args, **kwargs):
+        # A password change (`set_password`) revokes the tokens issued before it.
+        if self._password is not None and not self._state.adding:
+            self.token_version += 1
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "token_version"}
+        super().save(*args, **kwargs)
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client-supplied `Idempotency-Key` and the response of the request that first used it.
+
+    A row is inserted (claimed) before the request runs, with `status_code` left null while it is
+    in flight, and completed with the response afterwards. The `(user, key)` unique constraint
+    makes the claim atomic: of several concurrent requests with the same key only one can insert
+    the row, the others wait for it to complete and replay its response (see
+    `apis.mixins.IdempotentMixin`).
+
+    Attributes:
+        - user: The user the key belongs to; keys of different users never collide.
+        - key: The value of the `Idempotency-Key` header.
+        - request_fingerprint: A hash of the method, path and body of the first request, so a key
+          reused for a different request is rejected rather than answered with the wrong response.
+        - status_code: The status of the stored response, null while the request is in flight.
+        - response_data: The stored response body.
+        - created_at: When the key was claimed.
+        - expires_at: When the key may be forgotten; expired keys are removed in bulk by the
+          `clear_idempotency_keys` management command.
+    """
+
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="idempotency_keys"
+    )
+    key = models.CharField(max_length=255)
+    request_fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="idempotency_key_user_key_uniq"
+            )
+        ]
+
+    @property
+    def is_completed(self):
+        return self.status_code is not None
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
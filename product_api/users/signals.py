@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import evict_cached_user
+from .blacklist import note_blacklisted
+from .models import CustomUser
+
+"""
+Signal receivers that keep the cached users of JWT authentication and the token blacklist filter
+up to date.
+
+Signal Handlers:
+    - post_save / post_delete (CustomUser): Evict the user from the JWT user cache, so a
+      deactivation, permission change or deletion applies to the next request (see
+      `users.authentication.CachedJWTAuthentication`).
+    - post_save (BlacklistedToken): Add a newly blacklisted refresh token to the blacklist filter
+      (see `users.blacklist`).
+"""
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def evict_user_on_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        evict_cached_user(instance)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_blacklisted_token_to_filter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        note_blacklisted(instance)
@@ -1,9 +1,48 @@
+import time
 import uuid
+from datetime import timedelta
+from io import StringIO
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.db.utils import IntegrityError
-from django.test import TestCase
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+    TokenError,
+)
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from apis.serializers.user_serializer import UserTokenObtainPairSerializer
+from users.authentication import CachedJWTAuthentication, TokenClaimsAuthentication
+from users.blacklist import (
+    GENERATION_KEY,
+    BloomFilter,
+    FilteredRefreshToken,
+    _bump_generation,
+    rebuild_blacklist_filter,
+)
+
+from users.hashing import (
+    SLOT_KEY,
+    SLOT_TIMEOUT,
+    HashingOverloaded,
+    _release_slot,
+    get_hashing_metrics,
+    hash_password,
+    verify_password,
+)
+from users.models import IdempotencyKey
 
 
 class CustomUserModelTest(TestCase):
@@ -85,6 +124,19 @@ class CustomUserModelTest(TestCase):
                 email=self.user_data1["email"], password="password123", username="user3"
             )
 
+    def test_duplicate_username_and_shared_password(self):
+        """Test that usernames must be unique while passwords may be shared."""
+        get_user_model().objects.create_user(**self.user_data1)
+        with self.assertRaises(ValidationError) as raised:
+            get_user_model().objects.create_user(
+                email="other@example.com", password="password123", username="user1"
+            )
+        self.assertEqual(list(raised.exception.message_dict), ["username"])
+
+        # The failed INSERT ran in a savepoint, so the transaction is still usable.
+        get_user_model().objects.create_user(**self.user_data2)
+        self.assertEqual(get_user_model().objects.count(), 2)
+
     def test_user_password_hashing(self):
         """Test that the password is properly hashed and cannot be retrieved in plaintext."""
         user = get_user_model().objects.create_user(**self.user_data1)
@@ -94,3 +146,294 @@ class CustomUserModelTest(TestCase):
         self.assertTrue(
             user.check_password(self.user_data1["password"])
         )  # Check password verification
+
+
+class ClearIdempotencyKeysTest(TestCase):
+    def test_only_expired_keys_are_deleted(self):
+        """Test that the cleanup command removes expired keys and keeps live ones."""
+        user = get_user_model().objects.create_user(
+            email="keys@example.com", password="password123", username="keys"
+        )
+        now = timezone.now()
+        for i in range(5):
+            IdempotencyKey.objects.create(
+                user=user,
+                key=f"old-{i}",
+                request_fingerprint="x",
+                expires_at=now - timedelta(minutes=1),
+            )
+        IdempotencyKey.objects.create(
+            user=user,
+            key="live",
+            request_fingerprint="x",
+            expires_at=now + timedelta(hours=1),
+        )
+
+        call_command("clear_idempotency_keys", batch_size=2, stdout=StringIO())
+
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list("key", flat=True)), ["live"]
+        )
+
+
+class PasswordHashingTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="hash@example.com", password="password123", username="hash"
+        )
+
+    def test_hashes_run_on_the_executor(self):
+        """Test that hashing through the executor is recorded in the metrics."""
+        completed = get_hashing_metrics()["completed"]
+        self.assertEqual(
+            verify_password("password123", hash_password("password123")),
+            (True, False),
+        )
+        metrics = get_hashing_metrics()
+        self.assertEqual(metrics["completed"], completed + 2)
+        self.assertEqual(metrics["queue_depth"], 0)
+        self.assertGreater(metrics["duration"]["max"], 0)
+
+    @override_settings(PASSWORD_HASHING_MAX_CONCURRENT=0)
+    def test_hashes_beyond_the_limit_are_rejected(self):
+        """Test that a hash that cannot be admitted fails at once."""
+        rejected = get_hashing_metrics()["rejected"]
+        with self.assertRaises(HashingOverloaded) as raised:
+            hash_password("password123")
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        self.assertEqual(get_hashing_metrics()["rejected"], rejected + 1)
+
+    @override_settings(PASSWORD_HASHING_MAX_CONCURRENT=1)
+    def test_slots_are_shared_through_the_cache(self):
+        """Test that a slot held by another worker blocks admission until it is freed."""
+        cache.set(SLOT_KEY.format(0), "other-worker", SLOT_TIMEOUT)
+        with self.assertRaises(HashingOverloaded):
+            hash_password("password123")
+        self.assertEqual(get_hashing_metrics()["in_progress"], 1)
+
+        cache.delete(SLOT_KEY.format(0))
+        self.assertTrue(hash_password("password123"))
+        self.assertIsNone(cache.get(SLOT_KEY.format(0)))
+
+    @override_settings(PASSWORD_HASHING_MAX_CONCURRENT=1)
+    def test_stale_claims_are_left_to_expire(self):
+        """Test that a slot claimed longer ago than its expiry is not deleted on release."""
+        cache.set(SLOT_KEY.format(0), "other-worker", SLOT_TIMEOUT)
+        _release_slot((SLOT_KEY.format(0), time.monotonic() - SLOT_TIMEOUT))
+        self.assertEqual(cache.get(SLOT_KEY.format(0)), "other-worker")
+        cache.delete(SLOT_KEY.format(0))
+
+    def test_backend_authenticates_and_upgrades_hashes(self):
+        """Test that the executor backend checks passwords and upgrades outdated hashes."""
+        request = RequestFactory().post("/api/token/")
+        request.hashing_admission = True
+        completed = get_hashing_metrics()["completed"]
+        self.assertEqual(
+            authenticate(request, email="hash@example.com", password="password123"),
+            self.user,
+        )
+        self.assertEqual(get_hashing_metrics()["completed"], completed + 1)
+        self.assertIsNone(
+            authenticate(request, email="hash@example.com", password="wrong")
+        )
+        self.assertIsNone(
+            authenticate(request, email="nobody@example.com", password="x")
+        )
+
+        self.user.password = make_password("password123", hasher="pbkdf2_sha1")
+        self.user.save(update_fields=["password"])
+        authenticate(request, email="hash@example.com", password="password123")
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+
+    @override_settings(PASSWORD_HASHING_MAX_CONCURRENT=0)
+    def test_other_logins_hash_inline(self):
+        """Test that logins outside the API views, e.g. the admin, are never rejected."""
+        request = RequestFactory().post("/admin/login/")
+        self.assertEqual(
+            authenticate(request, email="hash@example.com", password="password123"),
+            self.user,
+        )
+        request.hashing_admission = True
+        with self.assertRaises(HashingOverloaded):
+            authenticate(request, email="hash@example.com", password="password123")
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="jwt@example.com", username="jwtuser", password="password123"
+        )
+        self.auth = CachedJWTAuthentication()
+
+    def login_token(self):
+        token = UserTokenObtainPairSerializer.get_token(self.user).access_token
+        return AccessToken(str(token))
+
+    def test_user_is_resolved_from_the_cache(self):
+        """Test that only the first resolution of a token queries the user."""
+        token = self.login_token()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.auth.get_user(token), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.auth.get_user(token), self.user)
+
+    def test_saving_the_user_evicts_it(self):
+        """Test that a deactivated user is rejected on the next request."""
+        token = self.login_token()
+        self.auth.get_user(token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(token)
+
+    def test_password_change_revokes_tokens(self):
+        """Test that changing the password rejects the tokens issued before."""
+        token = self.login_token()
+        self.auth.get_user(token)
+        self.user.set_password("new-password123")
+        self.user.save()
+        self.assertEqual(self.user.token_version, 1)
+        with self.assertRaises(AuthenticationFailed) as raised:
+            self.auth.get_user(token)
+        self.assertEqual(raised.exception.detail["code"], "token_revoked")
+        self.assertEqual(self.auth.get_user(self.login_token()), self.user)
+
+    def test_token_claims_authentication(self):
+        """Test that the claims-only authentication needs no query and the user claims."""
+        auth = TokenClaimsAuthentication()
+        token = self.login_token()
+        with self.assertNumQueries(0):
+            user = auth.get_user(token)
+        self.assertEqual(user.id, self.user.id)
+        self.assertFalse(user.is_staff)
+        with self.assertRaises(InvalidToken):
+            auth.get_user(AccessToken.for_user(self.user))
+
+
+@override_settings(TOKEN_BLACKLIST_FILTER_SHARED=True)
+class TokenBlacklistTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="blacklist@example.com", username="blacklist", password="password123"
+        )
+
+    def test_bloom_filter(self):
+        """Test that added items are always found, and others rarely."""
+        bloom = BloomFilter(1000, 0.01)
+        items = [uuid.uuid4().hex for _ in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(1000))
+        self.assertLess(false_positives, 50)
+
+    def test_refresh_skips_the_blacklist_table(self):
+        """Test that a token that was never blacklisted is checked without a query."""
+        rebuild_blacklist_filter()
+        token = str(RefreshToken.for_user(self.user))
+        with self.assertNumQueries(0):
+            FilteredRefreshToken(token)
+
+    def test_blacklisted_tokens_are_rejected(self):
+        """Test that tokens blacklisted here, or by another worker, are rejected."""
+        rebuild_blacklist_filter()
+        token = RefreshToken.for_user(self.user)
+        token.blacklist()
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(str(token))
+
+        # Another worker: no signal in this process, only the generation bump.
+        other = RefreshToken.for_user(self.user)
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token=OutstandingToken.objects.get(jti=other["jti"]))]
+        )
+        _bump_generation()
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(str(other))
+
+    def blacklist_elsewhere(self):
+        # Another worker: the row is committed, but no signal runs in this process.
+        token = RefreshToken.for_user(self.user)
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token=OutstandingToken.objects.get(jti=token["jti"]))]
+        )
+        return str(token)
+
+    def test_lost_generation_means_query(self):
+        """Test that the filter is not trusted while the generation counter is missing."""
+        rebuild_blacklist_filter()
+        FilteredRefreshToken(str(RefreshToken.for_user(self.user)))
+        token = self.blacklist_elsewhere()
+        cache.delete(GENERATION_KEY)
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(token)
+        self.assertIsNotNone(cache.get(GENERATION_KEY))
+
+    def test_own_blacklisting_needs_no_read(self):
+        """Test that tokens blacklisted by this worker do not make the next check query."""
+        rebuild_blacklist_filter()
+        with self.captureOnCommitCallbacks(execute=True):
+            RefreshToken.for_user(self.user).blacklist()
+        token = str(RefreshToken.for_user(self.user))
+        with self.assertNumQueries(0):
+            FilteredRefreshToken(token)
+
+        # Another worker's bump is read once.
+        self.blacklist_elsewhere()
+        _bump_generation()
+        with self.assertNumQueries(1):
+            FilteredRefreshToken(token)
+        with self.assertNumQueries(0):
+            FilteredRefreshToken(token)
+
+    def test_out_of_order_commits_are_found(self):
+        """Test that a row committed after a row with a higher id is still read."""
+        rebuild_blacklist_filter()
+        late = self.blacklist_elsewhere()
+        row = BlacklistedToken.objects.latest("id")
+        row.delete()  # Not committed yet.
+        self.blacklist_elsewhere()
+        _bump_generation()
+        FilteredRefreshToken(str(RefreshToken.for_user(self.user)))
+
+        row.save()
+        _bump_generation()
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(late)
+
+    @override_settings(TOKEN_BLACKLIST_FILTER_SHARED=False)
+    def test_unshared_cache_always_queries(self):
+        """Test that without a shared cache every check queries, so no replay window is left."""
+        token = self.blacklist_elsewhere()
+        with self.assertNumQueries(1):
+            with self.assertRaises(TokenError):
+                FilteredRefreshToken(token)
+        fresh = str(RefreshToken.for_user(self.user))
+        with self.assertNumQueries(1):
+            FilteredRefreshToken(fresh)
+
+    def test_prune_tokens(self):
+        """Test that expired outstanding and blacklisted tokens are deleted in batches."""
+        now = timezone.now()
+        for n in range(3):
+            expired = OutstandingToken.objects.create(
+                user=self.user,
+                jti=f"expired-{n}",
+                token="token",
+                expires_at=now - timedelta(minutes=1),
+            )
+            BlacklistedToken.objects.create(token=expired)
+        current = RefreshToken.for_user(self.user)
+        current.blacklist()
+
+        out = StringIO()
+        call_command("prune_tokens", "--batch-size", "2", stdout=out)
+
+        self.assertIn(
+            "Deleted 3 expired outstanding tokens and 3 blacklisted", out.getvalue()
+        )
+        self.assertQuerySetEqual(
+            OutstandingToken.objects.values_list("jti", flat=True), [current["jti"]]
+        )
+        self.assertEqual(BlacklistedToken.objects.count(), 1)